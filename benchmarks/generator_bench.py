@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the pcap generators.
+
+Every (case, scale) pair runs in a fresh Python process so that its peak RSS
+is its own, writes its capture to a scratch directory and reports packets/sec,
+bytes/sec, wall time, peak RSS and an exclusive per-stage time breakdown:
+
+  large_file   SCALE MB download (create_large_pcap.py path)
+               stages: payload (synthesize + write the file), segment (mmap
+               slicing), frames (Ethernet/IP/TCP build + checksums), write
+  multi_flow   SCALE concurrent downloads of --flow-size each
+               stages: generate (payload + frames + interleave), write
+  paws, reassembly, retransmit
+               SCALE back-to-back copies of the scenario's session
+               stages: frames, write
+
+Results go to --output; with --baseline, medians are compared the same way
+as the Snort throughput benchmark and regressions make the script exit 1.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from snorttest import bench
+from snorttest.flows import http_download, multi_flow
+from snorttest.payload import iter_segments, mapped_payload, write_payload_file
+from snorttest.pcap_writer import PcapWriter, TcpFlow
+
+DEFAULT_SCALES = {
+    "large_file": [1, 10, 100],
+    "multi_flow": [1, 1000, 100000],
+    "paws": [1, 1000],
+    "reassembly": [1, 1000],
+    "retransmit": [1, 1000],
+}
+
+def run_large_file(scale, directory, timer, args):
+    payload_file = os.path.join(directory, "large_file.bin")
+    with timer.stage("payload"):
+        write_payload_file(payload_file, scale * 1024 * 1024, signatures=[(0, b"MALWARE")])
+    flow = TcpFlow("10.1.0.2", "10.1.0.1", 49152, 80)
+    with mapped_payload(payload_file) as data:
+        segments = timer.wrap("segment", iter_segments(data, 1460))
+        frames = timer.wrap("frames", http_download(flow, len(data), segments))
+        with timer.stage("write"), PcapWriter(os.path.join(directory, "large_file.pcap")) as writer:
+            writer.write_all(frames)
+    return writer
+
+def run_multi_flow(scale, directory, timer, args):
+    packets = timer.wrap("generate", multi_flow(scale, arrival_rate=1000.0, size_dist=args.flow_size))
+    with timer.stage("write"), PcapWriter(os.path.join(directory, "multiflow.pcap")) as writer:
+        writer.write_all(packets)
+    return writer
+
+def session_runner(module_dir, module, function):
+    # Import up front so module loading is not timed as part of the case
+    sys.path.insert(0, os.path.join(ROOT, module_dir))
+    packets = getattr(__import__(module), function)
+
+    def run(scale, directory, timer, args):
+        frames = timer.wrap("frames", itertools.chain.from_iterable(packets() for _ in range(scale)))
+        with timer.stage("write"), PcapWriter(os.path.join(directory, "session.pcap")) as writer:
+            writer.write_all(frames)
+        return writer
+    return run
+
+CASES = {
+    "large_file": run_large_file,
+    "multi_flow": run_multi_flow,
+    "paws": session_runner("paws_test", "generate_paws_test_pcap", "paws_test_packets"),
+    "reassembly": session_runner("tcp_reassembly_test", "generate_tcp_reassembly_test_pcap",
+                                 "tcp_reassembly_test_packets"),
+    "retransmit": session_runner("test_retransmit", "create_pcap", "retransmit_test_packets"),
+}
+
+def run_case(case, scale, args):
+    """Run one case in this process and return its metrics."""
+    timer = bench.StageTimer()
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryDirectory(prefix="genbench-") as directory:
+        started = time.perf_counter()
+        writer = CASES[case](scale, directory, timer, args)
+        wall = time.perf_counter() - started
+    return {
+        "packets": writer.packets,
+        "bytes": writer.bytes,
+        "wall_time": wall,
+        "pkts_per_sec": writer.packets / wall if wall else 0.0,
+        "bytes_per_sec": writer.bytes / wall if wall else 0.0,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "start_rss_kb": start_rss,
+        "stages": dict(timer.totals),
+    }
+
+def run_isolated(case, scale, args):
+    """Run one case in a fresh interpreter and return its metrics."""
+    command = [sys.executable, os.path.abspath(__file__), "--run-case", case, str(scale),
+               "--flow-size", args.flow_size]
+    proc = subprocess.run(command, stdout=subprocess.PIPE, text=True, check=True)
+    return json.loads(proc.stdout.splitlines()[-1])
+
+def format_run(name, run):
+    stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in
+                       sorted(run["stages"].items(), key=lambda item: -item[1]))
+    return (f"{name}: {run['packets']} pkts in {run['wall_time']:.2f}s, "
+            f"{run['pkts_per_sec']:.0f} pkts/s, {run['bytes_per_sec'] / 1e6:.1f} MB/s, "
+            f"peak RSS {run['peak_rss_kb'] / 1024:.0f} MB ({stages})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pcap generators")
+    parser.add_argument("--case", choices=sorted(CASES), action="append",
+                        help="generator(s) to benchmark (default: all)")
+    parser.add_argument("--scales", type=int, nargs="+",
+                        help="scales to run for every selected case (default: per case, "
+                             "MB for large_file, flows for multi_flow, sessions otherwise)")
+    parser.add_argument("--flow-size", default="fixed:4K", help="multi_flow size distribution")
+    parser.add_argument("--runs", type=int, default=1, help="runs per case and scale")
+    parser.add_argument("--output", default="generator_bench.json", help="results JSON file")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed relative change before a metric counts as a regression")
+    parser.add_argument("--run-case", nargs=2, metavar=("CASE", "SCALE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        case, scale = args.run_case
+        print(json.dumps(run_case(case, int(scale), args)))
+        return
+
+    results = {"environment": bench.environment(), "flow_size": args.flow_size,
+               "runs": {}, "scenarios": {}}
+    for case in args.case or list(CASES):
+        for scale in args.scales or DEFAULT_SCALES[case]:
+            name = f"{case}@{scale}"
+            runs = []
+            for _ in range(args.runs):
+                run = run_isolated(case, scale, args)
+                print(format_run(name, run))
+                runs.append(run)
+            results["runs"][name] = runs
+            results["scenarios"][name] = bench.aggregate(runs, bench.GENERATOR_METRICS)
+            stage_names = {stage for run in runs for stage in run["stages"]}
+            results["scenarios"][name]["stages"] = {
+                stage: bench.aggregate([run["stages"] for run in runs], [stage])[stage]
+                for stage in stage_names}
+
+    regressions = []
+    if args.baseline:
+        regressions = bench.compare(results["scenarios"], bench.load_baseline(args.baseline),
+                                    bench.GENERATOR_METRICS, args.tolerance)
+        results["baseline"] = args.baseline
+        results["tolerance"] = args.tolerance
+        results["regressions"] = regressions
+    bench.save_results(args.output, results)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print("  " + bench.format_regression(regression))
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Measure how Snort's memory grows with concurrent flows and file size.
+
+Every (flows, file size) point replays a capture of that many HTTP downloads
+(the multi_flow() template) running at the same time, so all files are in
+flight together. Snort's RSS is sampled from /proc while it runs and its
+memory-related exit counters (memory, stream, stream_tcp, file_id) are
+parsed from the log. Growth is measured against a baseline run of a
+single one-byte download and reported as two curves:
+
+  per flow       (peak RSS - baseline) / flows, for each file size
+  per held byte  (peak RSS - baseline) / (flows * file size), for each
+                 flow count: how much memory each byte in flight costs
+
+Examples:
+  memory_scaling.py --flows 1 10 100 1000 --sizes 64K 1M
+  memory_scaling.py --flows 100 --sizes 16K 64K 256K 1M 4M --verdict-delay 5000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "test_retransmit"))
+from snort_configs import FILE_MAGIC_RULES
+from snorttest import bench
+from snorttest.flows import (DEFAULT_SEGMENT_SIZE, multi_flow, parse_segment_size, parse_size,
+                             snaplen_args)
+from snorttest.lua_config import file_inspection_config
+from snorttest.memory import run_sampled_job
+from snorttest.pcap_cache import cached_outputs
+from snorttest.pcap_writer import write_pcap
+from snorttest.runner import ConfigError, SnortJob
+
+BASELINE = (1, 1)
+
+def capture(directory, flows, size, segment_size, seed):
+    """Path of the (cached) capture of flows concurrent downloads of size bytes."""
+    name = f"flows_{flows}_size_{size}.pcap"
+
+    def build(target):
+        frames = multi_flow(flows, size_dist=f"fixed:{size}", seed=seed, segment_size=segment_size)
+        return {"packets": write_pcap(os.path.join(target, name), frames)}
+
+    cached_outputs("memory_scaling", {"flows": flows, "size": size, "segment_size": segment_size},
+                   build, [name], seed=seed, sources=[__file__], dest=directory)
+    return os.path.join(directory, name)
+
+def snort_config(args):
+    if args.config:
+        with open(args.config) as f:
+            return f.read()
+    config = file_inspection_config(args.type_depth, policy={"verdict_delay": args.verdict_delay})
+    # Tracing every flow would dominate the run; memory is what is measured here
+    config.remove("trace")
+    return config.render()
+
+def snort_args(args):
+    return ["-k", "none", "-Q", *snaplen_args(args.segment_size)]
+
+def measure(args, config, flows, size):
+    """Median of --runs sampled runs at one point."""
+    pcap = capture(os.path.join(args.output_dir, "pcaps"), flows, size, args.segment_size, args.seed)
+    runs = []
+    for i in range(args.runs):
+        job = SnortJob(f"flows_{flows}_size_{size}_run{i + 1}", config, pcap,
+                       params={"flows": flows, "size": size, "run": i + 1},
+                       files={"file_magic.rules": FILE_MAGIC_RULES}, args=snort_args(args))
+        runs.append(run_sampled_job(job, os.path.join(args.output_dir, job.name), snort=args.snort,
+                                    support_dir=os.path.join(ROOT, "test_retransmit"),
+                                    timeout=args.timeout, interval=args.interval))
+    peaks = [run["rss_hwm_kb"] or run["rss_peak_kb"] or run["max_rss_kb"] for run in runs]
+    counters = {}
+    for run in runs:
+        for name, value in run["memory"].items():
+            if isinstance(value, (int, float)):
+                counters.setdefault(name, []).append(value)
+    return {"flows": flows, "size": size, "peak_rss_kb": statistics.median(peaks),
+            "wall_time": statistics.median(run["wall_time"] for run in runs),
+            "memory": {name: statistics.median(values) for name, values in counters.items()},
+            "runs": runs}
+
+def curves(points, baseline_kb):
+    """Per-flow and per-held-byte memory growth over the baseline."""
+    per_flow, per_held_byte = {}, {}
+    for point in points:
+        growth_kb = max(0, point["peak_rss_kb"] - baseline_kb)
+        point["growth_kb"] = growth_kb
+        point["kb_per_flow"] = growth_kb / point["flows"]
+        point["bytes_per_held_byte"] = growth_kb * 1024 / (point["flows"] * point["size"])
+        per_flow.setdefault(point["size"], []).append(
+            {"flows": point["flows"], "kb_per_flow": point["kb_per_flow"]})
+        per_held_byte.setdefault(point["flows"], []).append(
+            {"size": point["size"], "bytes_per_held_byte": point["bytes_per_held_byte"]})
+    return {"per_flow": per_flow, "per_held_byte": per_held_byte}
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep Snort memory use over flows and file size")
+    parser.add_argument("--flows", type=int, nargs="+", default=[1, 10, 100, 1000],
+                        help="concurrent flow counts")
+    parser.add_argument("--sizes", type=parse_size, nargs="+", default=[parse_size("64K"), parse_size("1M")],
+                        help="per-flow file sizes (K/M/G suffixes allowed)")
+    parser.add_argument("--segment-size", type=parse_segment_size, default=DEFAULT_SEGMENT_SIZE,
+                        help="TCP payload per segment, up to 65481 (or min, ethernet, jumbo, super)")
+    parser.add_argument("--type-depth", type=int, default=1460, help="file_id type_depth")
+    parser.add_argument("--verdict-delay", type=int, default=0,
+                        help="file_policy verdict_delay in ms, to keep files held")
+    parser.add_argument("-c", "--config", help="Snort Lua config instead of the generated one")
+    parser.add_argument("--runs", type=int, default=1, help="runs per point (median is reported)")
+    parser.add_argument("--interval", type=float, default=0.05, help="RSS sampling interval in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="flow seed")
+    parser.add_argument("--snort", default="snort", help="Snort binary")
+    parser.add_argument("--timeout", type=float, help="per-run timeout in seconds")
+    parser.add_argument("--output", default="memory_scaling.json", help="results JSON file")
+    parser.add_argument("--output-dir", default="memory_runs", help="per-run working directories")
+    args = parser.parse_args()
+
+    args.snort = os.path.abspath(args.snort) if os.sep in args.snort else args.snort
+    config = snort_config(args)
+    try:
+        baseline = measure(args, config, *BASELINE)
+        print(f"Baseline (1 flow, 1 byte): peak RSS {baseline['peak_rss_kb'] / 1024:.1f} MB")
+        points = []
+        for size in args.sizes:
+            for flows in args.flows:
+                point = measure(args, config, flows, size)
+                points.append(point)
+                print(f"  {flows} flows x {size} bytes: peak RSS {point['peak_rss_kb'] / 1024:.1f} MB")
+    except ConfigError as e:
+        sys.exit(str(e))
+
+    results = {"environment": bench.environment(), "segment_size": args.segment_size,
+               "type_depth": args.type_depth, "verdict_delay": args.verdict_delay,
+               "baseline": baseline, "points": points,
+               "curves": curves(points, baseline["peak_rss_kb"])}
+    bench.save_results(args.output, results)
+
+    print(f"\n{'flows':>7} {'size':>10} {'peak MB':>9} {'growth MB':>10} {'KB/flow':>9} "
+          f"{'B/held B':>9} {'max_bytes':>11} {'max_files':>10}")
+    for point in points:
+        memory = point["memory"]
+        print(f"{point['flows']:>7} {point['size']:>10} {point['peak_rss_kb'] / 1024:>9.1f} "
+              f"{point['growth_kb'] / 1024:>10.1f} {point['kb_per_flow']:>9.1f} "
+              f"{point['bytes_per_held_byte']:>9.3f} {memory.get('stream_tcp.max_bytes', '-'):>11} "
+              f"{memory.get('file_id.max_concurrent_files', '-'):>10}")
+    print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Sweep the segment size (MSS, jumbo frames, GRO/TSO super-segments) and ACK
+pattern of one HTTP file download and measure what it costs Snort.
+
+The same file bytes are sent at every point: each capture writes the
+payload from the same seed and segments it at that point's size (anything
+from 1 byte, through the 536-byte minimum MSS, up to 65481-byte
+super-segments, the largest whose frame fits a 65535-byte snaplen). The
+client ACKs every segment, every second one (delayed) or every Nth
+(stretch:N). Halving the packets of a transfer while keeping its bytes
+separates what Snort spends per packet from what it spends per byte:
+
+  per packet  slope of CPU time (over a one-byte baseline download) against
+              the packets of each point, fitted over all points
+  per byte    the rest of the CPU time, spread over the file's bytes
+
+Each point also gets one traced, verbose (-v) run to find the packet in
+which the file type was detected and how many body bytes had arrived by
+then, which show how type_depth interacts with large segments.
+
+Examples:
+  segment_sweep.py --sizes 536 1460 jumbo super
+  segment_sweep.py --size 20M --sizes 1460 9000 --acks every delayed stretch:8 --loops 10
+"""
+
+import argparse
+import math
+import os
+import statistics
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "test_retransmit"))
+from snort_configs import FILE_MAGIC_RULES
+from snorttest import bench
+from snorttest.flows import (SIGNATURE, http_download, http_response_header, parse_ack_mode,
+                             parse_segment_size, parse_size, snaplen_args, timed)
+from snorttest.lua_config import file_inspection_config
+from snorttest.pcap_cache import cached_outputs
+from snorttest.pcap_reader import iter_pcap, packet_fields
+from snorttest.pcap_writer import TcpFlow, write_pcap
+from snorttest.payload import iter_segments, mapped_payload, write_payload_file
+from snorttest.runner import ConfigError, SnortJob, run_job
+from snorttest.snort_log import parse_stats
+
+SERVER_PORT = 80
+DEFAULT_SIZES = ["min", "1460", "4096", "9000", "16384", "super"]
+
+def ack_name(ack_every):
+    return {1: "every", 2: "delayed"}.get(ack_every, f"stretch:{ack_every}")
+
+def capture(directory, size, segment_size, ack_every, seed):
+    """Path and info of the (cached) download of the size-byte file in segment_size segments."""
+    name = f"size_{size}_mss_{segment_size}_ack_{ack_every}.pcap"
+
+    def build(target):
+        payload = os.path.join(target, "payload.bin")
+        signatures = [(0, SIGNATURE)] if size >= len(SIGNATURE) else []
+        write_payload_file(payload, size, seed=seed, signatures=signatures)
+        flow = TcpFlow("10.1.0.2", "10.1.0.1", 49152, SERVER_PORT)
+        with mapped_payload(payload) as data:
+            frames = http_download(flow, size, iter_segments(data, segment_size), ack_every=ack_every)
+            packets = write_pcap(os.path.join(target, name), timed(frames, 0.0))
+        os.remove(payload)
+        data_segments = math.ceil(size / segment_size)
+        return {"packets": packets, "data_segments": data_segments,
+                "acks": math.ceil(data_segments / ack_every)}
+
+    _, info = cached_outputs("segment_sweep", {"size": size, "segment_size": segment_size,
+                                               "ack_every": ack_every},
+                             build, [name], seed=seed, sources=[__file__], dest=directory)
+    return os.path.join(directory, name), info
+
+def body_offset(pcap, packet, size):
+    """Response body bytes the server had sent by capture packet number packet (1-based)."""
+    header = len(http_response_header(size))
+    records = iter_pcap(pcap, with_linktype=True)
+    linktype = next(records)
+    sent = 0
+    for number, (_, frame) in enumerate(records, 1):
+        _, _, sport, _, _, _, payload = packet_fields(frame, linktype)
+        if sport == SERVER_PORT:
+            sent += len(payload)
+        if number == packet:
+            break
+    return max(0, sent - header)
+
+def snort_configs(args):
+    """(timed, traced) configs: tracing only runs once per point, to find the detection packet."""
+    traced = file_inspection_config(args.type_depth)
+    timed_config = file_inspection_config(args.type_depth)
+    timed_config.remove("trace")
+    return timed_config.render(), traced.render()
+
+def run(args, name, config, pcap, params, extra_args):
+    job = SnortJob(name, config, pcap, params=params, files={"file_magic.rules": FILE_MAGIC_RULES},
+                   # One snaplen for every point, so it is not part of what the sweep compares
+                   args=["-k", "none", *snaplen_args(max(args.sizes)), *extra_args])
+    result = run_job(job, os.path.join(args.output_dir, job.name), snort=args.snort,
+                     support_dir=os.path.join(ROOT, "test_retransmit"), timeout=args.timeout)
+    if result["returncode"] != 0:
+        sys.exit(f"Snort exited with {result['returncode']}; see {result['log']}")
+    return result
+
+def measure(args, configs, size, segment_size, ack_every):
+    """Median timing of --runs runs of one point, plus its traced detection run."""
+    pcap, info = capture(os.path.join(args.output_dir, "pcaps"), size, segment_size, ack_every,
+                         args.seed)
+    label = f"size_{size}_mss_{segment_size}_ack_{ack_every}"
+    params = {"size": size, "segment_size": segment_size, "ack_every": ack_every}
+    runs = []
+    for i in range(args.runs):
+        result = run(args, f"{label}_run{i + 1}", configs[0], pcap, dict(params, run=i + 1),
+                     ["--pcap-loop", str(args.loops)])
+        runs.append(bench.snort_run_metrics(result, parse_stats(result["log"])))
+    point = dict(params, ack=ack_name(ack_every), **info, runs=runs)
+    for name in bench.SNORT_METRICS:
+        point[name] = statistics.median(run[name] for run in runs)
+    if not args.no_detection:
+        # -v numbers the packets in the log; without it no detection has a packet
+        traced = run(args, f"{label}_trace", configs[1], pcap, dict(params, trace=True), ["-Q", "-v"])
+        if traced["total_packets"] == 0:
+            sys.exit(f"Traced run of {label} logged no packets; see {traced['log']}")
+        packet = traced["detection_packet"]
+        point["detection_packet"] = packet
+        point["detection_offset"] = body_offset(pcap, packet, size) if packet else None
+    return point
+
+def cost_model(points, baseline, size, loops):
+    """Per-packet and per-byte CPU cost (ns) from all points, net of the baseline's CPU time."""
+    for point in points:
+        point["net_cpu_time"] = max(0.0, point["cpu_time"] - baseline["cpu_time"])
+        point["ns_per_packet"] = point["net_cpu_time"] * 1e9 / (point["packets"] * loops)
+        point["ns_per_byte"] = point["net_cpu_time"] * 1e9 / (size * loops)
+    packets = [point["packets"] * loops for point in points]
+    if len(set(packets)) < 2:
+        return None
+    slope, intercept = statistics.linear_regression(packets, [p["net_cpu_time"] for p in points])
+    return {"ns_per_packet": slope * 1e9, "ns_per_byte": max(0.0, intercept) * 1e9 / (size * loops),
+            "fixed_cpu_time": intercept}
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep segment size and ACK pattern of one download")
+    parser.add_argument("--size", type=parse_size, default=parse_size("5M"), help="file size (K/M/G suffixes)")
+    parser.add_argument("--sizes", type=parse_segment_size, nargs="+",
+                        default=[parse_segment_size(size) for size in DEFAULT_SIZES],
+                        help="segment sizes: bytes up to 65481 or min, ethernet, jumbo, super")
+    parser.add_argument("--acks", type=parse_ack_mode, nargs="+", default=[1],
+                        help="client ACK patterns: every, delayed, stretch:N")
+    parser.add_argument("--type-depth", type=int, default=1460, help="file_id type_depth")
+    parser.add_argument("--loops", type=int, default=5, help="--pcap-loop count per timed run")
+    parser.add_argument("--runs", type=int, default=3, help="timed runs per point (median is reported)")
+    parser.add_argument("--no-detection", action="store_true", help="skip the traced detection runs")
+    parser.add_argument("--seed", type=int, default=0, help="payload seed")
+    parser.add_argument("--snort", default="snort", help="Snort binary")
+    parser.add_argument("--timeout", type=float, help="per-run timeout in seconds")
+    parser.add_argument("--output", default="segment_sweep.json", help="results JSON file")
+    parser.add_argument("--output-dir", default="segment_runs", help="per-run working directories")
+    args = parser.parse_args()
+
+    args.snort = os.path.abspath(args.snort) if os.sep in args.snort else args.snort
+    configs = snort_configs(args)
+    points = []
+    try:
+        baseline_pcap, _ = capture(os.path.join(args.output_dir, "pcaps"), 1, 1460, 1, args.seed)
+        baseline_runs = [bench.snort_run_metrics(result, parse_stats(result["log"])) for result in
+                         (run(args, f"baseline_run{i + 1}", configs[0], baseline_pcap, {"run": i + 1},
+                              ["--pcap-loop", str(args.loops)]) for i in range(args.runs))]
+        baseline = {"cpu_time": statistics.median(run["cpu_time"] for run in baseline_runs),
+                    "runs": baseline_runs}
+        print(f"Baseline (1-byte download): {baseline['cpu_time']:.3f}s CPU")
+        for ack_every in args.acks:
+            for segment_size in args.sizes:
+                point = measure(args, configs, args.size, segment_size, ack_every)
+                points.append(point)
+                print(f"  MSS {segment_size}, ACK {point['ack']}: {point['packets']} packets, "
+                      f"{point['cpu_time']:.3f}s CPU")
+    except ConfigError as e:
+        sys.exit(str(e))
+    model = cost_model(points, baseline, args.size, args.loops)
+
+    results = {"environment": bench.environment(), "size": args.size, "type_depth": args.type_depth,
+               "loops": args.loops, "baseline": baseline, "points": points, "cost_model": model}
+    bench.save_results(args.output, results)
+
+    print(f"\n{'MSS':>6} {'ACK':>10} {'packets':>8} {'data':>7} {'acks':>7} {'pkts/s':>10} "
+          f"{'Mbit/s':>8} {'CPU s':>7} {'ns/pkt':>8} {'ns/B':>6} {'det. pkt':>8} {'det. byte':>9}")
+    for point in points:
+        detection = point.get("detection_packet")
+        offset = point.get("detection_offset")
+        print(f"{point['segment_size']:>6} {point['ack']:>10} {point['packets']:>8} "
+              f"{point['data_segments']:>7} {point['acks']:>7} {point['pkts_per_sec']:>10.0f} "
+              f"{point['mbits_per_sec']:>8.1f} {point['cpu_time']:>7.3f} {point['ns_per_packet']:>8.0f} "
+              f"{point['ns_per_byte']:>6.2f} {'-' if detection is None else detection:>8} "
+              f"{'-' if offset is None else offset:>9}")
+    if model:
+        print(f"\nFit: {model['ns_per_packet']:.0f} ns per packet + {model['ns_per_byte']:.2f} ns per byte")
+    print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
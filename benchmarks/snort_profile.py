@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Show and compare Snort's per-module and per-rule profiles.
+
+Profiles come from any run made with profiling on: a Snort log (the tables
+Snort prints at shutdown), the results.json of run_depth_matrix.py, the
+result.json of stream_to_snort.py, or a snort_throughput.py results file
+recorded with --profile. Several runs of the same job or scenario are merged by median.
+
+  snort_profile.py lua                     print the Lua that enables profiling
+                                           (for snort --lua "...")
+  snort_profile.py show SOURCE [--name N]  busiest modules, key modules first
+  snort_profile.py diff BEFORE AFTER       per-module time change between two
+                                           runs or two Snort builds
+
+Examples:
+  snort -c snort.lua -r test.pcap --lua "$(python3 snort_profile.py lua)" > snort.log
+  snort_profile.py diff before.json after.json --name large_file
+  snort_profile.py diff ../test_retransmit/depth_runs/results.json depth_runs/results.json \\
+      --name large_file_depth_1460 --rules
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snorttest.snort_profile import (PROFILE_CONFIG, diff_profiles, format_profile,
+                                     format_profile_diff, merge_profiles, parse_profile)
+
+def load_profile(source, name=None):
+    """The (median) profile recorded in a Snort log or results file."""
+    with open(source, errors="replace") as f:
+        is_json = f.read(4096).lstrip()[:1] in ("{", "[")
+    if not is_json:
+        return parse_profile(source)
+    with open(source) as f:
+        data = json.load(f)
+
+    if isinstance(data, dict) and "profiles" in data:
+        # snort_throughput.py results: {"profiles": {scenario: [profile per run]}}
+        candidates = data["profiles"]
+    else:
+        # Job results: a list of result dicts, or a single one
+        candidates = {}
+        for result in data if isinstance(data, list) else [data]:
+            if result.get("profile"):
+                candidates.setdefault(result["name"], []).append(result["profile"])
+    if name is None and len(candidates) == 1:
+        name = next(iter(candidates))
+    if name not in candidates:
+        available = ", ".join(sorted(candidates)) or "none"
+        sys.exit(f"{source}: pick a profiled run with --name (available: {available})")
+    return merge_profiles(candidates[name])
+
+def main():
+    parser = argparse.ArgumentParser(description="Show and compare Snort profiler output")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("lua", help="print the Lua that enables profiling")
+    show = commands.add_parser("show", help="show one profile")
+    show.add_argument("source", help="Snort log or results JSON")
+    diff = commands.add_parser("diff", help="compare two profiles")
+    diff.add_argument("before", help="Snort log or results JSON")
+    diff.add_argument("after", help="Snort log or results JSON")
+    for command in (show, diff):
+        command.add_argument("--name", help="job or scenario name in a results file")
+        command.add_argument("--rules", action="store_true", help="rules instead of modules")
+        command.add_argument("--top", type=int, default=20, help="entries to show (default 20)")
+        command.add_argument("--json", action="store_true", help="print JSON")
+    args = parser.parse_args()
+
+    if args.command == "lua":
+        print(PROFILE_CONFIG.strip())
+        return
+    section = "rules" if args.rules else "modules"
+    if args.command == "show":
+        profile = load_profile(args.source, args.name)
+        if not profile.get(section):
+            sys.exit(f"{args.source}: no {section} profile (was Snort run with profiling?)")
+        print(json.dumps(profile[section], indent=2) if args.json else
+              format_profile(profile, section, args.top))
+        return
+
+    rows = diff_profiles(load_profile(args.before, args.name), load_profile(args.after, args.name),
+                         section)
+    if not rows:
+        sys.exit(f"No {section} profile in either input (was Snort run with profiling?)")
+    print(json.dumps(rows, indent=2) if args.json else format_profile_diff(rows, args.top))
+
+if __name__ == "__main__":
+    main()
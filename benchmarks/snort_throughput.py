@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Measure Snort throughput on the test scenarios and flag regressions.
+
+Each scenario's capture is generated (or taken from the pcap cache), then
+Snort replays it --loops times per run with --pcap-loop, --runs times. Every
+run records Snort's end-of-run pkts/sec and Mbits/sec plus wall time, CPU
+time and max RSS of the Snort process. Medians over the runs are written to
+--output and, with --baseline, compared against a previous results file;
+any metric worse than --tolerance makes the script exit non-zero.
+
+Scenarios:
+  large_file       5 MB HTTP download (test_retransmit/create_large_pcap.py)
+  reassembly       out-of-order/partial flush session (tcp_reassembly_test)
+  paws             PAWS timestamp violation session (paws_test)
+  retransmit_hold  retransmit during a held file verdict (test_retransmit)
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "test_retransmit"))
+from snort_configs import FILE_MAGIC_RULES, large_depth_config
+from snorttest import bench
+from snorttest.runner import ConfigError, SnortJob, run_job
+from snorttest.snort_log import parse_stats
+
+SCENARIOS = {
+    "large_file": {
+        "dir": "test_retransmit",
+        "generate": ["create_large_pcap.py", "--size-mb", "5"],
+        "pcap": "large_file.pcap",
+        "config": large_depth_config(1460),
+        "files": {"file_magic.rules": FILE_MAGIC_RULES},
+        "args": ["-Q"],
+    },
+    "reassembly": {
+        "dir": "tcp_reassembly_test",
+        "generate": ["generate_tcp_reassembly_test_pcap.py", "--seed", "1"],
+        "pcap": "tcp_reassembly_test.pcap",
+        "config_file": "snort_tcp_reassembly_test.lua",
+    },
+    "paws": {
+        "dir": "paws_test",
+        "generate": ["generate_paws_test_pcap.py", "--seed", "1"],
+        "pcap": "paws_test.pcap",
+        "config_file": "snort_paws_test.lua",
+    },
+    "retransmit_hold": {
+        "dir": "test_retransmit",
+        "generate": ["create_pcap.py", "--seed", "1"],
+        "pcap": "retransmit_test.pcap",
+        "config_file": "snort.lua",
+        "files": {"file_magic.rules": FILE_MAGIC_RULES},
+        "args": ["-Q"],
+    },
+}
+
+def prepare_scenario(name, scenario):
+    """Generate the scenario's capture and return (scenario dir, pcap, config text)."""
+    directory = os.path.join(ROOT, scenario["dir"])
+    subprocess.run([sys.executable, *scenario["generate"]], cwd=directory, check=True,
+                   stdout=subprocess.DEVNULL)
+    config = scenario.get("config")
+    if config is None:
+        with open(os.path.join(directory, scenario["config_file"])) as f:
+            config = f.read()
+    return directory, os.path.join(directory, scenario["pcap"]), config
+
+def snort_version(snort):
+    try:
+        proc = subprocess.run([snort, "-V"], capture_output=True, text=True, timeout=30)
+    except OSError:
+        return None
+    for line in (proc.stdout + proc.stderr).splitlines():
+        if "Version" in line:
+            return line.strip(" o\")~")
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Snort throughput per scenario")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append",
+                        help="scenario(s) to run (default: all)")
+    parser.add_argument("--runs", type=int, default=3, help="runs per scenario")
+    parser.add_argument("--loops", type=int, default=10, help="--pcap-loop count per run")
+    parser.add_argument("--snort", default="snort", help="Snort binary")
+    parser.add_argument("--output", default="snort_bench.json", help="results JSON file")
+    parser.add_argument("--output-dir", default="bench_runs", help="per-run working directories")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed relative change before a metric counts as a regression")
+    parser.add_argument("--timeout", type=float, help="per-run timeout in seconds")
+    parser.add_argument("--profile", action="store_true",
+                        help="also record Snort's per-module/per-rule profile of every run "
+                             "(profiling slows Snort down; compare profiled runs only with each other)")
+    args = parser.parse_args()
+
+    snort = os.path.abspath(args.snort) if os.sep in args.snort else args.snort
+    names = args.scenario or list(SCENARIOS)
+    results = {"environment": bench.environment(), "snort": snort_version(snort),
+               "runs_per_scenario": args.runs, "loops": args.loops, "runs": {}, "scenarios": {}, "profiles": {}}
+
+    for name in names:
+        scenario = SCENARIOS[name]
+        directory, pcap, config = prepare_scenario(name, scenario)
+        job_args = ["-k", "none", "--pcap-loop", str(args.loops), *scenario.get("args", [])]
+        runs = []
+        for i in range(args.runs):
+            job = SnortJob(f"{name}_run{i + 1}", config, pcap, params={"scenario": name, "run": i + 1},
+                           files=scenario.get("files"), args=job_args, profile=args.profile)
+            try:
+                result = run_job(job, os.path.join(args.output_dir, job.name), snort=snort,
+                                 support_dir=directory, timeout=args.timeout)
+            except ConfigError as e:
+                sys.exit(str(e))
+            metrics = bench.snort_run_metrics(result, parse_stats(result["log"]))
+            runs.append(metrics)
+            if args.profile:
+                results["profiles"].setdefault(name, []).append(result["profile"])
+            print(f"{job.name}: {metrics['pkts_per_sec']:.0f} pkts/s, {metrics['mbits_per_sec']:.1f} Mbit/s, "
+                  f"wall {metrics['wall_time']:.2f}s, cpu {metrics['cpu_time']:.2f}s, "
+                  f"rss {metrics['max_rss_kb'] / 1024:.0f} MB")
+        results["runs"][name] = runs
+        results["scenarios"][name] = bench.aggregate(runs, bench.SNORT_METRICS)
+
+    regressions = []
+    if args.baseline:
+        regressions = bench.compare(results["scenarios"], bench.load_baseline(args.baseline),
+                                    bench.SNORT_METRICS, args.tolerance)
+        results["baseline"] = args.baseline
+        results["tolerance"] = args.tolerance
+        results["regressions"] = regressions
+    bench.save_results(args.output, results)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print("  " + bench.format_regression(regression))
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
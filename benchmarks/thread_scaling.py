@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Measure how Snort's throughput and per-packet latency scale with packet threads.
+
+A multi-flow capture (a given pcap, or a generated multi_flow() capture) is
+split by a flow-affine 5-tuple hash into N shards for every thread count N
+(see snorttest.shard), all in one pass over the capture. Each point runs
+Snort with -z N over the N-shard list, so every packet thread reads its own
+shard and no flow is split between threads. Per-packet latency comes from
+Snort's latency module counters: the average is total_usecs over
+total_packets, both summed over the threads, and the worst is max_usecs,
+the largest of any thread.
+
+Reported per thread count: pkts/sec, Mbits/sec, speedup and efficiency
+against one thread, CPU time, average and worst packet latency, and the
+shard imbalance (largest shard over the mean), which caps the speedup.
+A given pcap is always read with a 65535-byte snaplen, since its frames
+may be jumbo frames or super-segments; --segment-size only describes the
+generated capture.
+
+Examples:
+  thread_scaling.py --flows 10000 --threads 1 2 4 8
+  thread_scaling.py --pcap big.pcap --threads 1 2 4 8 16 --loops 5 --runs 3
+"""
+
+import argparse
+import os
+import statistics
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "test_retransmit"))
+from snort_configs import FILE_MAGIC_RULES
+from snorttest import bench
+from snorttest.flows import (DEFAULT_SEGMENT_SIZE, MAX_SEGMENT_SIZE, multi_flow, parse_segment_size,
+                             snaplen_args)
+from snorttest.lua_config import file_inspection_config
+from snorttest.pcap_cache import cached_outputs
+from snorttest.pcap_writer import write_pcap
+from snorttest.runner import ConfigError, SnortJob, run_job
+from snorttest.shard import imbalance, shard_sets
+from snorttest.snort_log import parse_stats
+
+def capture(directory, flows, size_dist, segment_size, seed):
+    """Path of the (cached) generated capture of flows concurrent downloads."""
+    name = f"flows_{flows}.pcap"
+
+    def build(target):
+        frames = multi_flow(flows, size_dist=size_dist, seed=seed, segment_size=segment_size)
+        return {"packets": write_pcap(os.path.join(target, name), frames)}
+
+    cached_outputs("thread_scaling", {"flows": flows, "size_dist": size_dist,
+                                      "segment_size": segment_size},
+                   build, [name], seed=seed, sources=[__file__], dest=directory)
+    return os.path.join(directory, name)
+
+def snort_config(args):
+    if args.config:
+        with open(args.config) as f:
+            return f.read()
+    config = file_inspection_config(args.type_depth)
+    # Tracing every flow would serialize the threads on the log
+    config.remove("trace")
+    config.set("latency", {}, "Per-packet latency counters")
+    return config.render()
+
+def latency(stats):
+    """Average and worst packet latency (usecs) from the latency module's counters."""
+    counters = stats.get("latency", {})
+    packets = counters.get("total_packets", 0)
+    return {"avg_latency_usecs": counters.get("total_usecs", 0) / packets if packets else None,
+            "max_latency_usecs": counters.get("max_usecs")}
+
+def measure(args, config, threads, manifest):
+    """Median metrics of --runs runs over the threads-shard set."""
+    pcaps = [shard["file"] for shard in manifest["shards"]]
+    runs = []
+    for i in range(args.runs):
+        job = SnortJob(f"threads_{threads}_run{i + 1}", config, pcaps,
+                       params={"threads": threads, "run": i + 1},
+                       files={"file_magic.rules": FILE_MAGIC_RULES},
+                       args=["-k", "none", "-z", str(threads), "--pcap-loop", str(args.loops),
+                             *snaplen_args(MAX_SEGMENT_SIZE if args.pcap else args.segment_size)])
+        result = run_job(job, os.path.join(args.output_dir, job.name), snort=args.snort,
+                         support_dir=os.path.join(ROOT, "test_retransmit"), timeout=args.timeout)
+        if result["returncode"] != 0:
+            sys.exit(f"Snort exited with {result['returncode']}; see {result['log']}")
+        stats = parse_stats(result["log"])
+        runs.append(dict(bench.snort_run_metrics(result, stats), **latency(stats)))
+    point = {"threads": threads, "imbalance": imbalance(manifest),
+             "shards": manifest["shards"], "runs": runs}
+    for name in list(bench.SNORT_METRICS) + ["avg_latency_usecs", "max_latency_usecs"]:
+        values = [run[name] for run in runs if isinstance(run.get(name), (int, float))]
+        point[name] = statistics.median(values) if values else None
+    return point
+
+def scaling(points):
+    """Speedup and efficiency of each point against the smallest thread count."""
+    base = points[0]
+    for point in points:
+        point["speedup"] = (point["pkts_per_sec"] / base["pkts_per_sec"]
+                            if point["pkts_per_sec"] is not None and base["pkts_per_sec"] else None)
+        point["efficiency"] = (point["speedup"] * base["threads"] / point["threads"]
+                               if point["speedup"] is not None else None)
+
+def number(value, spec):
+    return "-" if value is None else format(value, spec)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep Snort packet threads over a sharded capture")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--pcap", help="capture to shard instead of a generated one")
+    source.add_argument("--flows", type=int, default=10000, help="flows in the generated capture")
+    parser.add_argument("--size-dist", default="lognormal:64K:1.0",
+                        help="file size distribution of the generated flows")
+    parser.add_argument("--segment-size", type=parse_segment_size, default=DEFAULT_SEGMENT_SIZE,
+                        help="TCP payload per segment, up to 65481 (or min, ethernet, jumbo, super)")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="packet thread counts (-z)")
+    parser.add_argument("--type-depth", type=int, default=1460, help="file_id type_depth")
+    parser.add_argument("-c", "--config", help="Snort Lua config instead of the generated one")
+    parser.add_argument("--loops", type=int, default=1, help="--pcap-loop count per run")
+    parser.add_argument("--runs", type=int, default=1, help="runs per point (median is reported)")
+    parser.add_argument("--reshard", action="store_true", help="split the capture again")
+    parser.add_argument("--seed", type=int, default=0, help="flow seed")
+    parser.add_argument("--snort", default="snort", help="Snort binary")
+    parser.add_argument("--timeout", type=float, help="per-run timeout in seconds")
+    parser.add_argument("--output", default="thread_scaling.json", help="results JSON file")
+    parser.add_argument("--output-dir", default="thread_runs", help="shards and per-run working directories")
+    args = parser.parse_args()
+
+    args.snort = os.path.abspath(args.snort) if os.sep in args.snort else args.snort
+    threads = sorted(set(args.threads))
+    if threads[0] < 1:
+        parser.error("thread counts must be at least 1")
+    pcap = args.pcap or capture(os.path.join(args.output_dir, "pcaps"), args.flows, args.size_dist,
+                                args.segment_size, args.seed)
+    shards = shard_sets(pcap, os.path.join(args.output_dir, "shards"), threads, args.reshard)
+    config = snort_config(args)
+    points = []
+    try:
+        for count in threads:
+            point = measure(args, config, count, shards[count])
+            points.append(point)
+            print(f"  {count} thread(s): {number(point['pkts_per_sec'], '.0f')} pkts/s, "
+                  f"imbalance {point['imbalance']:.2f}")
+    except ConfigError as e:
+        sys.exit(str(e))
+    scaling(points)
+
+    results = {"environment": bench.environment(), "pcap": os.path.abspath(pcap),
+               "loops": args.loops, "points": points}
+    bench.save_results(args.output, results)
+
+    print(f"\n{'threads':>7} {'pkts/s':>11} {'Mbit/s':>9} {'speedup':>8} {'effic.':>7} "
+          f"{'CPU s':>8} {'avg us':>8} {'max us':>9} {'imbal.':>7}")
+    for point in points:
+        print(f"{point['threads']:>7} {number(point['pkts_per_sec'], '.0f'):>11} "
+              f"{number(point['mbits_per_sec'], '.1f'):>9} "
+              f"{number(point['speedup'], '.2f'):>8} {number(point['efficiency'], '.0%'):>7} "
+              f"{number(point['cpu_time'], '.2f'):>8} {number(point['avg_latency_usecs'], '.1f'):>8} "
+              f"{number(point['max_latency_usecs'], '.0f'):>9} {point['imbalance']:>7.2f}")
+    print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Generate and run a large multi-flow PAWS scenario matrix.
+
+Where generate_paws_test_pcap.py hand-codes one violation (TSval 350 after
+600), this builds many flows whose TSval/TSecr and seq/ack columns are
+computed in bulk (see snorttest.paws): old and equal timestamps, TSval
+wraparound near 2^32, idle periods past the 24-day PAWS window and
+sequence number wraparound, round-robin over the chosen scenarios.
+
+  generate_paws_matrix.py generate --flows 100000 -o paws_matrix.pcap
+  generate_paws_matrix.py run --flows 100000 [--profile]
+      run Snort (inline, built-in stream_tcp events) and report per
+      scenario how many probes raised the PAWS event (129:4) against the
+      expected verdict, plus the run time
+  generate_paws_matrix.py check --flows 100000 --alerts output/snort.log
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snorttest.lua_config import Lua, LuaConfig, stream_tcp
+from snorttest.paws import IDLE_SECONDS, SCENARIOS, check_paws, paws_alerts, paws_matrix
+from snorttest.pcap_cache import cached_outputs
+from snorttest.pcap_writer import write_pcap
+from snorttest.runner import ConfigError, SnortJob, run_job
+from snorttest.snort_profile import format_profile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def matrix_config(policy="bsd"):
+    """The PAWS test's stream and normalizer settings with only the built-in rules."""
+    # Long enough timeouts that the idle scenario's flows survive their idle period
+    timeout = IDLE_SECONDS + 24 * 3600
+    config = LuaConfig(home_net="192.168.1.0/24", external_net="10.1.1.0/24")
+    config.set("stream", {"tcp_cache": {"idle_timeout": timeout}}, "Stream configuration")
+    config.set("stream_tcp", stream_tcp(policy=policy, session_timeout=timeout, max_window=65535,
+                                        show_rebuilt_packets=False, flush_factor=None))
+    config.set("normalizer", {"tcp": {"ips": True}}, "TCP normalization (inline)")
+    config.set("wizard", Lua("default_wizard"))
+    config.set("ips", {"enable_builtin_rules": True}, "Built-in rules raise the PAWS event")
+    return config.render()
+
+def generate(output, args, use_cache=True):
+    name = os.path.basename(output)
+    params = {"flows": args.flows, "scenarios": args.scenarios, "data_packets": args.data_packets,
+              "segment_size": args.segment_size, "spacing": args.spacing}
+
+    def build(directory):
+        frames = paws_matrix(args.flows, args.scenarios, args.seed, args.data_packets,
+                             args.segment_size, spacing=args.spacing)
+        return {"packets": write_pcap(os.path.join(directory, name), frames)}
+
+    _, info = cached_outputs("paws_matrix", params, build, [name], seed=args.seed,
+                             sources=[__file__], dest=os.path.dirname(output) or ".",
+                             use_cache=use_cache)
+    print(f"Created {output}: {args.flows} flows, {info['packets']} packets")
+    return info
+
+def report(summary):
+    print(f"{'scenario':<12} {'expected':>8} {'flows':>8} {'alerted':>8} {'missed':>7} {'false':>6}")
+    for scenario, entry in summary.items():
+        print(f"{scenario:<12} {entry['expected']:>8} {entry['flows']:>8} {entry['alerted']:>8} "
+              f"{entry['missed']:>7} {entry['false_alarms']:>6}")
+    wrong = sum(entry["missed"] + entry["false_alarms"] for entry in summary.values())
+    print(f"{wrong} flow(s) with an unexpected PAWS verdict")
+    return 1 if wrong else 0
+
+def cmd_generate(args):
+    generate(args.output, args, not args.no_cache)
+    return 0
+
+def cmd_run(args):
+    pcap = os.path.join(args.output_dir, "paws_matrix.pcap")
+    info = generate(pcap, args, not args.no_cache)
+    job = SnortJob(f"paws_{args.policy}", matrix_config(args.policy), pcap,
+                   params={"flows": args.flows, "scenarios": args.scenarios, "policy": args.policy},
+                   args=("-A", "alert_fast", "-k", "none", "-Q"), profile=args.profile)
+    try:
+        result = run_job(job, os.path.join(args.output_dir, job.name), snort=args.snort,
+                         support_dir=HERE, timeout=args.timeout)
+    except ConfigError as e:
+        sys.exit(str(e))
+    print(f"Snort processed {result['total_packets']} packets in {result['wall_time']:.2f}s "
+          f"({result['cpu_user']:.2f}s user CPU, "
+          f"{info['packets'] / max(result['wall_time'], 1e-9):.0f} packets/s)")
+    if args.profile:
+        print(format_profile(result["profile"]))
+    summary = check_paws(args.flows, args.scenarios, paws_alerts(result["log"]))
+    with open(os.path.join(args.output_dir, "paws_matrix.json"), "w") as f:
+        json.dump({"result": result, "summary": summary}, f, indent=2)
+    return report(summary)
+
+def cmd_check(args):
+    return report(check_paws(args.flows, args.scenarios, paws_alerts(args.alerts)))
+
+def scenario_list(text):
+    scenarios = text.split(",")
+    for scenario in scenarios:
+        if scenario not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {scenario!r} "
+                                             f"(choose from {', '.join(SCENARIOS)})")
+    return scenarios
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-flow PAWS timestamp scenario matrix")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def matrix_arguments(p):
+        p.add_argument("--flows", type=int, default=10000, help="number of flows")
+        p.add_argument("--scenarios", type=scenario_list, default=list(SCENARIOS),
+                       help="comma-separated scenarios, assigned round-robin (default: all)")
+        p.add_argument("--seed", type=int, default=1, help="ISN / timestamp seed")
+
+    def generator_arguments(p):
+        matrix_arguments(p)
+        p.add_argument("--data-packets", type=int, default=4, help="data segments before the probe")
+        p.add_argument("--segment-size", type=int, default=100, help="client segment size")
+        p.add_argument("--spacing", type=float, default=0.0005, help="seconds between flow starts")
+        p.add_argument("--no-cache", action="store_true", help="always regenerate the PCAP")
+
+    p = sub.add_parser("generate", help="write the capture")
+    generator_arguments(p)
+    p.add_argument("-o", "--output", default="paws_matrix.pcap", help="PCAP file to write")
+    p.set_defaults(func=cmd_generate)
+
+    p = sub.add_parser("run", help="generate, run Snort and check the verdicts")
+    generator_arguments(p)
+    p.add_argument("--policy", default="bsd", help="stream_tcp policy")
+    p.add_argument("--profile", action="store_true", help="record Snort's per-module profile")
+    p.add_argument("--snort", default="snort", help="Snort binary")
+    p.add_argument("--timeout", type=float, help="Snort timeout in seconds")
+    p.add_argument("--output-dir", default="paws_matrix_output", help="capture and Snort working directory")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser("check", help="check the PAWS events in a Snort alert_fast log")
+    matrix_arguments(p)
+    p.add_argument("--alerts", required=True, help="Snort log with alert_fast output")
+    p.set_defaults(func=cmd_check)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+if __name__ == "__main__":
+    main()
@@ -4,144 +4,154 @@ Generate a PCAP file with TCP packets having out-of-order timestamps to test
 Snort's PAWS (Protection Against Wrapped Sequence numbers) validation.
 """
 
-from scapy.all import *
+import argparse
+import os
 import random
-import time
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snorttest.pcap_cache import cached_outputs
+from snorttest.pcap_writer import TcpFlow, encode_tcp_options, timestamp_option, write_pcap
+
+def paws_test_packets(rng=random):
+    """Yield the TCP packets of the PAWS test session in capture order."""
 
-def create_paws_test_pcap(filename="paws_test.pcap"):
-    """Create a PCAP file with TCP packets having timestamp issues."""
-    
     # Define IP addresses
     client_ip = "192.168.1.100"
     server_ip = "10.1.1.100"
     client_port = 49152
     server_port = 80
-    
+    flow = TcpFlow(client_ip, server_ip, client_port, server_port)
+
     # Initialize sequence numbers
-    client_seq = random.randint(1000000, 9000000)
-    server_seq = random.randint(1000000, 9000000)
-    
-    # Create packets list
-    packets = []
-    
+    client_seq = rng.randint(1000000, 9000000)
+    server_seq = rng.randint(1000000, 9000000)
+
     # 1. TCP 3-way handshake with normal timestamps
     # SYN
-    syn = Ether()/IP(src=client_ip, dst=server_ip)/TCP(
-        sport=client_port, dport=server_port, flags="S", seq=client_seq,
-        options=[('MSS', 1460), ('NOP', None), ('NOP', None), 
-                 ('Timestamp', (100, 0)), ('WScale', 7)]
+    syn = flow.client(
+        flags="S", seq=client_seq,
+        options=encode_tcp_options([('MSS', 1460), ('NOP', None), ('NOP', None),
+                                    ('Timestamp', (100, 0)), ('WScale', 7)])
     )
-    packets.append(syn)
-    
+    yield syn
+
     # SYN-ACK
-    syn_ack = Ether()/IP(src=server_ip, dst=client_ip)/TCP(
-        sport=server_port, dport=client_port, flags="SA", 
-        seq=server_seq, ack=client_seq+1,
-        options=[('MSS', 1460), ('NOP', None), ('NOP', None), 
-                 ('Timestamp', (200, 100)), ('WScale', 7)]
+    syn_ack = flow.server(
+        flags="SA", seq=server_seq, ack=client_seq+1,
+        options=encode_tcp_options([('MSS', 1460), ('NOP', None), ('NOP', None),
+                                    ('Timestamp', (200, 100)), ('WScale', 7)])
     )
-    packets.append(syn_ack)
-    
+    yield syn_ack
+
     # ACK
-    ack = Ether()/IP(src=client_ip, dst=server_ip)/TCP(
-        sport=client_port, dport=server_port, flags="A", 
-        seq=client_seq+1, ack=server_seq+1,
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (300, 200))]
+    ack = flow.client(
+        flags="A", seq=client_seq+1, ack=server_seq+1,
+        options=timestamp_option(300, 200)
     )
-    packets.append(ack)
-    
+    yield ack
+
     # 2. Normal data exchange with increasing timestamps
     # Client -> Server (HTTP GET)
-    http_get = Ether()/IP(src=client_ip, dst=server_ip)/TCP(
-        sport=client_port, dport=server_port, flags="PA", 
-        seq=client_seq+1, ack=server_seq+1,
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (400, 200))]
-    )/Raw(load="GET / HTTP/1.1\r\nHost: example.com\r\n\r\n")
-    packets.append(http_get)
-    
+    get_load = b"GET / HTTP/1.1\r\nHost: example.com\r\n\r\n"
+    http_get = flow.client(
+        flags="PA", seq=client_seq+1, ack=server_seq+1,
+        payload=get_load, options=timestamp_option(400, 200)
+    )
+    yield http_get
+
     # Server -> Client (ACK)
-    server_ack = Ether()/IP(src=server_ip, dst=client_ip)/TCP(
-        sport=server_port, dport=client_port, flags="A", 
-        seq=server_seq+1, ack=client_seq+1+len(http_get[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (500, 400))]
+    server_ack = flow.server(
+        flags="A", seq=server_seq+1, ack=client_seq+1+len(get_load),
+        options=timestamp_option(500, 400)
     )
-    packets.append(server_ack)
-    
+    yield server_ack
+
     # Server -> Client (HTTP Response)
-    http_resp = Ether()/IP(src=server_ip, dst=client_ip)/TCP(
-        sport=server_port, dport=client_port, flags="PA", 
-        seq=server_seq+1, ack=client_seq+1+len(http_get[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (600, 400))]
-    )/Raw(load="HTTP/1.1 200 OK\r\nContent-Length: 13\r\n\r\nHello, World!")
-    packets.append(http_resp)
-    
+    resp_load = b"HTTP/1.1 200 OK\r\nContent-Length: 13\r\n\r\nHello, World!"
+    http_resp = flow.server(
+        flags="PA", seq=server_seq+1, ack=client_seq+1+len(get_load),
+        payload=resp_load, options=timestamp_option(600, 400)
+    )
+    yield http_resp
+
     # Client -> Server (ACK)
-    client_ack = Ether()/IP(src=client_ip, dst=server_ip)/TCP(
-        sport=client_port, dport=server_port, flags="A", 
-        seq=client_seq+1+len(http_get[Raw]), ack=server_seq+1+len(http_resp[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (700, 600))]
+    client_ack = flow.client(
+        flags="A", seq=client_seq+1+len(get_load), ack=server_seq+1+len(resp_load),
+        options=timestamp_option(700, 600)
     )
-    packets.append(client_ack)
-    
+    yield client_ack
+
     # 3. PAWS violation: Client sends packet with timestamp in the past
-    paws_violation = Ether()/IP(src=client_ip, dst=server_ip)/TCP(
-        sport=client_port, dport=server_port, flags="PA", 
-        seq=client_seq+1+len(http_get[Raw]), ack=server_seq+1+len(http_resp[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (350, 600))]  # Timestamp older than previous packet
-    )/Raw(load="Additional data with old timestamp")
-    packets.append(paws_violation)
-    
+    paws_load = b"Additional data with old timestamp"
+    paws_violation = flow.client(
+        flags="PA", seq=client_seq+1+len(get_load), ack=server_seq+1+len(resp_load),
+        payload=paws_load,
+        options=timestamp_option(350, 600)  # Timestamp older than previous packet
+    )
+    yield paws_violation
+
     # 4. Normal packet after PAWS violation
-    normal_after_paws = Ether()/IP(src=client_ip, dst=server_ip)/TCP(
-        sport=client_port, dport=server_port, flags="PA", 
-        seq=client_seq+1+len(http_get[Raw])+len(paws_violation[Raw]), 
-        ack=server_seq+1+len(http_resp[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (800, 600))]
-    )/Raw(load="Normal packet after PAWS violation")
-    packets.append(normal_after_paws)
-    
+    normal_load = b"Normal packet after PAWS violation"
+    normal_after_paws = flow.client(
+        flags="PA", seq=client_seq+1+len(get_load)+len(paws_load),
+        ack=server_seq+1+len(resp_load),
+        payload=normal_load, options=timestamp_option(800, 600)
+    )
+    yield normal_after_paws
+
+    # Client sequence number once all data has been sent
+    client_next = client_seq+1+len(get_load)+len(paws_load)+len(normal_load)
+
     # 5. Connection teardown
     # FIN from client
-    fin = Ether()/IP(src=client_ip, dst=server_ip)/TCP(
-        sport=client_port, dport=server_port, flags="FA", 
-        seq=client_seq+1+len(http_get[Raw])+len(paws_violation[Raw])+len(normal_after_paws[Raw]), 
-        ack=server_seq+1+len(http_resp[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (900, 600))]
+    fin = flow.client(
+        flags="FA", seq=client_next, ack=server_seq+1+len(resp_load),
+        options=timestamp_option(900, 600)
     )
-    packets.append(fin)
-    
+    yield fin
+
     # FIN-ACK from server
-    fin_ack = Ether()/IP(src=server_ip, dst=client_ip)/TCP(
-        sport=server_port, dport=client_port, flags="FA", 
-        seq=server_seq+1+len(http_resp[Raw]), 
-        ack=client_seq+2+len(http_get[Raw])+len(paws_violation[Raw])+len(normal_after_paws[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (1000, 900))]
+    fin_ack = flow.server(
+        flags="FA", seq=server_seq+1+len(resp_load), ack=client_next+1,
+        options=timestamp_option(1000, 900)
     )
-    packets.append(fin_ack)
-    
+    yield fin_ack
+
     # ACK from client
-    last_ack = Ether()/IP(src=client_ip, dst=server_ip)/TCP(
-        sport=client_port, dport=server_port, flags="A", 
-        seq=client_seq+2+len(http_get[Raw])+len(paws_violation[Raw])+len(normal_after_paws[Raw]), 
-        ack=server_seq+2+len(http_resp[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (1100, 1000))]
+    last_ack = flow.client(
+        flags="A", seq=client_next+1, ack=server_seq+2+len(resp_load),
+        options=timestamp_option(1100, 1000)
     )
-    packets.append(last_ack)
-    
-    # Write packets to PCAP file
-    wrpcap(filename, packets)
+    yield last_ack
+
+
+def create_paws_test_pcap(filename="paws_test.pcap", seed=None, use_cache=True):
+    """
+    Create a PCAP file with TCP packets having timestamp issues.
+
+    With a seed the sequence numbers are reproducible and the capture is
+    served from the pcap cache; without one every run is random, as before.
+    """
+    rng = random.Random(seed) if seed is not None else random
+    name = os.path.basename(filename)
+
+    def build(directory):
+        # Stream packets into the PCAP file as they are generated
+        return {"packets": write_pcap(os.path.join(directory, name), paws_test_packets(rng))}
+
+    _, info = cached_outputs("paws_test_packets", {}, build, [name], seed=seed, sources=[__file__],
+                             dest=os.path.dirname(filename) or ".",
+                             use_cache=use_cache and seed is not None)
+    count = info["packets"]
     print(f"Created PCAP file: {filename}")
-    print(f"PAWS violation packet is packet #{packets.index(paws_violation)+1}")
+    # The violation is followed by one data packet and the 3-packet teardown
+    print(f"PAWS violation packet is packet #{count-4}")
 
 if __name__ == "__main__":
-    create_paws_test_pcap()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate the PAWS timestamp validation test PCAP")
+    parser.add_argument("-o", "--output", default="paws_test.pcap", help="PCAP file to write")
+    parser.add_argument("--seed", type=int, help="seed for the sequence numbers (enables the pcap cache)")
+    parser.add_argument("--no-cache", action="store_true", help="always regenerate the PCAP")
+    args = parser.parse_args()
+    create_paws_test_pcap(args.output, args.seed, use_cache=not args.no_cache)
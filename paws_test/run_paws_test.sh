@@ -10,17 +10,24 @@ OUTPUT_DIR="output"
 # Create output directory
 mkdir -p $OUTPUT_DIR
 
-# Generate the PCAP file
+# Generate the PCAP file (cached per seed; set PCAP_SEED to vary the sequence numbers)
 echo "Generating PCAP file with PAWS timestamp violation..."
-python3 generate_paws_test_pcap.py
+python3 generate_paws_test_pcap.py --seed "${PCAP_SEED:-1}" -o $PCAP_FILE
 
-# Validate Snort configuration
+# Validate Snort configuration (skipped when this config, snort_defaults.lua
+# and the Snort binary are unchanged since the last successful check)
 echo "Validating Snort configuration..."
-$SNORT_BIN -c $CONFIG_FILE -T
+python3 ../test_retransmit/snort_configs.py validate $CONFIG_FILE --snort $SNORT_BIN
+
+# Set SNORT_PROFILE=1 to add Snort's per-module/per-rule profiler and perf_monitor
+PROFILE_ARGS=()
+if [ -n "$SNORT_PROFILE" ]; then
+    PROFILE_ARGS=(--lua "$(python3 ../benchmarks/snort_profile.py lua)")
+fi
 
 # Run Snort with the test PCAP
 echo "Running Snort with PAWS test PCAP..."
-$SNORT_BIN -c $CONFIG_FILE -r $PCAP_FILE -A csv -l $OUTPUT_DIR -v
+$SNORT_BIN -c $CONFIG_FILE -r $PCAP_FILE -A csv -l $OUTPUT_DIR -v "${PROFILE_ARGS[@]}"
 
 # Display results
 echo "Test completed. Check the following files for results:"
@@ -0,0 +1,6 @@
+"""
+Shared helpers for the Snort integration test generators and runners.
+
+The scenario directories (test_retransmit, tcp_reassembly_test, paws_test)
+add the repository root to sys.path and import from here.
+"""
@@ -0,0 +1,127 @@
+"""
+Batch captures: many scenarios in one PCAP, one Snort run.
+
+Each scenario gets its own client port and closes its connection, so
+anything Snort does when a flow ends (flushing, file completion) happens
+on the flow's own packets. The manifest written next to the capture
+records, per scenario, its name, parameters, client port and 1-based
+packet range. Detections in a Snort -v log are mapped back to their
+scenario by the ports in the dump of the packet they were made on; the
+packet range is only a sanity check, so scenarios may be interleaved.
+"""
+
+import bisect
+import json
+import re
+
+from snorttest.snort_log import FILE_TYPE_MARKER, FILE_TYPE_RE, PROCESSING_RE
+
+# Port pair of a -v packet dump: Snort 3's tcp/udp codec line, or the
+# "addr:port -> addr:port" header line
+PORTS_RES = (re.compile(r"SrcPort:\s*(\d+)\s+DstPort:\s*(\d+)"),
+             re.compile(r"[\d.]+:(\d+) -> [\d.]+:(\d+)"))
+
+
+class BatchManifest:
+    """Packet ranges of the scenarios packed into one capture."""
+
+    def __init__(self, pcap_file):
+        self.pcap_file = pcap_file
+        self.scenarios = []
+        self._next_packet = 1
+        self._firsts = None
+
+    def add(self, name, packet_count, **params):
+        """Record a scenario occupying the next packet_count packets."""
+        first = self._next_packet
+        self._next_packet += packet_count
+        self._firsts = None
+        self.scenarios.append(dict(name=name, first_packet=first,
+                                   last_packet=first + packet_count - 1, **params))
+
+    def find(self, packet_num):
+        """Return the scenario that contains packet_num, or None."""
+        if self._firsts is None:
+            self._firsts = [s["first_packet"] for s in self.scenarios]
+        i = bisect.bisect_right(self._firsts, packet_num) - 1
+        if i >= 0 and packet_num <= self.scenarios[i]["last_packet"]:
+            return self.scenarios[i]
+        return None
+
+    def save(self, filename):
+        with open(filename, "w") as f:
+            json.dump({"pcap_file": self.pcap_file, "scenarios": self.scenarios}, f, indent=2)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename) as f:
+            data = json.load(f)
+        manifest = cls(data["pcap_file"])
+        manifest.scenarios = data["scenarios"]
+        if manifest.scenarios:
+            manifest._next_packet = manifest.scenarios[-1]["last_packet"] + 1
+        return manifest
+
+
+def _packet_ports(line):
+    for ports_re in PORTS_RES:
+        match = ports_re.search(line)
+        if match:
+            return int(match.group(1)), int(match.group(2))
+    return None
+
+
+def file_type_detections(log_file):
+    """
+    Yield (packet_num, ports, text) for every "File type:" line in a Snort
+    -v log. packet_num is the most recent "Processing packet N" and ports
+    the (source, destination) ports of that packet's dump, which may come
+    before or after the detection; None when the log has neither.
+    """
+    packet = ports = None
+    pending = []
+    with open(log_file, errors="replace") as f:
+        for line in f:
+            match = PROCESSING_RE.search(line) if "Processing packet" in line else None
+            if match:
+                for text in pending:
+                    yield packet, ports, text
+                packet, ports, pending = int(match.group(1)), None, []
+            elif FILE_TYPE_MARKER in line:
+                text = FILE_TYPE_RE.search(line)
+                pending.append(text.group(1) if text else line.rstrip("\n"))
+            elif ports is None and packet is not None:
+                ports = _packet_ports(line)
+    for text in pending:
+        yield packet, ports, text
+
+
+def map_detections(log_file, manifest):
+    """
+    Return one result per scenario, in manifest order: the first detection
+    packet (global and relative to the scenario's first packet), how many
+    detections it had and how many of those fell outside its packet range.
+    A detection is charged to the scenario whose client_port is one of its
+    packet's ports; the second value returned counts those matching none.
+    """
+    by_port = {s["client_port"]: i for i, s in enumerate(manifest.scenarios)}
+    if len(by_port) != len(manifest.scenarios):
+        raise ValueError("Batch scenarios must have distinct client ports")
+    results = [dict(s, packet=None, relative_packet=None, detections=0, outside_range=0)
+               for s in manifest.scenarios]
+    unmatched = 0
+    for packet_num, ports, _ in file_type_detections(log_file):
+        index = next((by_port[port] for port in ports or () if port in by_port), None)
+        if index is None:
+            unmatched += 1
+            continue
+        result = results[index]
+        result["detections"] += 1
+        in_range = packet_num is not None and result["first_packet"] <= packet_num <= result["last_packet"]
+        if not in_range:
+            result["outside_range"] += 1
+        if result["packet"] is None:
+            result["packet"] = packet_num
+            if in_range:
+                result["relative_packet"] = packet_num - result["first_packet"] + 1
+    return results, unmatched
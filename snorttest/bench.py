@@ -0,0 +1,165 @@
+"""
+Benchmark bookkeeping: per-run metrics, aggregation over repeated runs and
+comparison against a stored baseline.
+
+Every metric has a direction. A higher-is-better metric (e.g. pkts_per_sec)
+regresses when it drops more than the tolerance below the baseline; a
+lower-is-better one (e.g. wall_time) regresses when it rises more than the
+tolerance above it. Aggregates use the median of the runs, which is less
+sensitive to one noisy run than the mean.
+
+StageTimer splits the time of a generator pipeline into per-stage
+exclusive times, so nested stages are not counted twice.
+"""
+
+import collections
+import contextlib
+import json
+import platform
+import statistics
+import time
+
+HIGHER_IS_BETTER = "higher"
+LOWER_IS_BETTER = "lower"
+
+SNORT_METRICS = {
+    "pkts_per_sec": HIGHER_IS_BETTER,
+    "mbits_per_sec": HIGHER_IS_BETTER,
+    "wall_time": LOWER_IS_BETTER,
+    "cpu_time": LOWER_IS_BETTER,
+    "max_rss_kb": LOWER_IS_BETTER,
+}
+
+GENERATOR_METRICS = {
+    "pkts_per_sec": HIGHER_IS_BETTER,
+    "bytes_per_sec": HIGHER_IS_BETTER,
+    "wall_time": LOWER_IS_BETTER,
+    "peak_rss_kb": LOWER_IS_BETTER,
+}
+
+
+class StageTimer:
+    """
+    Exclusive time per named stage of a pipeline.
+
+    wrap() times every next() of an iterable and stage() times a block; time
+    spent in stages nested inside another is subtracted from the outer one.
+    """
+
+    def __init__(self):
+        self.totals = collections.Counter()
+        self._nested = []
+
+    def _finish(self, name, started):
+        elapsed = time.perf_counter() - started
+        self.totals[name] += elapsed - self._nested.pop()
+        if self._nested:
+            self._nested[-1] += elapsed
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        self._nested.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._finish(name, started)
+
+    def wrap(self, name, iterable):
+        iterator = iter(iterable)
+        while True:
+            self._nested.append(0.0)
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self._finish(name, started)
+                return
+            self._finish(name, started)
+            yield item
+
+
+def snort_run_metrics(result, stats):
+    """
+    Metrics of one Snort run from its runner result and parse_stats() output.
+
+    pkts/sec and Mbits/sec come from Snort's own timing summary when present
+    and are otherwise derived from the daq counters and wall time.
+    """
+    daq = stats.get("daq", {})
+    timing = stats.get("timing", {})
+    packets = daq.get("analyzed", daq.get("received", result.get("total_packets", 0)))
+    wall = result["wall_time"]
+    pkts_per_sec = timing.get("pkts/sec")
+    if not isinstance(pkts_per_sec, (int, float)):
+        pkts_per_sec = packets / wall if wall else 0.0
+    mbits_per_sec = timing.get("Mbits/sec")
+    if not isinstance(mbits_per_sec, (int, float)):
+        rx_bytes = daq.get("rx_bytes", 0)
+        mbits_per_sec = rx_bytes * 8 / wall / 1e6 if wall and rx_bytes else 0.0
+    return {
+        "packets": packets,
+        "pkts_per_sec": pkts_per_sec,
+        "mbits_per_sec": mbits_per_sec,
+        "wall_time": wall,
+        "cpu_time": result["cpu_user"] + result["cpu_system"],
+        "max_rss_kb": result["max_rss_kb"],
+    }
+
+
+def aggregate(runs, metrics):
+    """Median, min and max of each metric over a list of run dicts."""
+    summary = {}
+    for name in metrics:
+        values = [run[name] for run in runs if isinstance(run.get(name), (int, float))]
+        if values:
+            summary[name] = {"median": statistics.median(values),
+                             "min": min(values), "max": max(values)}
+    return summary
+
+
+def compare(current, baseline, metrics, tolerance=0.1):
+    """
+    Compare aggregated scenarios against a baseline.
+
+    current and baseline map scenario name to aggregate() output. Returns a
+    list of dicts describing each regression (empty when none).
+    """
+    regressions = []
+    for scenario, summary in current.items():
+        base = baseline.get(scenario)
+        if not base:
+            continue
+        for name, direction in metrics.items():
+            if name not in summary or name not in base:
+                continue
+            value, reference = summary[name]["median"], base[name]["median"]
+            if not reference:
+                continue
+            change = (value - reference) / reference
+            worse = change < -tolerance if direction == HIGHER_IS_BETTER else change > tolerance
+            if worse:
+                regressions.append({"scenario": scenario, "metric": name, "baseline": reference,
+                                    "current": value, "change": change})
+    return regressions
+
+
+def environment():
+    return {"host": platform.node(), "platform": platform.platform(),
+            "python": platform.python_version(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def save_results(filename, results):
+    with open(filename, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load_baseline(filename):
+    """The "scenarios" aggregates of a saved results file."""
+    with open(filename) as f:
+        return json.load(f)["scenarios"]
+
+
+def format_regression(regression):
+    return (f"{regression['scenario']}: {regression['metric']} {regression['current']:.6g} "
+            f"vs baseline {regression['baseline']:.6g} ({regression['change']:+.1%})")
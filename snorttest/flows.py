@@ -0,0 +1,253 @@
+"""
+Reusable TCP flow templates and a multi-flow interleaver.
+
+http_download() is the HTTP file download used by create_large_pcap.py
+(GET, response header, data segments, FIN). By default the client ACKs
+every data segment; ack_every=2 models delayed ACKs and larger values
+stretch ACKs, with the last segment always ACKed. Segments may be anything
+from a small MSS up to MAX_SEGMENT_SIZE, the largest payload whose frame
+still fits a pcap snaplen of 65535: GRO/TSO-style super-segments such as a
+NIC hands to the host before resegmenting; snaplen_args() has the Snort
+arguments that read such frames untruncated. multi_flow() stamps
+many such downloads with their own 5-tuple, sequence space and start time
+and merges them into one timestamp-ordered packet stream. Flows are only
+instantiated when their start time is reached and are dropped as soon as
+they finish, so memory is bounded by the number of concurrently active
+flows, not the total.
+"""
+
+import heapq
+import ipaddress
+import math
+import random
+
+from snorttest.payload import payload_blocks, rechunk
+from snorttest.pcap_writer import TcpFlow
+
+DEFAULT_SEGMENT_SIZE = 1460
+# Ethernet, IPv4 and TCP headers without options
+FRAME_OVERHEAD = 14 + 20 + 20
+MAX_SNAPLEN = 65535
+MAX_SEGMENT_SIZE = MAX_SNAPLEN - FRAME_OVERHEAD
+SEGMENT_SIZES = {
+    "min": 536,
+    "ethernet": 1460,
+    "jumbo": 8960,
+    "super": MAX_SEGMENT_SIZE,
+}
+ACK_MODES = {"every": 1, "delayed": 2}
+DEFAULT_PACKET_INTERVAL = 0.0001
+SIGNATURE = b"MALWARE"
+
+
+def http_get_request(path=b"/large_file.bin"):
+    return (
+        b"GET " + path + b" HTTP/1.1\r\n"
+        b"Host: example.com\r\n"
+        b"User-Agent: Mozilla/5.0\r\n"
+        b"Accept: */*\r\n"
+        b"\r\n"
+    )
+
+
+def http_response_header(content_length):
+    return (
+        b"HTTP/1.1 200 OK\r\n"
+        b"Server: Apache\r\n"
+        b"Content-Type: application/octet-stream\r\n"
+        b"Content-Length: " + str(content_length).encode() + b"\r\n"
+        b"\r\n"
+    )
+
+
+def snaplen_args(segment_size):
+    """
+    Snort arguments that let frames of segment_size-byte segments through
+    whole: Snort truncates frames to its 1518-byte default snaplen.
+    """
+    return ("-s", str(MAX_SNAPLEN)) if segment_size > DEFAULT_SEGMENT_SIZE else ()
+
+
+def parse_segment_size(text):
+    """
+    Segment size from a byte count or a name in SEGMENT_SIZES (min 536,
+    ethernet 1460, jumbo 8960, super MAX_SEGMENT_SIZE).
+    """
+    text = text.strip().lower()
+    size = SEGMENT_SIZES[text] if text in SEGMENT_SIZES else parse_size(text)
+    if not 1 <= size <= MAX_SEGMENT_SIZE:
+        raise ValueError(f"Segment size must be between 1 and {MAX_SEGMENT_SIZE}: {text}")
+    return size
+
+
+def parse_ack_mode(text):
+    """
+    Data segments per client ACK from an ACK mode: every (1), delayed (2),
+    stretch:N or a plain count.
+    """
+    text = text.strip().lower()
+    kind, _, count = text.partition(":")
+    if text in ACK_MODES:
+        return ACK_MODES[text]
+    if kind == "stretch" and count.isdigit() and int(count) >= 1:
+        return int(count)
+    if text.isdigit() and int(text) >= 1:
+        return int(text)
+    raise ValueError(f"Invalid ACK mode (every, delayed, stretch:N or a count): {text}")
+
+
+def http_download(flow, content_length, segments, client_seq=1000, server_seq=2000,
+                  path=b"/large_file.bin", handshake=False, ack_every=1):
+    """
+    Yield the frames of one HTTP download over flow.
+
+    segments is an iterable of body segments (bytes or memoryview) whose
+    lengths add up to content_length; each is sent as one PA segment. The
+    client acknowledges every ack_every-th segment and the last one.
+    """
+    if handshake:
+        yield flow.client("S", client_seq)
+        yield flow.server("SA", server_seq, client_seq+1)
+        yield flow.client("A", client_seq+1, server_seq+1)
+        client_seq += 1
+        server_seq += 1
+
+    # HTTP GET request
+    get_payload = http_get_request(path)
+    yield flow.client("PA", client_seq, payload=get_payload)
+    client_next = client_seq + len(get_payload)
+
+    # HTTP response header and the client ACK for it
+    resp_payload = http_response_header(content_length)
+    yield flow.server("PA", server_seq, payload=resp_payload)
+    current_seq = server_seq + len(resp_payload)
+    yield flow.client("A", client_next, current_seq)
+
+    # File data, one ACK per ack_every segments
+    unacked = 0
+    for segment_data in segments:
+        yield flow.server("PA", current_seq, payload=segment_data)
+        current_seq += len(segment_data)
+        unacked += 1
+        if unacked == ack_every:
+            yield flow.client("A", client_next, current_seq)
+            unacked = 0
+    if unacked:
+        yield flow.client("A", client_next, current_seq)
+
+    # Server FIN and final client ACK
+    yield flow.server("FA", current_seq)
+    yield flow.client("A", client_next, current_seq+1)
+
+
+def timed(frames, start, interval=DEFAULT_PACKET_INTERVAL):
+    """Pair frames with timestamps start, start+interval, ..."""
+    for i, frame in enumerate(frames):
+        yield start + i * interval, frame
+
+
+def interleave(flows):
+    """
+    Merge timed flows into one stream ordered by timestamp.
+
+    flows is an iterable of (start_ts, timed_frames) sorted by start_ts; each
+    timed_frames iterable is only started once the merged stream reaches
+    start_ts. Ties keep flow arrival order.
+    """
+    heap = []
+    order = 0
+    flows = iter(flows)
+    upcoming = next(flows, None)
+    while heap or upcoming is not None:
+        if upcoming is not None and (not heap or upcoming[0] <= heap[0][0]):
+            packets = iter(upcoming[1])
+            first = next(packets, None)
+            if first is not None:
+                heapq.heappush(heap, (first[0], order, first[1], packets))
+                order += 1
+            upcoming = next(flows, None)
+            continue
+        ts, key, frame, packets = heap[0]
+        yield ts, frame
+        following = next(packets, None)
+        if following is None:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (following[0], key, following[1], packets))
+
+
+def parse_size(text):
+    """Parse a byte count with an optional K/M/G suffix."""
+    text = text.strip().upper()
+    scale = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}.get(text[-1:], 1)
+    if scale != 1:
+        text = text[:-1]
+    return int(float(text) * scale)
+
+
+def size_sampler(spec, rng):
+    """
+    Build a flow size sampler from a distribution spec:
+      fixed:SIZE, uniform:MIN:MAX, lognormal:MEDIAN:SIGMA, pareto:MIN:ALPHA
+    Sizes accept K/M/G suffixes.
+    """
+    kind, _, args = spec.partition(":")
+    params = args.split(":") if args else []
+    if kind == "fixed" and len(params) == 1:
+        size = parse_size(params[0])
+        return lambda: size
+    if kind == "uniform" and len(params) == 2:
+        low, high = parse_size(params[0]), parse_size(params[1])
+        return lambda: rng.randint(low, high)
+    if kind == "lognormal" and len(params) == 2:
+        mu, sigma = math.log(parse_size(params[0])), float(params[1])
+        return lambda: max(1, int(rng.lognormvariate(mu, sigma)))
+    if kind == "pareto" and len(params) == 2:
+        low, alpha = parse_size(params[0]), float(params[1])
+        return lambda: int(low * rng.paretovariate(alpha))
+    raise ValueError(f"Invalid flow size distribution: {spec}")
+
+
+def flow_endpoints(index, client_net="10.2.0.0/16", server_ip="10.1.0.1", server_port=80):
+    """Unique client address/port for flow number index."""
+    network = ipaddress.ip_network(client_net)
+    # Skip the network and broadcast addresses
+    hosts = network.num_addresses - 2
+    client_ip = str(network.network_address + 1 + index % hosts)
+    client_port = 1024 + (index // hosts) % 64512
+    return client_ip, server_ip, client_port, server_port
+
+
+def multi_flow(count, arrival_rate=0.0, size_dist="fixed:1M", seed=0,
+               segment_size=DEFAULT_SEGMENT_SIZE, packet_interval=DEFAULT_PACKET_INTERVAL,
+               profile="random", handshake=False, start_time=0.0,
+               client_net="10.2.0.0/16", server_ip="10.1.0.1", server_port=80, ack_every=1):
+    """
+    Yield (ts, frame) for count concurrent HTTP downloads in timestamp order.
+
+    Flow start times follow a Poisson process at arrival_rate flows/sec (0
+    starts every flow at start_time). Each body starts with the MALWARE
+    signature when it fits, so file type detection fires on every flow.
+    """
+    rng = random.Random(seed)
+    sample_size = size_sampler(size_dist, rng)
+
+    def flows():
+        start = start_time
+        for index in range(count):
+            if arrival_rate > 0 and index:
+                start += rng.expovariate(arrival_rate)
+            size = sample_size()
+            client_seq = rng.randrange(1 << 32)
+            server_seq = rng.randrange(1 << 32)
+            flow = TcpFlow(*flow_endpoints(index, client_net, server_ip, server_port))
+            signatures = [(0, SIGNATURE)] if size >= len(SIGNATURE) else []
+            # One segment per payload block keeps per-flow buffering to a single MSS
+            blocks = payload_blocks(size, profile=profile, seed=f"{seed}:{index}",
+                                    signatures=signatures, block_size=segment_size)
+            frames = http_download(flow, size, rechunk(blocks, segment_size),
+                                   client_seq, server_seq, handshake=handshake,
+                                   ack_every=ack_every)
+            yield start, timed(frames, start, packet_interval)
+
+    return interleave(flows())
@@ -0,0 +1,60 @@
+"""
+Latency distributions for the mock services.
+
+latency_sampler() turns a spec string into a zero-argument callable that
+returns a delay in seconds, the same way flows.size_sampler() does for flow
+sizes:
+
+  fixed:DELAY               every request waits DELAY
+  uniform:MIN:MAX           uniform between MIN and MAX
+  lognormal:MEDIAN:SIGMA    lognormal around MEDIAN (SIGMA is the log-space stddev)
+  trace:FILE                replay the delays listed in FILE, one per line, cyclically
+
+Delays accept an optional s/ms/us suffix and default to seconds.
+"""
+
+import itertools
+import math
+
+_DURATION_UNITS = (("ms", 1e-3), ("us", 1e-6), ("s", 1.0))
+
+
+def parse_duration(text):
+    """Parse a delay in seconds with an optional s/ms/us suffix."""
+    text = text.strip().lower()
+    for suffix, scale in _DURATION_UNITS:
+        if text.endswith(suffix):
+            return float(text[:-len(suffix)]) * scale
+    return float(text)
+
+
+def load_trace(filename):
+    """Delays from a trace file; blank lines and # comments are ignored."""
+    delays = []
+    with open(filename) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                delays.append(parse_duration(line.split()[0]))
+    if not delays:
+        raise ValueError(f"No delays in latency trace: {filename}")
+    return delays
+
+
+def latency_sampler(spec, rng):
+    """Build a delay sampler (seconds) from a latency distribution spec."""
+    kind, _, args = spec.partition(":")
+    if kind == "trace" and args:
+        delays = itertools.cycle(load_trace(args))
+        return lambda: next(delays)
+    params = args.split(":") if args else []
+    if kind == "fixed" and len(params) == 1:
+        delay = parse_duration(params[0])
+        return lambda: delay
+    if kind == "uniform" and len(params) == 2:
+        low, high = parse_duration(params[0]), parse_duration(params[1])
+        return lambda: rng.uniform(low, high)
+    if kind == "lognormal" and len(params) == 2:
+        mu, sigma = math.log(parse_duration(params[0])), float(params[1])
+        return lambda: rng.lognormvariate(mu, sigma)
+    raise ValueError(f"Invalid latency distribution: {spec}")
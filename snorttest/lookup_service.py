@@ -0,0 +1,275 @@
+"""
+Asyncio mock of the cloud file lookup service.
+
+Every POST is answered with a fixed verdict after a delay drawn from a
+latency distribution (see snorttest.latency). Requests are handled as
+independent coroutines, so thousands of lookups can be pending at once and
+each one only waits for its own delay. Connections are persistent (HTTP/1.1
+keep-alive) unless the client asks otherwise.
+
+Lookups are keyed by file hash (see lookup_key()). An optional LRU verdict
+cache answers repeated hashes without the delay, and GET /metrics returns
+counters (lookups, duplicates, cache hits/misses, pending) and latency
+histograms as JSON; GET /metrics?reset=1 clears them after reading.
+"""
+
+import asyncio
+import collections
+import hashlib
+import json
+import random
+import resource
+import time
+
+from snorttest.latency import latency_sampler
+from snorttest.metrics import Metrics
+
+DEFAULT_LATENCY = "fixed:3"
+MAX_HEADER_LINES = 100
+LISTEN_BACKLOG = 4096
+
+# JSON fields checked, in order, for the file hash of a lookup
+HASH_FIELDS = ("sha256", "file_hash", "hash", "sha", "file_id")
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 501: "Not Implemented"}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def raise_fd_limit():
+    """Raise the open file soft limit to the hard limit; returns the new soft limit."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard != resource.RLIM_INFINITY and soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        return hard
+    return soft
+
+
+async def read_request(reader):
+    """Read one request; returns (method, path, version, headers, body) or None at EOF."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    parts = request_line.decode("latin-1").split()
+    if len(parts) != 3:
+        raise BadRequest(f"Malformed request line: {request_line!r}")
+    method, path, version = parts
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise BadRequest("Too many header lines")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise BadRequest("Invalid Content-Length")
+    body = await reader.readexactly(length) if length > 0 else b""
+    return method, path, version, headers, body
+
+
+def lookup_key(body):
+    """
+    Cache/duplicate key of a lookup: the first HASH_FIELDS value of a JSON
+    body, else the SHA-256 of the raw body.
+    """
+    try:
+        request = json.loads(body)
+    except ValueError:
+        request = None
+    if isinstance(request, dict):
+        for field in HASH_FIELDS:
+            if request.get(field):
+                return str(request[field]).lower()
+    return hashlib.sha256(body).hexdigest()
+
+
+class VerdictCache:
+    """LRU map of file hash to verdict response; size 0 disables it."""
+
+    def __init__(self, size=0):
+        self.size = size
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        if not self.size:
+            return None
+        response = self.entries.get(key)
+        if response is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return response
+
+    def put(self, key, response):
+        if not self.size:
+            return
+        self.entries[key] = response
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"size": self.size, "entries": len(self.entries), "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else None}
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = 0
+
+
+def wants_keep_alive(version, headers):
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+def encode_response(status, body, keep_alive, content_type="application/json"):
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+class LookupService:
+    """The mock service: a latency model, a verdict, a verdict cache and metrics."""
+
+    def __init__(self, latency=DEFAULT_LATENCY, seed=None, verdict="log",
+                 file_name="Test File", confidence=100, verbose=True, cache_size=0):
+        self.latency = latency
+        self.sample_delay = latency_sampler(latency, random.Random(seed))
+        self.verdict = verdict
+        self.file_name = file_name
+        self.confidence = confidence
+        self.verbose = verbose
+        self.cache = VerdictCache(cache_size)
+        self.metrics = Metrics()
+        self.pending = 0
+        self.in_flight = collections.Counter()
+        self.seen = set()
+
+    def log(self, message):
+        if self.verbose:
+            print(message, flush=True)
+
+    def verdict_response(self):
+        return {"verdict": self.verdict, "file_name": self.file_name,
+                "confidence": self.confidence}
+
+    async def lookup(self, path, headers, body):
+        """Answer one lookup, from the cache or after its sampled delay."""
+        metrics = self.metrics
+        key = lookup_key(body)
+        self.log(f"Received lookup request: {body}")
+        metrics.incr("lookups")
+        if key in self.seen:
+            metrics.incr("duplicate_lookups")
+            if self.in_flight[key]:
+                # Same file asked again while the first lookup is still pending
+                metrics.incr("concurrent_duplicate_lookups")
+        else:
+            self.seen.add(key)
+
+        response = self.cache.get(key)
+        if response is not None:
+            self.log(f"Cache hit for {key}: file verdict {response['verdict']}")
+            return 200, json.dumps(response).encode()
+
+        delay = self.sample_delay()
+        self.log(f"Delaying response for {delay:.3f} seconds...")
+        metrics.observe("injected_delay", delay)
+        self.pending += 1
+        self.in_flight[key] += 1
+        metrics.gauge("pending", self.pending)
+        started = time.monotonic()
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.pending -= 1
+            self.in_flight[key] -= 1
+            if not self.in_flight[key]:
+                del self.in_flight[key]
+            metrics.gauge("pending", self.pending)
+        # Time beyond the injected delay is queueing in the service itself
+        metrics.observe("queueing_delay", max(0.0, time.monotonic() - started - delay))
+        response = self.verdict_response()
+        self.cache.put(key, response)
+        self.log(f"Sent response: file verdict {self.verdict}")
+        return 200, json.dumps(response).encode()
+
+    def metrics_snapshot(self, reset=False):
+        snapshot = self.metrics.snapshot()
+        snapshot["cache"] = self.cache.stats()
+        snapshot["latency"] = self.latency
+        snapshot["unique_files"] = len(self.seen)
+        if reset:
+            self.metrics.reset()
+            self.cache.reset_stats()
+            self.seen.clear()
+        return snapshot
+
+    async def dispatch(self, method, path, headers, body):
+        route, _, query = path.partition("?")
+        if route == "/metrics":
+            if method != "GET":
+                return 501, json.dumps({"error": f"Unsupported method {method}"}).encode()
+            return 200, json.dumps(self.metrics_snapshot(reset="reset=1" in query.split("&")),
+                                   indent=2).encode()
+        if method == "POST":
+            return await self.lookup(path, headers, body)
+        return 501, json.dumps({"error": f"Unsupported method {method}"}).encode()
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except BadRequest as e:
+                    writer.write(encode_response(400, json.dumps({"error": str(e)}).encode(), False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, version, headers, body = request
+                received = time.monotonic()
+                keep_alive = wants_keep_alive(version, headers)
+                status, payload = await self.dispatch(method, path, headers, body)
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if method == "POST":
+                    self.metrics.incr(f"responses_{status}")
+                    self.metrics.observe("response_time", time.monotonic() - received)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="", port=8080):
+        return await asyncio.start_server(self.handle_client, host or None, port,
+                                          backlog=LISTEN_BACKLOG, reuse_address=True)
+
+    async def serve(self, host="", port=8080):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    def serve_forever(self, host="", port=8080):
+        try:
+            asyncio.run(self.serve(host, port))
+        except KeyboardInterrupt:
+            pass
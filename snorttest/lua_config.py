@@ -0,0 +1,248 @@
+"""
+Build Snort Lua configs from composable pieces and validate them once.
+
+A LuaConfig is an ordered set of top-level assignments rendered from Python
+values (dicts become Lua tables, lists become arrays, Lua("...") is emitted
+verbatim). The piece functions return the tables the test configs share:
+
+    config = LuaConfig()
+    config.set("stream_tcp", stream_tcp(), "Stream configuration")
+    config.set("file_id", file_id(type_depth=64), "File ID configuration")
+    text = config.render()
+
+validate_config() runs "snort -c ... -T" on a rendered config and caches a
+successful outcome under the SHA-256 of everything Snort reads (config
+text, extra files, snort_defaults.lua, the Snort binary and its
+arguments), so an unchanged config is validated once rather than on every
+run. Failures are not cached: they may come from something outside the
+key, such as a missing include, and are checked again next time.
+
+Environment:
+  SNORTTEST_CONFIG_CACHE  validation cache directory
+                          (default ~/.cache/snorttest/configs)
+  SNORTTEST_NO_CACHE      set to always run snort -T
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+from snorttest.pcap_cache import NO_CACHE_ENV
+from snorttest.runner import SUPPORT_FILES, SnortJob, prepare_workdir
+
+CACHE_DIR_ENV = "SNORTTEST_CONFIG_CACHE"
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class Lua(str):
+    """A Lua expression emitted as is, e.g. Lua("default_wizard")."""
+
+
+def lua_value(value, indent=0):
+    """Render a Python value as a Lua expression."""
+    pad = "    " * (indent + 1)
+    if isinstance(value, Lua):
+        return str(value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        if "\n" in value:
+            return f"[[\n{value}\n]]"
+        return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+    if isinstance(value, dict):
+        if not value:
+            return "{ }"
+        if all(not isinstance(item, (dict, list, tuple)) for item in value.values()):
+            inline = "{ " + ", ".join(f"{key} = {lua_value(item)}" for key, item in value.items()) + " }"
+            if len(inline) <= 40 and all(_IDENTIFIER_RE.match(str(key)) for key in value):
+                return inline
+        items = []
+        for key, item in value.items():
+            key = key if _IDENTIFIER_RE.match(str(key)) else f"[{lua_value(key)}]"
+            items.append(f"{pad}{key} = {lua_value(item, indent + 1)},")
+        return "{\n" + "\n".join(items) + "\n" + "    " * indent + "}"
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return "{ }"
+        items = [f"{pad}{lua_value(item, indent + 1)}," for item in value]
+        return "{\n" + "\n".join(items) + "\n" + "    " * indent + "}"
+    raise TypeError(f"Cannot render {type(value).__name__} as Lua")
+
+
+def _merge(defaults, overrides):
+    """defaults updated with overrides; nested dicts are merged, None removes a key."""
+    merged = dict(defaults)
+    for key, value in overrides.items():
+        if value is None:
+            merged.pop(key, None)
+        elif isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class LuaConfig:
+    """
+    Ordered top-level assignments of a Snort config, preceded by the
+    network variables and the snort_defaults.lua include.
+    """
+
+    def __init__(self, home_net="10.1.0.0/16", external_net="any", defaults="snort_defaults.lua"):
+        self.home_net = home_net
+        self.external_net = external_net
+        self.defaults = defaults
+        self._sections = {}
+
+    def set(self, name, value, comment=None):
+        """Assign name (replacing an earlier assignment in place); returns self."""
+        self._sections[name] = (value, comment)
+        return self
+
+    def remove(self, name):
+        self._sections.pop(name, None)
+        return self
+
+    def get(self, name):
+        return self._sections[name][0]
+
+    def __contains__(self, name):
+        return name in self._sections
+
+    def render(self):
+        lines = ["-- Basic network settings",
+                 f"HOME_NET = {lua_value(self.home_net)}",
+                 f"EXTERNAL_NET = {lua_value(self.external_net)}", ""]
+        if self.defaults:
+            lines += ["-- Include default configurations", f"dofile({lua_value(self.defaults)})", ""]
+        for name, (value, comment) in self._sections.items():
+            if comment:
+                lines.append(f"-- {comment}")
+            lines += [f"{name} = {lua_value(value)}", ""]
+        return "\n".join(lines)
+
+    def digest(self):
+        return hashlib.sha256(self.render().encode()).hexdigest()
+
+
+# Pieces shared by the test configs; keyword arguments override or extend
+# the defaults (None removes an option).
+
+def stream_tcp(**options):
+    return _merge({"show_rebuilt_packets": True, "session_timeout": 180, "flush_factor": 0}, options)
+
+
+def http_inspect(**options):
+    return dict(options)
+
+
+def file_id(type_depth=1460, **options):
+    return _merge({"type_depth": type_depth, "enable_type": True, "enable_signature": True,
+                   "enable_capture": True, "trace_type": True,
+                   "rules_file": "file_magic.rules"}, options)
+
+
+def file_policy(verdict="log", verdict_delay=0, file_type_id=1, **options):
+    return _merge({"enable_type": True, "enable_signature": True, "enable_capture": True,
+                   "verdict_delay": verdict_delay,
+                   "rules": [{"when": {"file_type_id": file_type_id},
+                              "use": {"verdict": verdict}}]}, options)
+
+
+def trace(**modules):
+    """trace table from module=level or module={option: level} arguments."""
+    return {"modules": {module: level if isinstance(level, dict) else {"all": level}
+                        for module, level in modules.items()}}
+
+
+def file_inspection_config(type_depth=1460, verdict="log", stream=None, http=None,
+                           file_id_options=None, policy=None, traces=None):
+    """
+    The file type detection config the test scripts share: stream_tcp,
+    http_inspect, file_id, file_policy, the default wizard and tracing of
+    file_api and stream_tcp. Each argument overrides its piece.
+    """
+    config = LuaConfig()
+    config.set("stream", {}, "Stream configuration")
+    config.set("stream_tcp", stream_tcp(**(stream or {})))
+    config.set("http_inspect", http_inspect(**(http or {})), "HTTP Inspector")
+    config.set("file_id", file_id(type_depth, **(file_id_options or {})), "File ID configuration")
+    config.set("file_policy", file_policy(verdict, **(policy or {})), "File policy configuration")
+    config.set("wizard", Lua("default_wizard"), "Wizard for protocol identification")
+    config.set("trace", trace(**(traces or {"file_api": 3, "stream_tcp": 2})),
+               "Trace options for debugging")
+    return config
+
+
+def default_cache_dir():
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "snorttest", "configs")
+
+
+def _snort_identity(snort):
+    """Resolved path, size and mtime of the Snort binary, so a rebuild invalidates the cache."""
+    path = shutil.which(snort) or snort
+    try:
+        st = os.stat(path)
+    except OSError:
+        return [path, None, None]
+    return [os.path.realpath(path), st.st_size, st.st_mtime_ns]
+
+
+def validation_key(config, files=None, snort="snort", support_dir=None, args=()):
+    digest = hashlib.sha256()
+    support = {}
+    for name in SUPPORT_FILES:
+        path = os.path.join(support_dir, name) if support_dir else None
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                support[name] = hashlib.sha256(f.read()).hexdigest()
+    blob = json.dumps({"config": config, "files": files or {}, "support": support,
+                       "snort": _snort_identity(snort), "args": list(args)}, sort_keys=True)
+    digest.update(blob.encode())
+    return digest.hexdigest()
+
+
+def validate_config(config, files=None, snort="snort", support_dir=None, args=(),
+                    cache_dir=None, use_cache=True, timeout=120):
+    """
+    Run snort -T on config (with its extra files) and return
+    {"ok", "returncode", "output", "cached"}; output is the tail of Snort's
+    log. Successful results are cached by validation_key().
+    """
+    use_cache = use_cache and not os.environ.get(NO_CACHE_ENV)
+    key = validation_key(config, files, snort, support_dir, args)
+    entry = os.path.join(cache_dir or default_cache_dir(), key[:2], key + ".json")
+    if use_cache and os.path.exists(entry):
+        with open(entry) as f:
+            result = json.load(f)
+        os.utime(entry)
+        return dict(result, cached=True)
+
+    job = SnortJob("validate", config, "-", files=files)
+    with tempfile.TemporaryDirectory(prefix="snort-validate-") as workdir:
+        prepare_workdir(job, workdir, support_dir)
+        try:
+            proc = subprocess.run([snort, "-c", job.config_name, "-T", *args], cwd=workdir,
+                                  stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                  text=True, errors="replace", timeout=timeout)
+        except OSError as e:
+            # No Snort to ask; nothing worth caching
+            return {"ok": False, "returncode": None, "output": str(e), "cached": False}
+    result = {"ok": proc.returncode == 0, "returncode": proc.returncode,
+              "output": "".join(proc.stdout.splitlines(keepends=True)[-20:])}
+    if use_cache and result["ok"]:
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp = entry + f".{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp, entry)
+    return dict(result, cached=False)
@@ -0,0 +1,123 @@
+"""
+Memory measurement of Snort runs.
+
+RssSampler polls /proc/<pid>/status from a background thread while Snort
+runs, recording resident set size over time (VmRSS) and the kernel's own
+high-water mark (VmHWM). run_sampled_job() runs a SnortJob under a sampler
+and adds the samples' summary plus Snort's memory-related exit counters
+(memory, stream_tcp, file_id, ...) to the job result.
+"""
+
+import os
+import subprocess
+import threading
+import time
+
+from snorttest.runner import job_result, prepare_workdir, wait_with_rusage
+from snorttest.snort_log import parse_stats
+
+# Exit counters that describe memory use, per Snort module (when present)
+MEMORY_COUNTERS = {
+    "memory": ("start_up_use", "cur_in_use", "max_in_use", "allocated", "deallocated",
+               "reap_attempts", "reap_failures"),
+    "stream": ("max_flows", "current_flows", "prunes", "memcap_prunes", "excess_prunes"),
+    "stream_tcp": ("segs_queued", "max_segs", "max_bytes", "held_packets",
+                   "held_packet_limit_exceeded", "held_packet_rexmits"),
+    "file_id": ("total_files", "total_file_data", "max_concurrent_files", "cache_failures"),
+}
+
+
+def read_status_kb(pid, fields=("VmRSS", "VmHWM")):
+    """{field: kB} from /proc/<pid>/status; {} once the process is gone."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in fields:
+                    values[name] = int(rest.split()[0])
+    except (FileNotFoundError, ProcessLookupError, ValueError):
+        return {}
+    return values
+
+
+class RssSampler:
+    """Background sampler of a process's RSS; use as a context manager."""
+
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []  # (seconds since start, rss kB)
+        self.hwm_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._started = None
+
+    def _run(self):
+        while True:
+            status = read_status_kb(self.pid)
+            if "VmRSS" in status:
+                self.samples.append((time.monotonic() - self._started, status["VmRSS"]))
+                self.hwm_kb = max(self.hwm_kb, status.get("VmHWM", 0))
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def summary(self):
+        rss = [kb for _, kb in self.samples]
+        return {"samples": len(rss),
+                "rss_start_kb": rss[0] if rss else None,
+                "rss_peak_kb": max(rss) if rss else None,
+                "rss_end_kb": rss[-1] if rss else None,
+                "rss_hwm_kb": self.hwm_kb or None}
+
+    def save(self, filename):
+        with open(filename, "w") as f:
+            f.write("seconds,rss_kb\n")
+            for seconds, kb in self.samples:
+                f.write(f"{seconds:.3f},{kb}\n")
+
+
+def memory_counters(stats):
+    """The MEMORY_COUNTERS found in parse_stats() output, as {"module.counter": value}."""
+    counters = {}
+    for module, names in MEMORY_COUNTERS.items():
+        for name in names:
+            if name in stats.get(module, {}):
+                counters[f"{module}.{name}"] = stats[module][name]
+    return counters
+
+
+def run_sampled_job(job, workdir, snort="snort", support_dir=None, timeout=None, interval=0.05):
+    """
+    Run job like runner.run_job while sampling Snort's RSS. The result gains
+    the sampler summary, memory counters from Snort's exit statistics and
+    the path of the RSS time series (rss.csv in workdir).
+    """
+    prepare_workdir(job, workdir, support_dir)
+    log_file = os.path.join(workdir, "snort.log")
+    started = time.monotonic()
+    with open(log_file, "w") as log:
+        proc = subprocess.Popen(job.command(snort), cwd=workdir, stdout=log,
+                                stderr=subprocess.STDOUT)
+        with RssSampler(proc.pid, interval) as sampler:
+            returncode, rusage = wait_with_rusage(proc, timeout)
+    result = job_result(job, workdir, log_file, returncode, rusage, started)
+    sampler.save(os.path.join(workdir, "rss.csv"))
+    result.update(sampler.summary(), rss_series=os.path.join(workdir, "rss.csv"),
+                  memory=memory_counters(parse_stats(log_file)))
+    return result
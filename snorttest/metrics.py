@@ -0,0 +1,120 @@
+"""
+In-process counters and HDR-style latency histograms.
+
+Histogram buckets values log-linearly the way HdrHistogram does: values
+below 2**SUB_BUCKET_BITS get one bucket each, above that every power of two
+is split into 2**(SUB_BUCKET_BITS - 1) equal buckets. With the default of 7
+bits any recorded value is reported to within about 1.6%, recording is O(1)
+and memory only grows with the number of distinct buckets actually used.
+"""
+
+import collections
+import threading
+
+SUB_BUCKET_BITS = 7
+DEFAULT_PERCENTILES = (50, 90, 99, 99.9)
+
+
+class Histogram:
+    """
+    Log-linear histogram of non-negative values.
+
+    Values are recorded in seconds and stored as integer multiples of
+    resolution (default 1 microsecond).
+    """
+
+    def __init__(self, resolution=1e-6, sub_bucket_bits=SUB_BUCKET_BITS):
+        self.resolution = resolution
+        self.sub_bucket_bits = sub_bucket_bits
+        self._sub_count = 1 << sub_bucket_bits
+        self._half = self._sub_count >> 1
+        self.buckets = collections.Counter()
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, units):
+        if units < self._sub_count:
+            return units
+        shift = units.bit_length() - self.sub_bucket_bits
+        return self._sub_count + (shift - 1) * self._half + (units >> shift) - self._half
+
+    def _highest_equivalent(self, index):
+        if index < self._sub_count:
+            return index
+        shift, offset = divmod(index - self._sub_count, self._half)
+        shift += 1
+        return ((offset + self._half + 1) << shift) - 1
+
+    def record(self, value):
+        units = max(0, int(round(value / self.resolution)))
+        self.buckets[self._index(units)] += 1
+        self.count += 1
+        self.total += units
+        self.min = units if self.min is None else min(self.min, units)
+        self.max = units if self.max is None else max(self.max, units)
+
+    def percentile(self, percent):
+        """Value (seconds) at or below which percent of the recorded values fall."""
+        if not self.count:
+            return None
+        target = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max) * self.resolution
+        return self.max * self.resolution
+
+    def mean(self):
+        return self.total * self.resolution / self.count if self.count else None
+
+    def as_dict(self, percentiles=DEFAULT_PERCENTILES):
+        scale = self.resolution
+        return {
+            "count": self.count,
+            "min": self.min * scale if self.count else None,
+            "max": self.max * scale if self.count else None,
+            "mean": self.mean(),
+            "percentiles": {f"p{p:g}": self.percentile(p) for p in percentiles},
+        }
+
+
+class Metrics:
+    """Named counters, gauges and histograms behind one lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = collections.Counter()
+        self.gauges = {}
+        self.histograms = collections.defaultdict(Histogram)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def gauge(self, name, value):
+        """Set a gauge and keep its high-water mark as <name>_max."""
+        with self._lock:
+            self.gauges[name] = value
+            peak = name + "_max"
+            self.gauges[peak] = max(self.gauges.get(peak, value), value)
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self.histograms[name].record(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {name: h.as_dict() for name, h in self.histograms.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
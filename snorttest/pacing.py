@@ -0,0 +1,281 @@
+"""
+Packet timing from a link model.
+
+Generators stamp packets with fixed intervals (or none at all), so Snort's
+timeouts, verdict_delay and flush behavior never see real line rates.
+Pacer re-stamps the packets of any generator, bare frames or (ts, frame)
+pairs, from a LinkModel and yields (ts, frame) in time order. It can sit
+between a generator and write_pcap() / PcapWriter or a Snort stream, or
+re-time an existing capture (pace_pcap.py).
+
+Each packet first gets a ready time from its own flow:
+
+  - A flow starts at its first packet's source timestamp (relative to
+    the first packet of the stream). Bare frames start when the previous
+    packet was ready.
+  - A data or control segment that answers the other side (a request's
+    response, the next step of a handshake or FIN exchange) comes half an
+    RTT later. That is the turnaround seen by a capture point halfway
+    along the path.
+  - A pure ACK follows the segment it answers after ack_delay. This keeps
+    the capture ACK-clocked without costing a round trip per segment.
+  - With burst set, a sender sends at most burst data segments per round
+    trip. The next segment waits one RTT after the first segment of the
+    window, so bulk flows run at burst * MSS / RTT like a window-limited
+    TCP.
+  - Every packet is delayed by exponentially distributed jitter (mean
+    jitter). The jitter does not accumulate along the flow.
+  - With probability loss a data segment is lost once before the capture
+    point. It only shows up after an rto retransmission timeout, which
+    stalls the rest of its flow.
+  - Source gaps of at least keep_gaps seconds within a flow are kept on
+    top of the model (None drops them all). Idle periods a scenario relies
+    on (a verdict delay, a PAWS idle) survive pacing.
+
+Packets then share the monitored link in ready-time order. The link is the
+interface Snort reads, both directions included. Each packet occupies it
+for its wire time at bandwidth, including Ethernet preamble, FCS and gap.
+Reordering by ready time uses a heap of at most window packets. A packet
+ready earlier than one already emitted (only possible when window is too
+small) is clamped to keep the output in time order and counted in
+stats["clamped"].
+
+Everything random comes from one seeded generator consumed in input order,
+so the same input, model and seed always give the same timestamps.
+"""
+
+import heapq
+import random
+
+from snorttest.latency import parse_duration
+from snorttest.pcap_reader import PROTO_TCP, packet_fields, tcp_flags
+from snorttest.pcap_writer import LINKTYPE_ETHERNET
+
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+# Preamble + start delimiter (8), FCS (4) and inter-frame gap (12) per frame
+ETHERNET_OVERHEAD = 24
+DEFAULT_WINDOW = 65536
+
+
+class LinkModel:
+    """Bandwidth (bits/s, None: unlimited), RTT, jitter, loss and burst of a path."""
+
+    FIELDS = ("bandwidth", "rtt", "jitter", "loss", "rto", "burst", "ack_delay", "keep_gaps")
+
+    def __init__(self, bandwidth=None, rtt=0.0, jitter=0.0, loss=0.0, rto=0.2, burst=0,
+                 ack_delay=0.0, keep_gaps=0.1):
+        self.bandwidth = bandwidth
+        self.rtt = rtt
+        self.jitter = jitter
+        self.loss = loss
+        self.rto = rto
+        self.burst = burst
+        self.ack_delay = ack_delay
+        self.keep_gaps = keep_gaps
+
+    def replace(self, **changes):
+        values = self.as_dict()
+        values.update(changes)
+        return LinkModel(**values)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def wire_time(self, length):
+        if not self.bandwidth:
+            return 0.0
+        return (length + ETHERNET_OVERHEAD) * 8 / self.bandwidth
+
+    def __repr__(self):
+        return f"LinkModel({', '.join(f'{k}={v!r}' for k, v in self.as_dict().items())})"
+
+
+PRESETS = {
+    "lan10g": LinkModel(10e9, rtt=50e-6, jitter=1e-6),
+    "lan1g": LinkModel(1e9, rtt=200e-6, jitter=10e-6),
+    "wan": LinkModel(100e6, rtt=0.04, jitter=0.002, burst=32),
+    "lossy-wan": LinkModel(20e6, rtt=0.12, jitter=0.01, loss=0.02, rto=0.3, burst=10),
+    "satellite": LinkModel(50e6, rtt=0.6, jitter=0.02, loss=0.005, rto=1.0, burst=64),
+}
+
+
+def parse_rate(text):
+    """Parse a bit rate such as 10G, 100M, 1.5Gbps or 64000 (bits per second)."""
+    text = text.strip().lower()
+    for suffix in ("bps", "b/s"):
+        if text.endswith(suffix):
+            text = text[:-len(suffix)]
+    scale = {"k": 1e3, "m": 1e6, "g": 1e9, "t": 1e12}.get(text[-1:], 1)
+    if scale != 1:
+        text = text[:-1]
+    return float(text) * scale
+
+
+def _parse_fraction(text):
+    text = text.strip()
+    if text.endswith("%"):
+        return float(text[:-1]) / 100
+    return float(text)
+
+
+_SETTINGS = {
+    "bandwidth": parse_rate,
+    "rtt": parse_duration,
+    "jitter": parse_duration,
+    "loss": _parse_fraction,
+    "rto": parse_duration,
+    "burst": int,
+    "ack_delay": parse_duration,
+    "keep_gaps": parse_duration,
+}
+
+
+def parse_model(spec):
+    """
+    LinkModel from a spec: a preset and/or comma-separated settings, e.g.
+    "lan10g", "10G,rtt=50us", "lossy-wan,loss=5%" or
+    "bandwidth=1G,rtt=2ms,jitter=100us,burst=16". A leading item that is
+    not a preset or a setting is the bandwidth.
+    """
+    items = [item.strip() for item in spec.split(",") if item.strip()]
+    model = LinkModel()
+    if items and items[0] in PRESETS:
+        model = PRESETS[items.pop(0)]
+    elif items and "=" not in items[0]:
+        model = model.replace(bandwidth=parse_rate(items.pop(0)))
+    changes = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        name = name.strip().replace("-", "_")
+        if name not in _SETTINGS or not value:
+            raise ValueError(f"Invalid link model setting {item!r} "
+                             f"(presets: {', '.join(PRESETS)}; settings: {', '.join(_SETTINGS)})")
+        changes[name] = _SETTINGS[name](value)
+    return model.replace(**changes)
+
+
+class _FlowState:
+    __slots__ = ("client", "direction", "data_direction", "ready", "stamped", "source_ts", "sent",
+                 "window_start", "fins")
+
+    def __init__(self, client):
+        self.client = client
+        self.direction = 0
+        self.data_direction = 0
+        self.ready = 0.0
+        self.stamped = 0.0
+        self.source_ts = None
+        self.sent = [0, 0]
+        self.window_start = [0.0, 0.0]
+        self.fins = 0
+
+
+class Pacer:
+    """Re-stamps packets from a LinkModel; see the module docstring."""
+
+    def __init__(self, model, seed=0, start=0.0, window=DEFAULT_WINDOW, linktype=LINKTYPE_ETHERNET):
+        self.model = model
+        self.linktype = linktype
+        self.rng = random.Random(seed)
+        self.start = start
+        self.window = window
+        self.stats = {"packets": 0, "flows": 0, "losses": 0, "window_stalls": 0, "clamped": 0,
+                      "duration": 0.0}
+        self._flows = {}
+        self._first_ts = None
+        self._last_ready = start
+
+    def _ready(self, ts, frame):
+        """Ready time of one packet from its flow's model state."""
+        model = self.model
+        proto, src, sport, dst, dport, _, payload = packet_fields(frame, self.linktype)
+        flags = tcp_flags(frame, self.linktype) or 0
+        key = (proto, bytes(src), sport, bytes(dst), dport)
+        reverse = (proto, bytes(dst), dport, bytes(src), sport)
+        state = self._flows.get(key) or self._flows.get(reverse)
+        data = bool(payload) or bool(flags & (TCP_SYN | TCP_FIN)) or proto != PROTO_TCP
+
+        if ts is not None and self._first_ts is None:
+            self._first_ts = ts
+        if state is None:
+            state = self._flows[key] = _FlowState(key)
+            self.stats["flows"] += 1
+            direction = 0
+            ready = self._last_ready if ts is None else self.start + ts - self._first_ts
+        else:
+            direction = 0 if key == state.client else 1
+            ready = state.ready
+            # Only data answers the other side's data; ACKs in between do not count
+            if data and direction != state.data_direction:
+                ready += model.rtt / 2
+            elif not data and direction != state.direction:
+                ready += model.ack_delay
+            gap = None if ts is None or state.source_ts is None else ts - state.source_ts
+            if gap is not None and model.keep_gaps is not None and gap >= model.keep_gaps:
+                ready += gap
+        if data and model.burst:
+            if state.sent[direction] >= model.burst:
+                self.stats["window_stalls"] += 1
+                ready = max(ready, state.window_start[direction] + model.rtt)
+                state.sent[direction] = 0
+        if data and model.loss and self.rng.random() < model.loss:
+            self.stats["losses"] += 1
+            ready += model.rto
+        if data and model.burst:
+            if state.sent[direction] == 0:
+                state.window_start[direction] = ready
+            state.sent[direction] += 1
+
+        state.direction = direction
+        if data:
+            state.data_direction = direction
+        state.ready = ready
+        # Jitter moves this packet only, never earlier than the flow's previous one
+        if model.jitter:
+            ready = max(ready + self.rng.expovariate(1 / model.jitter), state.stamped)
+        state.stamped = ready
+        state.source_ts = ts
+        state.fins += bool(flags & TCP_FIN)
+        if flags & TCP_RST or (state.fins >= 2 and not data):
+            # The flow is over; a reused 5-tuple starts afresh
+            self._flows.pop(state.client, None)
+        self._last_ready = ready
+        return ready
+
+    def pace(self, packets):
+        """Yield (ts, frame) for packets (frames or (ts, frame) pairs) in time order."""
+        heap = []
+        order = 0
+        link_free = self.start
+        last = self.start
+
+        def emit():
+            nonlocal link_free, last
+            ready, _, frame = heapq.heappop(heap)
+            ts = max(ready, link_free)
+            if ts < last:
+                self.stats["clamped"] += 1
+                ts = last
+            link_free = ts + self.model.wire_time(len(frame))
+            last = ts
+            self.stats["packets"] += 1
+            self.stats["duration"] = ts - self.start
+            return ts, frame
+
+        for item in packets:
+            ts, frame = item if isinstance(item, tuple) else (None, item)
+            heapq.heappush(heap, (self._ready(ts, frame), order, frame))
+            order += 1
+            if len(heap) > self.window:
+                yield emit()
+        while heap:
+            yield emit()
+
+
+def pace(packets, model, seed=0, start=0.0, window=DEFAULT_WINDOW):
+    """Pacer(model, seed, start, window).pace(packets); model may be a spec string."""
+    if isinstance(model, str):
+        model = parse_model(model)
+    return Pacer(model, seed, start, window).pace(packets)
@@ -0,0 +1,255 @@
+"""
+PAWS (RFC 7323 timestamp) scenarios for many flows from one packet template.
+
+Every flow follows the same packet template (handshake, data_packets
+client data segments each ACKed by the server, one probe segment whose
+timestamp is the scenario under test, one normal segment, teardown). The
+template fixes each packet's seq/ack/TSval offsets and which packet's
+TSval it echoes; a flow adds its own bases (ISNs, timestamp clocks, start
+time) and its scenario's adjustments. flow_values() walks the template
+once per flow, when the flow starts, and keeps its seq, ack, TSval, TSecr
+and time values in compact arrays from which the frames are built. An
+idle flow is emitted as two sessions: its head, and a tail queued as a
+compact record (endpoints and remaining values) until the stream reaches
+it 25 days later, so waiting flows hold no frames or templates.
+
+Scenarios (the probe's expected verdict in brackets):
+
+  valid        timestamps keep increasing                       [accept]
+  equal        probe repeats the last TSval                     [accept]
+  old          probe TSval is older than the last one           [reject]
+  ts_wrap      TSval crosses 2^32 during the flow               [accept]
+  ts_wrap_old  after TSval wrapped, the probe carries a value
+               from before the wrap                             [reject]
+  idle         the flow idles past the 24-day PAWS window, so
+               both timestamp clocks advance more than 2^31
+               and the probe looks old modulo 2^32              [accept]
+  seq_wrap     client sequence numbers cross 2^32               [accept]
+
+Flow number i runs scenarios[i % len(scenarios)].
+"""
+
+import collections
+import random
+import re
+from array import array
+
+from snorttest.flows import flow_endpoints, interleave
+from snorttest.pcap_writer import TcpFlow, encode_tcp_options, timestamp_option
+
+SCENARIOS = {
+    "valid": "accept",
+    "equal": "accept",
+    "old": "reject",
+    "ts_wrap": "accept",
+    "ts_wrap_old": "reject",
+    "idle": "accept",
+    "seq_wrap": "accept",
+}
+CLIENT_NET = "192.168.1.0/24"
+SERVER_IP = "10.1.1.100"
+SERVER_PORT = 80
+# Timestamp clock rate and the idle period of the idle scenario
+TICKS_PER_SECOND = 1000
+IDLE_SECONDS = 25 * 24 * 3600
+PAWS_EVENT = (129, 4)
+_MASK = 0xFFFFFFFF
+_ALERT_RE = re.compile(r"\[(\d+):(\d+):\d+\].*\{TCP\} ([\d.]+):(\d+) -> ([\d.]+):(\d+)")
+
+# One template packet: sender, flags, seq/ack offsets from the sender's and
+# peer's ISN, TSval offset from the sender's clock, index of the packet
+# whose TSval is echoed (None: 0) and payload length
+Row = collections.namedtuple("Row", "client flags seq ack tsval echo length")
+
+
+def flow_template(data_packets=4, segment_size=100, tick=10):
+    """(rows, probe index) of the per-flow packet template."""
+    rows = []
+    client_ts = server_ts = 0
+    last_client = last_server = None
+
+    def add(client, flags, seq, ack, length=0):
+        nonlocal client_ts, server_ts, last_client, last_server
+        echo = last_server if client else last_client
+        if client:
+            rows.append(Row(True, flags, seq, ack, client_ts, echo, length))
+            client_ts += tick
+            last_client = len(rows) - 1
+        else:
+            rows.append(Row(False, flags, seq, ack, server_ts, echo, length))
+            server_ts += tick
+            last_server = len(rows) - 1
+        return len(rows) - 1
+
+    add(True, "S", 0, 0)
+    add(False, "SA", 0, 1)
+    add(True, "A", 1, 1)
+    sent = 1
+    for _ in range(data_packets):
+        add(True, "PA", sent, 1, segment_size)
+        sent += segment_size
+        add(False, "A", 1, sent)
+    probe = add(True, "PA", sent, 1, segment_size)
+    sent += segment_size
+    add(False, "A", 1, sent)
+    add(True, "PA", sent, 1, segment_size)
+    sent += segment_size
+    add(False, "A", 1, sent)
+    add(True, "FA", sent, 1)
+    add(False, "FA", 1, sent + 1)
+    add(True, "A", sent + 1, 2)
+    return rows, probe
+
+
+def _flow_bases(scenario, rows, probe, rng):
+    """(client ISN, server ISN, client TS base, server TS base, probe TSval adjustment)."""
+    client_isn = rng.randrange(1 << 32)
+    server_isn = rng.randrange(1 << 32)
+    client_ts = rng.randrange(1, 1 << 31)
+    server_ts = rng.randrange(1, 1 << 31)
+    previous = rows[probe - 2].tsval
+    adjust = 0
+    if scenario == "equal":
+        adjust = previous - rows[probe].tsval
+    elif scenario == "old":
+        adjust = previous - rows[probe].tsval - rng.randint(1, 1 << 30)
+    elif scenario == "ts_wrap":
+        client_ts = (1 << 32) - rng.randint(1, rows[-1].tsval)
+    elif scenario == "ts_wrap_old":
+        # The packet before the probe has wrapped; the probe repeats the SYN's TSval
+        client_ts = (1 << 32) - rng.randint(1, previous)
+        adjust = -rows[probe].tsval
+    elif scenario == "seq_wrap":
+        client_isn = (1 << 32) - rng.randint(1, rows[-1].seq)
+    return client_isn, server_isn, client_ts, server_ts, adjust
+
+
+def flow_values(scenario, rows, probe, rng, start, interval):
+    """
+    One flow's (seq, ack, tsval, tsecr) values, four per template position,
+    and packet times, computed row by row from its bases.
+    """
+    client_isn, server_isn, client_ts, server_ts, adjust = _flow_bases(scenario, rows, probe, rng)
+    accepted = SCENARIOS[scenario] == "accept"
+    idle = scenario == "idle"
+    # The server does not acknowledge a rejected probe
+    lost = 0 if accepted else rows[probe].length
+    values = array("Q")
+    times = array("d")
+    tsvals = []
+    for position, row in enumerate(rows):
+        own_isn, peer_isn = (client_isn, server_isn) if row.client else (server_isn, client_isn)
+        after = position >= probe
+        seq = (own_isn + row.seq) & _MASK
+        gap = lost if after and not row.client else 0
+        ack = 0 if row.flags == "S" else (peer_isn + row.ack - gap) & _MASK
+        tsval = (client_ts if row.client else server_ts) + row.tsval
+        if after and idle:
+            tsval += IDLE_SECONDS * TICKS_PER_SECOND
+        if position == probe:
+            tsval += adjust
+        tsval &= _MASK
+        tsvals.append(tsval)
+        if row.echo is None:
+            tsecr = 0
+        elif row.echo == probe and not accepted:
+            # A rejected probe does not update the timestamp the server echoes
+            tsecr = tsvals[probe - 2]
+        else:
+            tsecr = tsvals[row.echo]
+        values.extend((seq, ack, tsval, tsecr))
+        offset = position * interval
+        times.append(start + offset + IDLE_SECONDS if after and idle else start + offset)
+    return values, times
+
+
+def _flow_frames(endpoints, rows, values, times, payload):
+    """(ts, frame) of rows of one flow from its endpoints and flow_values()."""
+    flow = TcpFlow(*endpoints)
+    for position, row in enumerate(rows):
+        seq, ack, tsval, tsecr = values[4 * position:4 * position + 4]
+        if "S" in row.flags:
+            options = encode_tcp_options([("MSS", 1460), ("NOP", None), ("NOP", None),
+                                          ("Timestamp", (tsval, tsecr)), ("WScale", 7)])
+        else:
+            options = timestamp_option(tsval, tsecr)
+        build = flow.client if row.client else flow.server
+        yield times[position], build(row.flags, seq, ack, payload[:row.length], options)
+
+
+def flow_scenario(index, scenarios):
+    return scenarios[index % len(scenarios)]
+
+
+def paws_matrix(flows, scenarios=tuple(SCENARIOS), seed=0, data_packets=4, segment_size=100,
+                tick=10, spacing=0.0005, interval=0.0001, client_net=CLIENT_NET,
+                server_ip=SERVER_IP, server_port=SERVER_PORT):
+    """Yield (ts, frame) of flows PAWS test flows in timestamp order."""
+    for scenario in scenarios:
+        if scenario not in SCENARIOS:
+            raise ValueError(f"Unknown PAWS scenario: {scenario}")
+    rows, probe = flow_template(data_packets, segment_size, tick)
+    payload = bytes(range(65, 91)) * (segment_size // 26 + 1)
+    rng = random.Random(seed)
+
+    # Idle tails (start, endpoints, values, times) in start order
+    tails = collections.deque()
+
+    def tail_session(tail):
+        start, endpoints, values, times = tail
+        return start, _flow_frames(endpoints, rows[probe:], values, times, payload)
+
+    def sessions():
+        for index in range(flows):
+            start = index * spacing
+            scenario = flow_scenario(index, scenarios)
+            endpoints = flow_endpoints(index, client_net, server_ip, server_port)
+            values, times = flow_values(scenario, rows, probe, rng, start, interval)
+            head = rows
+            if scenario == "idle":
+                tails.append((times[probe], endpoints, values[4 * probe:], times[probe:]))
+                head, values, times = rows[:probe], values[:4 * probe], times[:probe]
+            # Tails are due by start time too; their start only grows with the flow index
+            while tails and tails[0][0] <= start:
+                yield tail_session(tails.popleft())
+            yield start, _flow_frames(endpoints, head, values, times, payload)
+        while tails:
+            yield tail_session(tails.popleft())
+
+    return interleave(sessions())
+
+
+def paws_alerts(log_file, event=PAWS_EVENT):
+    """Counter of (client ip, client port) for each PAWS event in an alert_fast log."""
+    counts = collections.Counter()
+    with open(log_file, errors="replace") as f:
+        for line in f:
+            match = _ALERT_RE.search(line)
+            if match and (int(match[1]), int(match[2])) == event:
+                src, sport, dst, dport = match[3], int(match[4]), match[5], int(match[6])
+                counts[(src, sport) if dport == SERVER_PORT else (dst, dport)] += 1
+    return counts
+
+
+def check_paws(flows, scenarios, alerts, client_net=CLIENT_NET, server_ip=SERVER_IP,
+               server_port=SERVER_PORT):
+    """
+    Per-scenario verdicts against the PAWS events of paws_alerts():
+    {scenario: {"flows", "expected", "alerted", "missed", "false_alarms"}}
+    where missed counts rejected probes without an event and false_alarms
+    accepted ones with one.
+    """
+    summary = {scenario: {"flows": 0, "expected": SCENARIOS[scenario], "alerted": 0,
+                          "missed": 0, "false_alarms": 0} for scenario in scenarios}
+    for index in range(flows):
+        scenario = flow_scenario(index, scenarios)
+        client_ip, _, client_port, _ = flow_endpoints(index, client_net, server_ip, server_port)
+        alerted = alerts.get((client_ip, client_port), 0) > 0
+        entry = summary[scenario]
+        entry["flows"] += 1
+        entry["alerted"] += alerted
+        if SCENARIOS[scenario] == "reject" and not alerted:
+            entry["missed"] += 1
+        elif SCENARIOS[scenario] == "accept" and alerted:
+            entry["false_alarms"] += 1
+    return summary
@@ -0,0 +1,197 @@
+"""
+Seeded, block-based payload synthesis for the file transfer generators.
+
+Content is produced in fixed-size blocks, each derived from (seed, profile,
+block index) alone, so the same arguments always give the same bytes and a
+block can be regenerated without producing everything before it.
+
+Profiles:
+  random   - incompressible bytes (random.Random.randbytes)
+  text     - compressible ASCII prose built from a small word list
+  pattern  - a byte pattern repeated from offset 0
+  zero     - all zero bytes
+
+Signatures are (offset, bytes) pairs overlaid at absolute file offsets, so
+e.g. the MALWARE magic can sit at any position, including across blocks.
+
+Existing payload files are read through mapped_payload()/iter_segments(),
+which memory-map the file and hand out memoryview slices, so segment bytes
+are copied only once, into the frame being built.
+"""
+
+import contextlib
+import mmap
+import os
+import random
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+DEFAULT_PATTERN = b"0123456789ABCDEF"
+PROFILES = ("random", "text", "pattern", "zero")
+
+# How much of a mapped payload is consumed before its pages are dropped
+_DROP_INTERVAL = 8 * 1024 * 1024
+
+_WORDS = (
+    b"the", b"of", b"and", b"to", b"in", b"is", b"that", b"for", b"it", b"as",
+    b"with", b"was", b"on", b"be", b"at", b"by", b"this", b"had", b"not", b"are",
+    b"but", b"from", b"or", b"have", b"an", b"they", b"which", b"one", b"you",
+    b"were", b"all", b"her", b"she", b"there", b"would", b"their", b"we", b"him",
+    b"been", b"has", b"when", b"who", b"will", b"more", b"no", b"if", b"out",
+    b"packet", b"stream", b"segment", b"file", b"session", b"server", b"client",
+)
+_WORDS_SPACED = [w + b" " for w in _WORDS]
+
+
+def _block_rng(seed, profile, index):
+    # String seeds are hashed with SHA-512, so this is stable across runs and platforms
+    return random.Random(f"{seed}:{profile}:{index}")
+
+
+def _text_block(rng, length):
+    # Pick whole lines from a small per-block phrase table; far fewer Python
+    # calls than choosing word by word and just as compressible
+    lines = [b"".join(rng.choices(_WORDS_SPACED, k=rng.randint(6, 14)))[:-1] + b"\n"
+             for _ in range(128)]
+    avg = sum(len(line) for line in lines) / len(lines)
+    out = bytearray()
+    while len(out) < length:
+        out += b"".join(rng.choices(lines, k=int((length - len(out)) / avg) + 8))
+    del out[length:]
+    return bytes(out)
+
+
+def _pattern_block(pattern, start, length):
+    shift = start % len(pattern)
+    reps = (shift + length) // len(pattern) + 1
+    return (pattern * reps)[shift:shift + length]
+
+
+def make_block(index, length, profile="random", seed=0, pattern=DEFAULT_PATTERN,
+               block_size=DEFAULT_BLOCK_SIZE):
+    """Generate block number index (length bytes) of a payload stream."""
+    if profile == "random":
+        return _block_rng(seed, profile, index).randbytes(length)
+    if profile == "text":
+        return _text_block(_block_rng(seed, profile, index), length)
+    if profile == "pattern":
+        return _pattern_block(pattern, index * block_size, length)
+    if profile == "zero":
+        return bytes(length)
+    raise ValueError(f"Unknown payload profile: {profile}")
+
+
+def _overlay(block, start, signatures):
+    """Copy any signature bytes that fall inside [start, start+len(block))."""
+    end = start + len(block)
+    hits = [(off, sig) for off, sig in signatures if off < end and off + len(sig) > start]
+    if not hits:
+        return block
+    buf = bytearray(block)
+    for off, sig in hits:
+        lo = max(off, start)
+        hi = min(off + len(sig), end)
+        buf[lo - start:hi - start] = sig[lo - off:hi - off]
+    return bytes(buf)
+
+
+def payload_blocks(size, profile="random", seed=0, signatures=(),
+                   pattern=DEFAULT_PATTERN, block_size=DEFAULT_BLOCK_SIZE):
+    """Yield the payload as successive blocks of at most block_size bytes."""
+    for off, sig in signatures:
+        if off < 0 or off + len(sig) > size:
+            raise ValueError(f"Signature at offset {off} does not fit in {size} bytes")
+    index = 0
+    start = 0
+    while start < size:
+        length = min(block_size, size - start)
+        block = make_block(index, length, profile, seed, pattern, block_size)
+        yield _overlay(block, start, signatures)
+        start += length
+        index += 1
+
+
+def payload_bytes(size, **kwargs):
+    """Return the whole payload as one bytes object (small payloads only)."""
+    return b"".join(payload_blocks(size, **kwargs))
+
+
+def write_payload_file(filename, size, **kwargs):
+    """Stream a synthesized payload of size bytes to filename."""
+    with open(filename, "wb") as f:
+        for block in payload_blocks(size, **kwargs):
+            f.write(block)
+    return size
+
+
+def parse_signature(spec):
+    """Parse an 'OFFSET:TEXT' command line argument into (offset, bytes)."""
+    offset, _, text = spec.partition(":")
+    return int(offset, 0), text.encode()
+
+
+@contextlib.contextmanager
+def mapped_payload(filename):
+    """Memory-map filename read-only and yield a memoryview over it."""
+    with open(filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield memoryview(b"")
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mm, "madvise"):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        view = memoryview(mm)
+        try:
+            yield view
+        finally:
+            view.release()
+            try:
+                mm.close()
+            except BufferError:
+                # A caller still holds a slice; the mapping goes away with it
+                pass
+
+
+def iter_segments(view, segment_size, start=0, end=None):
+    """
+    Yield zero-copy memoryview slices of view, segment_size bytes each.
+
+    Each slice is released when the next one is requested, so callers must
+    copy (or encode) a segment before advancing. For a view over an mmap,
+    pages already consumed are dropped from the process every few MB so RSS
+    stays flat even for multi-GB files.
+    """
+    if end is None:
+        end = len(view)
+    mm = view.obj if isinstance(view.obj, mmap.mmap) and hasattr(mmap, "MADV_DONTNEED") else None
+    dropped = start - start % mmap.PAGESIZE
+    for offset in range(start, end, segment_size):
+        segment = view[offset:min(offset + segment_size, end)]
+        try:
+            yield segment
+        finally:
+            segment.release()
+        if mm is not None and offset - dropped >= _DROP_INTERVAL:
+            consumed = offset - offset % mmap.PAGESIZE
+            mm.madvise(mmap.MADV_DONTNEED, dropped, consumed - dropped)
+            dropped = consumed
+
+
+def rechunk(blocks, segment_size):
+    """Re-split an iterable of blocks into segment_size pieces (last may be short)."""
+    pending = b""
+    for block in blocks:
+        if pending:
+            need = segment_size - len(pending)
+            pending += bytes(block[:need])
+            block = memoryview(block)[need:]
+            if len(pending) < segment_size:
+                continue
+            yield pending
+            pending = b""
+        view = memoryview(block)
+        full = len(view) - len(view) % segment_size
+        for offset in range(0, full, segment_size):
+            yield view[offset:offset + segment_size]
+        pending = bytes(view[full:])
+    if pending:
+        yield pending
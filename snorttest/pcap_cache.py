@@ -0,0 +1,199 @@
+"""
+Content-addressed cache for generated capture files.
+
+An entry is keyed by the SHA-256 of the generator name, its parameters,
+the seed, the output names and a code version (a digest of the snorttest sources plus the
+generator's own script), so changing any of them can never serve a stale
+capture. Entries live under <cache dir>/<key[:2]>/<key>/ together with a
+meta.json; a hit copies the files into place (skipped when the target is
+already an identical copy) and marks the entry as recently used. After each
+store, least recently used entries are evicted until the cache fits its
+size budget.
+
+Environment:
+  SNORTTEST_PCAP_CACHE         cache directory (default ~/.cache/snorttest/pcaps)
+  SNORTTEST_PCAP_CACHE_BUDGET  size budget, K/M/G suffixes allowed (default 2G)
+  SNORTTEST_NO_CACHE           set to bypass the cache entirely
+"""
+
+import functools
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from snorttest.flows import parse_size
+
+CACHE_DIR_ENV = "SNORTTEST_PCAP_CACHE"
+BUDGET_ENV = "SNORTTEST_PCAP_CACHE_BUDGET"
+NO_CACHE_ENV = "SNORTTEST_NO_CACHE"
+DEFAULT_BUDGET = 2 * 1024 ** 3
+META_FILE = "meta.json"
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_cache_dir():
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "snorttest", "pcaps")
+
+
+def default_budget():
+    budget = os.environ.get(BUDGET_ENV)
+    return parse_size(budget) if budget else DEFAULT_BUDGET
+
+
+def _digest_files(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode() + b"\0")
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _package_version():
+    return _digest_files(sorted(glob.glob(os.path.join(_PACKAGE_DIR, "*.py"))))
+
+
+def code_version(sources=()):
+    """Digest of the snorttest package plus the given generator source files."""
+    extra = sorted(os.path.abspath(path) for path in sources)
+    return hashlib.sha256((_package_version() + _digest_files(extra)).encode()).hexdigest()[:16]
+
+
+def cache_key(generator, params, seed=None, version="", outputs=()):
+    blob = json.dumps({"generator": generator, "params": params, "seed": seed,
+                       "version": version, "outputs": list(outputs)}, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def _same_copy(source, target):
+    try:
+        src, dst = os.stat(source), os.stat(target)
+    except FileNotFoundError:
+        return False
+    return src.st_size == dst.st_size and src.st_mtime_ns == dst.st_mtime_ns
+
+
+class PcapCache:
+    """A directory of generated outputs keyed by cache_key()."""
+
+    def __init__(self, root=None, budget=None):
+        self.root = root or default_cache_dir()
+        self.budget = default_budget() if budget is None else budget
+
+    def entry_dir(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def lookup(self, key, outputs):
+        """Entry directory for key if it holds every output, else None."""
+        entry = self.entry_dir(key)
+        names = (META_FILE, *outputs)
+        if all(os.path.isfile(os.path.join(entry, name)) for name in names):
+            return entry
+        return None
+
+    def store(self, key, build, outputs, meta):
+        """
+        Run build(directory) in a scratch directory and publish it as key's
+        entry. Whatever dict build returns is kept in meta.json as "info".
+        """
+        os.makedirs(self.root, exist_ok=True)
+        scratch = tempfile.mkdtemp(prefix=".build-", dir=self.root)
+        try:
+            info = build(scratch) or {}
+            missing = [name for name in outputs if not os.path.isfile(os.path.join(scratch, name))]
+            if missing:
+                raise FileNotFoundError(f"Generator did not produce {', '.join(missing)}")
+            meta = dict(meta, key=key, outputs=list(outputs), info=info, created=time.time(),
+                        size=sum(os.path.getsize(os.path.join(scratch, n)) for n in outputs))
+            with open(os.path.join(scratch, META_FILE), "w") as f:
+                json.dump(meta, f, indent=2, default=str)
+            entry = self.entry_dir(key)
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            try:
+                os.rename(scratch, entry)
+            except OSError:
+                # Another run stored the same key first; its entry is equivalent
+                if not self.lookup(key, outputs):
+                    raise
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        self.evict(keep=key)
+        return entry
+
+    def read_meta(self, entry):
+        with open(os.path.join(entry, META_FILE)) as f:
+            return json.load(f)
+
+    def entries(self):
+        """(last_used, size, entry_dir) for every stored entry."""
+        found = []
+        for meta_path in glob.glob(os.path.join(self.root, "??", "*", META_FILE)):
+            entry = os.path.dirname(meta_path)
+            size = sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+            found.append((os.path.getmtime(meta_path), size, entry))
+        return found
+
+    def evict(self, keep=None):
+        """Drop least recently used entries until the cache fits its budget."""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.budget:
+                break
+            if keep and os.path.basename(entry) == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            try:
+                os.rmdir(os.path.dirname(entry))
+            except OSError:
+                pass
+            total -= size
+        return total
+
+    def get(self, generator, params, build, outputs, seed=None, sources=(), dest="."):
+        """
+        Place outputs in dest, generating them with build(directory) only on a
+        cache miss. Returns (hit, meta).
+        """
+        key = cache_key(generator, params, seed, code_version(sources), outputs)
+        entry = self.lookup(key, outputs)
+        hit = entry is not None
+        if not hit:
+            entry = self.store(key, build, outputs,
+                               {"generator": generator, "params": params, "seed": seed})
+        # The meta file's mtime is the entry's last use
+        os.utime(os.path.join(entry, META_FILE))
+        os.makedirs(dest or ".", exist_ok=True)
+        for name in outputs:
+            source, target = os.path.join(entry, name), os.path.join(dest, name)
+            if not _same_copy(source, target):
+                # Copy rather than link: generators rewrite their outputs in place
+                shutil.copy2(source, target + ".tmp")
+                os.replace(target + ".tmp", target)
+        return hit, self.read_meta(entry)
+
+
+def cached_outputs(generator, params, build, outputs, seed=None, sources=(), dest=".",
+                   use_cache=True):
+    """
+    Produce outputs in dest through the default cache; build(directory) writes
+    them into directory and may return a dict of info (packet counts etc.)
+    to keep with them. Bypasses the cache when use_cache is false or
+    SNORTTEST_NO_CACHE is set. Returns (hit, info).
+    """
+    if not use_cache or os.environ.get(NO_CACHE_ENV):
+        os.makedirs(dest or ".", exist_ok=True)
+        return False, build(dest or ".") or {}
+    hit, meta = PcapCache().get(generator, params, build, outputs, seed, sources, dest)
+    if hit:
+        print(f"Using cached {', '.join(outputs)} ({generator}, key {meta['key'][:12]})")
+    return hit, meta["info"]
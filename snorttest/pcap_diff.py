@@ -0,0 +1,209 @@
+"""
+Packet accounting between a capture fed to Snort and its inline output.
+
+Every packet is reduced to its 64-bit identity (pcap_reader.packet_identity)
+and matched between the two files: the n-th copy of an identity in the
+output pairs with its n-th copy in the input. From the pairing:
+
+  dropped      input packets that never came out
+  duplicated   output copies beyond the number of input copies
+  unexpected   output packets whose identity is not in the input at all
+  reordered    output packets that were overtaken by a later input packet;
+               displacement is how many input positions later that was
+  delayed      matched packets whose timestamp grew by more than a threshold
+
+To stay memory-bounded on captures with millions of packets, both files are
+first hash-partitioned into bucket files on disk (one fixed-size record per
+packet) and matched one bucket at a time; only compact per-packet arrays
+(the input index and timestamp delta of every output packet) are held for
+the whole capture.
+"""
+
+import array
+import collections
+import os
+import struct
+import tempfile
+
+from snorttest.pcap_reader import describe_packet, iter_pcap, packet_identity
+
+# identity, packet index, timestamp
+_RECORD = struct.Struct("<Qqd")
+BUCKET_PACKETS = 250000
+MAX_BUCKETS = 256
+# Rough bytes per pcap record, to size the partitioning before reading
+_EST_RECORD_BYTES = 128
+
+
+class PcapDiff:
+    """Result of diff_pcaps(); lists hold at most limit entries, counts are exact."""
+
+    def __init__(self, input_pcap, output_pcap, limit):
+        self.input_pcap = input_pcap
+        self.output_pcap = output_pcap
+        self.limit = limit
+        self.input_packets = 0
+        self.output_packets = 0
+        self.counts = collections.Counter()
+        self.dropped = []
+        self.duplicated = []
+        self.unexpected = []
+        self.reordered = []
+        self.delayed = []
+        self.max_displacement = 0
+        self.max_delay = 0.0
+
+    def _note(self, kind, entry):
+        self.counts[kind] += 1
+        entries = getattr(self, kind)
+        if len(entries) < self.limit:
+            entries.append(entry)
+
+    def as_dict(self):
+        return {
+            "input_pcap": self.input_pcap,
+            "output_pcap": self.output_pcap,
+            "input_packets": self.input_packets,
+            "output_packets": self.output_packets,
+            "counts": {kind: self.counts[kind] for kind in
+                       ("matched", "dropped", "duplicated", "unexpected", "reordered", "delayed")},
+            "max_displacement": self.max_displacement,
+            "max_delay": self.max_delay,
+            "dropped": self.dropped,
+            "duplicated": self.duplicated,
+            "unexpected": self.unexpected,
+            "reordered": self.reordered,
+            "delayed": self.delayed,
+        }
+
+
+def _bucket_count(*pcaps):
+    estimate = sum(os.path.getsize(pcap) for pcap in pcaps) // _EST_RECORD_BYTES
+    return max(1, min(MAX_BUCKETS, estimate // BUCKET_PACKETS + 1))
+
+
+def _partition(pcap, directory, prefix, buckets):
+    """Write (identity, index, ts) records into bucket files; returns the packet count."""
+    files = [open(os.path.join(directory, f"{prefix}{i}"), "wb", buffering=256 * 1024)
+             for i in range(buckets)]
+    records = iter_pcap(pcap, with_linktype=True)
+    linktype = next(records)
+    count = 0
+    pack = _RECORD.pack
+    try:
+        for index, (ts, frame) in enumerate(records):
+            key = packet_identity(frame, linktype)
+            files[key % buckets].write(pack(key, index, ts))
+            count = index + 1
+    finally:
+        for f in files:
+            f.close()
+    return count
+
+
+def _read_bucket(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    return _RECORD.iter_unpack(data)
+
+
+def _describe(pcap, indices):
+    """Descriptions of the packets at the given (sorted, few) indices."""
+    wanted = set(indices)
+    found = {}
+    if not wanted:
+        return found
+    last = max(wanted)
+    records = iter_pcap(pcap, with_linktype=True)
+    linktype = next(records)
+    for index, (ts, frame) in enumerate(records):
+        if index in wanted:
+            found[index] = describe_packet(frame, linktype)
+        if index >= last:
+            break
+    return found
+
+
+def diff_pcaps(input_pcap, output_pcap, delay_threshold=0.0, limit=50, buckets=None, tmpdir=None):
+    """Match output packets to input packets and return a PcapDiff (indices are 1-based)."""
+    diff = PcapDiff(input_pcap, output_pcap, limit)
+    buckets = buckets or _bucket_count(input_pcap, output_pcap)
+    with tempfile.TemporaryDirectory(prefix="pcapdiff-", dir=tmpdir) as directory:
+        diff.input_packets = _partition(input_pcap, directory, "in", buckets)
+        diff.output_packets = _partition(output_pcap, directory, "out", buckets)
+
+        # Input index and timestamp delta of every output packet (-1: no match)
+        source = array.array("q", [-1]) * diff.output_packets
+        delta = array.array("d", [0.0]) * diff.output_packets
+        dropped, duplicated, unexpected = [], [], []
+        for i in range(buckets):
+            copies = collections.defaultdict(collections.deque)
+            for key, index, ts in _read_bucket(os.path.join(directory, f"in{i}")):
+                copies[key].append((index, ts))
+            seen = set(copies)
+            for key, index, ts in sorted(_read_bucket(os.path.join(directory, f"out{i}")),
+                                         key=lambda record: record[1]):
+                pending = copies.get(key)
+                if pending:
+                    in_index, in_ts = pending.popleft()
+                    source[index] = in_index
+                    delta[index] = ts - in_ts
+                elif key in seen:
+                    duplicated.append(index)
+                else:
+                    unexpected.append(index)
+            for pending in copies.values():
+                dropped.extend(index for index, _ in pending)
+
+    diff.counts["matched"] = diff.output_packets - len(duplicated) - len(unexpected)
+    descriptions = _describe(input_pcap, sorted(dropped)[:limit])
+    for index in sorted(dropped):
+        diff._note("dropped", {"input_packet": index + 1, "packet": descriptions.get(index)})
+    descriptions = _describe(output_pcap, sorted(duplicated + unexpected)[:2 * limit])
+    for index in sorted(duplicated):
+        diff._note("duplicated", {"output_packet": index + 1, "packet": descriptions.get(index)})
+    for index in sorted(unexpected):
+        diff._note("unexpected", {"output_packet": index + 1, "packet": descriptions.get(index)})
+
+    highest = -1
+    for out_index, in_index in enumerate(source):
+        if in_index < 0:
+            continue
+        if in_index < highest:
+            displacement = highest - in_index
+            diff.max_displacement = max(diff.max_displacement, displacement)
+            diff._note("reordered", {"input_packet": in_index + 1, "output_packet": out_index + 1,
+                                     "displacement": displacement})
+        else:
+            highest = in_index
+        if delta[out_index] > delay_threshold:
+            diff.max_delay = max(diff.max_delay, delta[out_index])
+            diff._note("delayed", {"input_packet": in_index + 1, "output_packet": out_index + 1,
+                                   "delay": delta[out_index]})
+    return diff
+
+
+def format_diff(diff):
+    """Text report of a PcapDiff."""
+    counts = diff.counts
+    lines = [f"Input:  {diff.input_pcap} ({diff.input_packets} packets)",
+             f"Output: {diff.output_pcap} ({diff.output_packets} packets)",
+             f"Matched {counts['matched']}, dropped {counts['dropped']}, "
+             f"duplicated {counts['duplicated']}, unexpected {counts['unexpected']}, "
+             f"reordered {counts['reordered']} (max displacement {diff.max_displacement}), "
+             f"delayed {counts['delayed']} (max {diff.max_delay:.6f}s)"]
+    for entry in diff.dropped:
+        lines.append(f"  dropped    input #{entry['input_packet']}: {entry['packet']}")
+    for entry in diff.duplicated:
+        lines.append(f"  duplicated output #{entry['output_packet']}: {entry['packet']}")
+    for entry in diff.unexpected:
+        lines.append(f"  unexpected output #{entry['output_packet']}: {entry['packet']}")
+    for entry in diff.reordered:
+        lines.append(f"  reordered  input #{entry['input_packet']} came out as #{entry['output_packet']}, "
+                     f"{entry['displacement']} packet(s) late")
+    for entry in diff.delayed:
+        lines.append(f"  delayed    input #{entry['input_packet']} by {entry['delay']:.6f}s")
+    for kind in ("dropped", "duplicated", "unexpected", "reordered", "delayed"):
+        if counts[kind] > len(getattr(diff, kind)):
+            lines.append(f"  ... {counts[kind] - len(getattr(diff, kind))} more {kind}")
+    return "\n".join(lines)
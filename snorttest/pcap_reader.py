@@ -0,0 +1,143 @@
+"""
+Streaming reader for classic pcap files and packet identities.
+
+iter_pcap() yields (ts, frame) records one at a time (micro- or nanosecond
+timestamps, either byte order). packet_identity() reduces a frame to what
+identifies the segment independently of fields an inline device may
+rewrite (TTL, IP ID, checksums): the 5-tuple, the TCP sequence number and
+the payload.
+"""
+
+import hashlib
+import ipaddress
+import struct
+
+from snorttest.pcap_writer import LINKTYPE_ETHERNET
+
+LINKTYPE_RAW = 101
+
+_MAGICS = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+
+ETH_VLAN_TYPES = (0x8100, 0x88A8)
+PROTO_TCP = 6
+PROTO_UDP = 17
+
+
+class PcapFormatError(ValueError):
+    pass
+
+
+def iter_pcap(filename, with_linktype=False):
+    """
+    Yield (ts, frame) for every record of a classic pcap file.
+
+    With with_linktype the first item yielded is the file's link type.
+    """
+    with open(filename, "rb") as f:
+        header = f.read(24)
+        if len(header) < 24 or header[:4] not in _MAGICS:
+            raise PcapFormatError(f"{filename}: not a classic pcap file (pcapng is not supported)")
+        order, resolution = _MAGICS[header[:4]]
+        linktype = struct.unpack(order + "I", header[20:24])[0]
+        if with_linktype:
+            yield linktype
+        record = struct.Struct(order + "IIII")
+        read = f.read
+        while True:
+            head = read(16)
+            if len(head) < 16:
+                return
+            sec, frac, caplen, _ = record.unpack(head)
+            frame = read(caplen)
+            if len(frame) < caplen:
+                return
+            yield sec + frac * resolution, frame
+
+
+def _ip_payload(frame, linktype):
+    """(ip version, IP packet bytes) of a frame, or (None, frame) if not IP."""
+    if linktype == LINKTYPE_RAW:
+        version = frame[0] >> 4 if frame else None
+        return (version, frame) if version in (4, 6) else (None, frame)
+    if linktype != LINKTYPE_ETHERNET or len(frame) < 14:
+        return None, frame
+    offset = 12
+    ethertype = int.from_bytes(frame[12:14], "big")
+    while ethertype in ETH_VLAN_TYPES and len(frame) >= offset + 6:
+        offset += 4
+        ethertype = int.from_bytes(frame[offset:offset + 2], "big")
+    if ethertype == 0x0800:
+        return 4, frame[offset + 2:]
+    if ethertype == 0x86DD:
+        return 6, frame[offset + 2:]
+    return None, frame
+
+
+def packet_fields(frame, linktype=LINKTYPE_ETHERNET):
+    """
+    (proto, src, sport, dst, dport, seq, payload) of a frame; src/dst are
+    address bytes. Non-IP frames return proto None and the whole frame as
+    payload; Ethernet padding is stripped using the IP length.
+    """
+    version, ip = _ip_payload(frame, linktype)
+    if version == 4 and len(ip) >= 20:
+        ihl = (ip[0] & 0x0F) * 4
+        total = int.from_bytes(ip[2:4], "big") or len(ip)
+        proto, src, dst = ip[9], ip[12:16], ip[16:20]
+        l4 = ip[ihl:total]
+    elif version == 6 and len(ip) >= 40:
+        total = 40 + int.from_bytes(ip[4:6], "big")
+        proto, src, dst = ip[6], ip[8:24], ip[24:40]
+        l4 = ip[40:total]
+    else:
+        return None, b"", 0, b"", 0, 0, frame
+    if proto == PROTO_TCP and len(l4) >= 20:
+        sport, dport, seq = struct.unpack("!HHI", l4[:8])
+        return proto, src, sport, dst, dport, seq, l4[(l4[12] >> 4) * 4:]
+    if proto == PROTO_UDP and len(l4) >= 8:
+        sport, dport = struct.unpack("!HH", l4[:4])
+        return proto, src, sport, dst, dport, 0, l4[8:]
+    return proto, src, 0, dst, 0, 0, l4
+
+
+def tcp_flags(frame, linktype=LINKTYPE_ETHERNET):
+    """TCP flag bits of a frame (FIN 0x01, SYN 0x02, RST 0x04, ACK 0x10), or None if not TCP."""
+    version, ip = _ip_payload(frame, linktype)
+    if version == 4 and len(ip) >= 20:
+        proto, l4 = ip[9], ip[(ip[0] & 0x0F) * 4:]
+    elif version == 6 and len(ip) >= 40:
+        proto, l4 = ip[6], ip[40:]
+    else:
+        return None
+    if proto != PROTO_TCP or len(l4) < 14:
+        return None
+    return l4[13]
+
+
+def packet_identity(frame, linktype=LINKTYPE_ETHERNET):
+    """64-bit identity of a packet: 5-tuple, sequence number and payload digest."""
+    proto, src, sport, dst, dport, seq, payload = packet_fields(frame, linktype)
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(struct.pack("!BHHI", proto or 0, sport, dport, seq))
+    digest.update(src)
+    digest.update(dst)
+    digest.update(payload)
+    return int.from_bytes(digest.digest(), "little")
+
+
+def describe_packet(frame, linktype=LINKTYPE_ETHERNET):
+    """Short human-readable summary, e.g. '10.1.2.20:80 > 10.1.1.10:12345 seq 123 len 21'."""
+    proto, src, sport, dst, dport, seq, payload = packet_fields(frame, linktype)
+    if proto is None:
+        return f"non-IP frame len {len(frame)}"
+    src, dst = ipaddress.ip_address(src), ipaddress.ip_address(dst)
+    name = {PROTO_TCP: "tcp", PROTO_UDP: "udp"}.get(proto, f"proto {proto}")
+    text = f"{name} {src}:{sport} > {dst}:{dport}"
+    if proto == PROTO_TCP:
+        text += f" seq {seq}"
+    return f"{text} len {len(payload)}"
@@ -0,0 +1,254 @@
+"""
+Scapy-free packet encoding and pcap writing for bulk TCP flow generation.
+
+Each direction of a flow gets a TcpTemplate holding the precomputed Ethernet
+header, the constant IPv4 fields and the partial checksums of everything that
+never changes (addresses, ports, protocol). Building a packet only patches
+the IP length, seq/ack/flags and options, then folds the payload into the
+TCP checksum.
+
+Frames are byte-identical to what scapy builds for
+Ether()/IP(src, dst)/TCP(sport, dport, flags, seq, ack, options)/Raw(payload)
+with scapy's defaults (IP id 1, TTL 64, window 8192), provided the same MAC
+addresses are used. Scapy resolves MACs from the local interface and routing
+table; the defaults here are the values scapy falls back to offline.
+"""
+
+import socket
+import struct
+import time
+
+DEFAULT_SRC_MAC = "00:00:00:00:00:00"
+DEFAULT_DST_MAC = "ff:ff:ff:ff:ff:ff"
+
+LINKTYPE_ETHERNET = 1
+PCAP_SNAPLEN = 65535
+
+ETH_HDR_LEN = 14
+IP_HDR_LEN = 20
+TCP_HDR_LEN = 20
+
+_PCAP_GLOBAL_HDR = struct.Struct("<IHHiIII")
+_PCAP_RECORD_HDR = struct.Struct("<IIII")
+_IP_TCP_HDR = struct.Struct("!BBHHHBBH4s4sHHIIBBHHH")
+
+# Scapy flag letters, lowest bit first
+_TCP_FLAG_BITS = {"F": 0x01, "S": 0x02, "R": 0x04, "P": 0x08,
+                  "A": 0x10, "U": 0x20, "E": 0x40, "C": 0x80}
+_flag_cache = {}
+
+
+def mac_to_bytes(mac):
+    """Convert an 'aa:bb:cc:dd:ee:ff' string to 6 raw bytes."""
+    return bytes(int(octet, 16) for octet in mac.split(":"))
+
+
+def tcp_flags(flags):
+    """Convert scapy-style flag letters ("PA", "FA", ...) to the flag byte."""
+    value = _flag_cache.get(flags)
+    if value is None:
+        if isinstance(flags, int):
+            return flags
+        value = 0
+        for letter in flags:
+            value |= _TCP_FLAG_BITS[letter]
+        _flag_cache[flags] = value
+    return value
+
+
+def encode_tcp_options(options):
+    """
+    Encode a scapy-style option list, e.g.
+    [('MSS', 1460), ('NOP', None), ('Timestamp', (100, 0)), ('WScale', 7)],
+    padded with EOL bytes to a 4-byte boundary the same way scapy does.
+    """
+    out = bytearray()
+    for name, value in options:
+        if name == "NOP":
+            out += b"\x01"
+        elif name == "EOL":
+            out += b"\x00"
+        elif name == "MSS":
+            out += struct.pack("!BBH", 2, 4, value)
+        elif name == "WScale":
+            out += struct.pack("!BBB", 3, 3, value)
+        elif name == "SAckOK":
+            out += b"\x04\x02"
+        elif name == "Timestamp":
+            out += struct.pack("!BBII", 8, 10, value[0], value[1])
+        else:
+            raise ValueError(f"Unsupported TCP option: {name}")
+    if len(out) % 4:
+        out += b"\x00" * (4 - len(out) % 4)
+    return bytes(out)
+
+
+def timestamp_option(tsval, tsecr):
+    """Encoded NOP, NOP, Timestamp option block used by most data segments."""
+    return struct.pack("!BBBBII", 1, 1, 8, 10, tsval & 0xFFFFFFFF, tsecr & 0xFFFFFFFF)
+
+
+def _sum16(data):
+    """Ones-complement sum of data as 16-bit big-endian words, unfolded."""
+    if len(data) & 1:
+        return int.from_bytes(bytes(data) + b"\x00", "big")
+    return int.from_bytes(data, "big")
+
+
+def _fold(total):
+    """Fold a running sum into the final 16-bit internet checksum."""
+    if total == 0:
+        return 0xFFFF
+    total %= 0xFFFF
+    # 2^16 == 1 mod 0xFFFF, so a non-zero multiple of 0xFFFF folds to 0xFFFF
+    return 0xFFFF - total if total else 0
+
+
+class TcpTemplate:
+    """Precomputed Ethernet/IPv4/TCP headers for one direction of a flow."""
+
+    def __init__(self, src_ip, dst_ip, sport, dport,
+                 src_mac=DEFAULT_SRC_MAC, dst_mac=DEFAULT_DST_MAC,
+                 ttl=64, ip_id=1, window=8192):
+        self.src_ip = src_ip
+        self.dst_ip = dst_ip
+        self.sport = sport
+        self.dport = dport
+        self.window = window
+        self.ip_id = ip_id
+        self.ttl = ttl
+
+        src = socket.inet_aton(src_ip)
+        dst = socket.inet_aton(dst_ip)
+        self._src = src
+        self._dst = dst
+        self._eth = mac_to_bytes(dst_mac) + mac_to_bytes(src_mac) + b"\x08\x00"
+
+        # IP checksum words that never change: version/ihl/tos, id, ttl/proto, addresses
+        self._ip_partial = (0x4500 + ip_id + ((ttl << 8) | socket.IPPROTO_TCP)
+                            + _sum16(src) + _sum16(dst))
+        # TCP pseudo header (minus length) plus ports and window
+        self._tcp_partial = (_sum16(src) + _sum16(dst) + socket.IPPROTO_TCP
+                             + sport + dport + window)
+
+    def build(self, flags, seq, ack=0, payload=b"", options=b""):
+        """Return the full Ethernet frame for one segment."""
+        flag_bits = _flag_cache.get(flags)
+        if flag_bits is None:
+            flag_bits = tcp_flags(flags)
+        seq &= 0xFFFFFFFF
+        ack &= 0xFFFFFFFF
+        opt_len = len(options)
+        tcp_len = TCP_HDR_LEN + opt_len + len(payload)
+        ip_len = IP_HDR_LEN + tcp_len
+        offset_byte = (TCP_HDR_LEN + opt_len) << 2
+
+        total = (self._tcp_partial + tcp_len
+                 + (seq >> 16) + (seq & 0xFFFF) + (ack >> 16) + (ack & 0xFFFF)
+                 + ((offset_byte << 8) | flag_bits))
+        if opt_len:
+            total += _sum16(options)
+        if payload:
+            total += _sum16(payload)
+
+        hdr = _IP_TCP_HDR.pack(0x45, 0, ip_len, self.ip_id, 0, self.ttl,
+                               socket.IPPROTO_TCP, _fold(self._ip_partial + ip_len),
+                               self._src, self._dst,
+                               self.sport, self.dport, seq, ack, offset_byte,
+                               flag_bits, self.window, _fold(total), 0)
+        if opt_len:
+            return b"".join((self._eth, hdr, options, payload))
+        return b"".join((self._eth, hdr, payload))
+
+    def reverse(self, src_mac=DEFAULT_SRC_MAC, dst_mac=DEFAULT_DST_MAC):
+        """Template for the opposite direction of the same flow."""
+        return TcpTemplate(self.dst_ip, self.src_ip, self.dport, self.sport,
+                           src_mac=src_mac, dst_mac=dst_mac, ttl=self.ttl,
+                           ip_id=self.ip_id, window=self.window)
+
+
+class TcpFlow:
+    """Client-to-server and server-to-client templates for one 5-tuple."""
+
+    def __init__(self, client_ip, server_ip, client_port, server_port, **kwargs):
+        self.client_ip = client_ip
+        self.server_ip = server_ip
+        self.client_port = client_port
+        self.server_port = server_port
+        self.c2s = TcpTemplate(client_ip, server_ip, client_port, server_port, **kwargs)
+        self.s2c = TcpTemplate(server_ip, client_ip, server_port, client_port, **kwargs)
+
+    def client(self, flags, seq, ack=0, payload=b"", options=b""):
+        """Build a client-to-server segment."""
+        return self.c2s.build(flags, seq, ack, payload, options)
+
+    def server(self, flags, seq, ack=0, payload=b"", options=b""):
+        """Build a server-to-client segment."""
+        return self.s2c.build(flags, seq, ack, payload, options)
+
+
+class PcapWriter:
+    """
+    Write classic little-endian pcap records straight from frame bytes.
+
+    Accepts a filename or any binary file object (stdout, a FIFO, a pipe).
+    """
+
+    def __init__(self, target, linktype=LINKTYPE_ETHERNET, snaplen=PCAP_SNAPLEN,
+                 buffering=1024 * 1024):
+        if isinstance(target, (str, bytes)) or hasattr(target, "__fspath__"):
+            self._file = open(target, "wb", buffering=buffering)
+            self._owns_file = True
+        else:
+            self._file = target
+            self._owns_file = False
+        self.packets = 0
+        self.bytes = 0
+        self._file.write(_PCAP_GLOBAL_HDR.pack(0xA1B2C3D4, 2, 4, 0, 0, snaplen, linktype))
+
+    def write(self, frame, ts=None):
+        """Append one frame; ts defaults to the current time like scapy."""
+        if ts is None:
+            ts = time.time()
+        sec, usec = divmod(int(round(ts * 1000000)), 1000000)
+        length = len(frame)
+        self._file.write(_PCAP_RECORD_HDR.pack(sec, usec, length, length))
+        self._file.write(frame)
+        self.packets += 1
+        self.bytes += length
+
+    def write_all(self, frames, ts=None):
+        """Consume an iterable of frames or (ts, frame) pairs."""
+        write = self.write
+        for item in frames:
+            if isinstance(item, tuple):
+                write(item[1], item[0])
+            else:
+                write(item, ts)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if self._owns_file:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_pcap(target, frames, ts=None):
+    """
+    Stream an iterable of frames (or (ts, frame) pairs) into a pcap.
+
+    frames is consumed lazily, so a generator keeps memory flat no matter how
+    many packets it produces. Returns the number of packets written.
+    """
+    with PcapWriter(target) as writer:
+        writer.write_all(frames, ts)
+        return writer.packets
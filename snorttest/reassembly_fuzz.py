@@ -0,0 +1,285 @@
+"""
+Randomized TCP reassembly permutations packed into one capture.
+
+fuzz_case() takes an HTTP response body, cuts it into segments of random
+size and applies a few random mutations to the order in which they are
+sent:
+
+  reorder     shuffle a window of consecutive segments
+  reverse     send every segment in reverse order
+  duplicate   send a copy of a segment again later
+  overlap     send an extra segment spanning segment boundaries
+  resegment   resend a range cut at different boundaries
+  gap         hold a segment back until everything after it has been sent
+  wrap        place the body across the 2^32 sequence number wrap
+
+Overlapping and duplicate segments always carry the original bytes and
+every hole is filled before the flow ends, so the reassembled body is the
+original one whatever the target's overlap policy: any difference is a
+reassembly bug. The client acknowledges the contiguous prefix after every
+server segment, which is what makes Snort flush the to-client stream.
+
+fuzz_capture() gives every case its own 5-tuple and merges the sessions
+into one timestamp-ordered capture, returning a manifest of the cases.
+The oracle is built into Snort itself: oracle_rules() emits one rule per
+case that matches the SHA-256 of the whole response body in file_data on
+that case's 5-tuple, so a case whose rule did not fire is a flow whose
+rebuilt stream differs from the original (or was never flushed).
+check_alerts() compares the fired rules with the manifest;
+check_capture() runs the same check by reassembling the server payloads
+of a capture (such as the inline output) in Python.
+"""
+
+import collections
+import hashlib
+import random
+import re
+import socket
+
+from snorttest.flows import flow_endpoints, http_get_request, http_response_header, interleave, timed
+from snorttest.payload import payload_bytes
+from snorttest.pcap_reader import PROTO_TCP, iter_pcap, packet_fields
+from snorttest.pcap_writer import TcpFlow
+
+MUTATIONS = ("reorder", "reverse", "duplicate", "overlap", "resegment", "gap", "wrap")
+CLIENT_NET = "192.168.1.0/24"
+SERVER_IP = "10.1.1.100"
+SERVER_PORT = 80
+BASE_SID = 2000000
+_ALERT_SID_RE = re.compile(r"\[1:(\d+):\d+\]")
+
+
+def split_body(length, rng, max_segment):
+    """[(offset, length)] covering [0, length) in segments of 1..max_segment bytes."""
+    segments = []
+    offset = 0
+    while offset < length:
+        size = min(rng.randint(1, max_segment), length - offset)
+        segments.append((offset, size))
+        offset += size
+    return segments
+
+
+def _mutate(kind, segments, length, rng):
+    """Apply one mutation to the send order; returns its description."""
+    count = len(segments)
+    if kind == "reorder" and count > 1:
+        start = rng.randrange(count - 1)
+        end = rng.randint(start + 2, min(count, start + 8))
+        window = segments[start:end]
+        rng.shuffle(window)
+        segments[start:end] = window
+        return f"reorder {start}:{end}"
+    if kind == "reverse":
+        segments.reverse()
+        return "reverse"
+    if kind == "duplicate":
+        index = rng.randrange(count)
+        where = rng.randint(index + 1, count)
+        segments.insert(where, segments[index])
+        return f"duplicate {segments[index][0]}+{segments[index][1]} at {where}"
+    if kind == "overlap" and length > 1:
+        start = rng.randrange(length - 1)
+        end = rng.randint(start + 1, min(length, start + 2 * max(size for _, size in segments)))
+        where = rng.randint(0, count)
+        segments.insert(where, (start, end - start))
+        return f"overlap {start}+{end - start} at {where}"
+    if kind == "resegment" and length > 1:
+        start = rng.randrange(length - 1)
+        end = rng.randint(start + 2, min(length, start + 1000))
+        cut = rng.randint(start + 1, end - 1)
+        where = rng.randint(0, count)
+        segments[where:where] = [(start, cut - start), (cut, end - cut)]
+        return f"resegment {start}+{end - start} at {cut}, {where}"
+    if kind == "gap" and count > 1:
+        index = rng.randrange(count - 1)
+        segments.append(segments.pop(index))
+        return f"gap {segments[-1][0]}+{segments[-1][1]}"
+    return None
+
+
+def fuzz_case(length, rng, max_segment=400, mutations=3):
+    """
+    Segment order for one case: ([(offset, length)] in send order,
+    [mutation descriptions], wrap) where wrap asks for a server sequence
+    number that makes the body cross 2^32.
+    """
+    segments = split_body(length, rng, max_segment)
+    ops = []
+    wrap = False
+    for _ in range(rng.randint(1, mutations)):
+        kind = rng.choice(MUTATIONS)
+        if kind == "wrap":
+            if not wrap:
+                wrap = True
+                ops.append("wrap")
+            continue
+        op = _mutate(kind, segments, length, rng)
+        if op:
+            ops.append(op)
+    return segments, ops, wrap
+
+
+def reassemble(segments, length):
+    """
+    Reference reassembly: (bytes, first hole) from [(offset, data)], keeping
+    the first copy of every byte; bytes stop at the first hole (length if
+    there is none).
+    """
+    data = bytearray(length)
+    have = bytearray(length)
+    for offset, payload in segments:
+        lo = max(0, offset)
+        hi = min(length, offset + len(payload))
+        # Copy each run of still missing bytes in [lo, hi)
+        while lo < hi:
+            lo = have.find(0, lo, hi)
+            if lo < 0:
+                break
+            end = have.find(1, lo, hi)
+            end = hi if end < 0 else end
+            data[lo:end] = payload[lo - offset:end - offset]
+            have[lo:end] = b"\x01" * (end - lo)
+            lo = end
+    hole = have.find(0)
+    hole = length if hole < 0 else hole
+    return bytes(data[:hole]), hole
+
+
+def _contiguous(covered, offset, size, prefix):
+    """Mark [offset, offset+size) covered and return the new contiguous prefix."""
+    covered[offset:offset + size] = b"\x01" * size
+    prefix = covered.find(0, prefix)
+    return len(covered) if prefix < 0 else prefix
+
+
+def session_packets(flow, body, segments, client_seq, server_seq):
+    """Frames of one case: handshake, GET, header, body segments each ACKed, FIN exchange."""
+    yield flow.client("S", client_seq)
+    yield flow.server("SA", server_seq, client_seq + 1)
+    yield flow.client("A", client_seq + 1, server_seq + 1)
+    client_next = client_seq + 1
+    server_next = server_seq + 1
+
+    request = http_get_request(b"/fuzz.txt")
+    yield flow.client("PA", client_next, server_next, payload=request)
+    client_next += len(request)
+    yield flow.server("A", server_next, client_next)
+
+    header = http_response_header(len(body))
+    yield flow.server("PA", server_next, client_next, payload=header)
+    body_seq = server_next + len(header)
+    yield flow.client("A", client_next, body_seq)
+
+    covered = bytearray(len(body))
+    prefix = 0
+    for offset, size in segments:
+        yield flow.server("PA", body_seq + offset, client_next, payload=body[offset:offset + size])
+        prefix = _contiguous(covered, offset, size, prefix)
+        yield flow.client("A", client_next, body_seq + prefix)
+
+    server_end = body_seq + len(body)
+    yield flow.server("FA", server_end, client_next)
+    yield flow.client("FA", client_next, server_end + 1)
+    yield flow.server("A", server_end + 1, client_next + 1)
+
+
+def fuzz_session(index, seed=0, min_body=256, max_body=4096, max_segment=400, mutations=3,
+                 client_net=CLIENT_NET, server_ip=SERVER_IP, server_port=SERVER_PORT):
+    """
+    (manifest entry, frames) of case number index. Each case draws from its
+    own seeded generator, so any one case can be rebuilt on its own.
+    """
+    rng = random.Random(f"{seed}:{index}")
+    length = rng.randint(min_body, max_body)
+    body = payload_bytes(length, profile="text", seed=f"{seed}:{index}")
+    segments, ops, wrap = fuzz_case(length, rng, max_segment, mutations)
+    endpoints = flow_endpoints(index, client_net, server_ip, server_port)
+    client_seq = rng.randrange(1 << 32)
+    header_length = len(http_response_header(length))
+    if wrap:
+        # Put 2^32 somewhere inside the body
+        server_seq = (1 << 32) - 1 - header_length - rng.randrange(1, length)
+    else:
+        server_seq = rng.randrange(1 << 32)
+    case = {"case": index, "sid": BASE_SID + index,
+            "client": endpoints[0], "client_port": endpoints[2],
+            "length": length, "sha256": hashlib.sha256(body).hexdigest(),
+            "body_seq": (server_seq + 1 + header_length) & 0xFFFFFFFF,
+            "ops": ops, "segments": segments}
+    return case, session_packets(TcpFlow(*endpoints), body, segments, client_seq, server_seq)
+
+
+def fuzz_capture(cases, seed=0, spacing=0.001, packet_interval=0.0001, **options):
+    """
+    (timed frames, manifest) for the given case indices (or range(cases)
+    for a count), one 5-tuple each, starting spacing seconds apart. options
+    go to fuzz_session(). The frames are generated lazily; the manifest is
+    complete once they have been consumed.
+    """
+    indices = range(cases) if isinstance(cases, int) else cases
+    manifest = {"seed": seed, "options": options, "cases": []}
+
+    def sessions():
+        for position, index in enumerate(indices):
+            case, frames = fuzz_session(index, seed, **options)
+            manifest["cases"].append(case)
+            start = position * spacing
+            yield start, timed(frames, start, packet_interval)
+
+    return interleave(sessions()), manifest
+
+
+def oracle_rules(manifest, server_ip=SERVER_IP, server_port=SERVER_PORT):
+    """One rule per case firing when that flow's response body is intact."""
+    rules = []
+    for case in manifest["cases"]:
+        rules.append(
+            f"alert tcp {server_ip} {server_port} -> {case['client']} {case['client_port']} "
+            f"(msg:\"reassembly case {case['case']} intact\"; flow:established,to_client; "
+            f"service:http; file_data; sha256:\"|{case['sha256']}|\", length {case['length']}, "
+            f"offset 0; sid:{case['sid']}; rev:1;)")
+    return "\n".join(rules) + "\n"
+
+
+def alerted_sids(log_file):
+    """Rule sids (gid 1) named in alert_fast / console alert lines of a log."""
+    sids = set()
+    with open(log_file, errors="replace") as f:
+        for line in f:
+            sids.update(int(sid) for sid in _ALERT_SID_RE.findall(line))
+    return sids
+
+
+def check_alerts(manifest, sids):
+    """Cases whose oracle rule is not among the fired sids."""
+    return [case for case in manifest["cases"] if case["sid"] not in sids]
+
+
+def check_capture(manifest, pcap, server_port=SERVER_PORT):
+    """
+    Reassemble every case's response body from the server payloads in pcap
+    and return the cases that differ, each with "got" (bytes rebuilt up to
+    the first hole) and "hole" (offset of the first missing byte).
+    """
+    by_client = {(socket.inet_aton(case["client"]), case["client_port"]): case
+                 for case in manifest["cases"]}
+    payloads = collections.defaultdict(list)
+    records = iter_pcap(pcap, with_linktype=True)
+    linktype = next(records)
+    for _, frame in records:
+        fields = packet_fields(frame, linktype)
+        if fields[0] != PROTO_TCP or fields[2] != server_port or not fields[6]:
+            continue
+        case = by_client.get((bytes(fields[3]), fields[4]))
+        if case is not None:
+            # Offset into the body, modulo 2^32 and signed so header bytes fall below 0
+            offset = (fields[5] - case["body_seq"] + (1 << 31)) % (1 << 32) - (1 << 31)
+            payloads[case["case"]].append((offset, bytes(fields[6])))
+
+    failures = []
+    for case in manifest["cases"]:
+        data, hole = reassemble(payloads[case["case"]], case["length"])
+        if hashlib.sha256(data).hexdigest() != case["sha256"]:
+            failures.append(dict(case, got=len(data), hole=hole if hole < case["length"] else None))
+    return failures
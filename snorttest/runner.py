@@ -0,0 +1,228 @@
+"""
+Run a matrix of Snort jobs in parallel, one working directory per job.
+
+Each SnortJob carries its own Lua config text, any extra files it needs
+(e.g. file_magic.rules) and the PCAP to read. run_matrix() runs the jobs on
+a bounded pool (one Snort process per worker), writes each job's config and
+log into <output_dir>/<job name>/, and returns one result dict per job in
+submission order. A job that exits non-zero without processing a single
+packet is treated as a config error: pending jobs are cancelled, Snort
+processes still running are killed and ConfigError is raised.
+"""
+
+import concurrent.futures
+import os
+import re
+import subprocess
+import threading
+import time
+
+from snorttest import snort_log, snort_profile
+
+DEFAULT_SNORT_ARGS = ("-A", "alert_fast", "-k", "none", "-Q", "-v")
+
+# Files the Lua configs pull in by relative path
+SUPPORT_FILES = ("snort_defaults.lua",)
+
+
+class ConfigError(Exception):
+    """Snort rejected a job's configuration."""
+
+    def __init__(self, job, log_tail):
+        super().__init__(f"Snort config error in job {job.name}:\n{log_tail}")
+        self.job = job
+        self.log_tail = log_tail
+
+
+class SnortJob:
+    """
+    One Snort invocation: a config, a PCAP and the parameters that produced them.
+
+    pcap "-" makes Snort read the capture from stdin (see snorttest.stream);
+    a list of captures is read with --pcap-list, which lets Snort's packet
+    threads (-z N) each take their own capture.
+    profile turns on Snort's profiler and perf_monitor for the run; the
+    result then carries the parsed per-module and per-rule timing.
+    """
+
+    def __init__(self, name, config, pcap, params=None, files=None,
+                 args=DEFAULT_SNORT_ARGS, config_name="snort.lua", profile=False):
+        self.name = name
+        self.config = config
+        if isinstance(pcap, (list, tuple)):
+            self.pcap = [os.path.abspath(path) for path in pcap]
+        else:
+            self.pcap = pcap if pcap == "-" else os.path.abspath(pcap)
+        self.params = dict(params or {})
+        self.files = dict(files or {})
+        self.args = tuple(args)
+        self.config_name = config_name
+        self.profile = profile
+
+    def command(self, snort="snort", pcap=None):
+        pcap = pcap or self.pcap
+        if isinstance(pcap, list):
+            return [snort, "-c", self.config_name, "--pcap-list", " ".join(pcap), *self.args]
+        return [snort, "-c", self.config_name, "-r", pcap, *self.args]
+
+
+def summarize_log(log_file):
+    """Total packets, detection count/packet and event counts of a Snort log."""
+    summary = snort_log.summarize_log(log_file)
+    return {"total_packets": summary.total_packets,
+            "detections": summary.counts["file_type"],
+            "detection_packet": summary.detection_packet,
+            "events": dict(summary.counts)}
+
+
+def _tail(path, lines=20):
+    with open(path, errors="replace") as f:
+        return "".join(f.readlines()[-lines:])
+
+
+def prepare_workdir(job, workdir, support_dir=None):
+    """Write the job's config and extra files and link shared support files."""
+    os.makedirs(workdir, exist_ok=True)
+    with open(os.path.join(workdir, job.config_name), "w") as f:
+        f.write(snort_profile.with_profiling(job.config) if job.profile else job.config)
+    for name, content in job.files.items():
+        with open(os.path.join(workdir, name), "w") as f:
+            f.write(content)
+    if support_dir:
+        for name in SUPPORT_FILES:
+            source = os.path.abspath(os.path.join(support_dir, name))
+            target = os.path.join(workdir, name)
+            if os.path.exists(source) and not os.path.lexists(target):
+                os.symlink(source, target)
+
+
+def wait_with_rusage(proc, timeout=None):
+    """
+    Wait for a Popen child and return (returncode, rusage) with its own
+    resource usage, which stays correct when several jobs run at once.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        pid, status, rusage = os.wait4(proc.pid, os.WNOHANG if deadline else 0)
+        if pid:
+            break
+        if time.monotonic() > deadline:
+            proc.kill()
+            proc.wait()
+            raise subprocess.TimeoutExpired(proc.args, timeout)
+        time.sleep(0.01)
+    # Reaped here, so tell Popen not to wait for it again
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return proc.returncode, rusage
+
+
+class ProcessGroup:
+    """The running processes of a matrix, so a failure can stop them all."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._procs = set()
+        self._stopped = False
+
+    def popen(self, command, **kwargs):
+        with self._lock:
+            if self._stopped:
+                raise concurrent.futures.CancelledError()
+            proc = subprocess.Popen(command, **kwargs)
+            self._procs.add(proc)
+        return proc
+
+    def discard(self, proc):
+        with self._lock:
+            self._procs.discard(proc)
+
+    def kill(self):
+        """Kill every running process and refuse to start new ones."""
+        with self._lock:
+            self._stopped = True
+            for proc in self._procs:
+                if proc.returncode is None:
+                    proc.kill()
+
+
+def run_with_rusage(command, cwd=None, stdout=None, timeout=None, processes=None):
+    """Run command and return (returncode, rusage) of the child."""
+    if processes is None:
+        proc = subprocess.Popen(command, cwd=cwd, stdout=stdout, stderr=subprocess.STDOUT)
+        return wait_with_rusage(proc, timeout)
+    proc = processes.popen(command, cwd=cwd, stdout=stdout, stderr=subprocess.STDOUT)
+    try:
+        return wait_with_rusage(proc, timeout)
+    finally:
+        processes.discard(proc)
+
+
+def job_result(job, workdir, log_file, returncode, rusage, started):
+    """Result dict of a finished job; raises ConfigError if Snort rejected its config."""
+    result = {"name": job.name, "params": job.params, "pcap": job.pcap,
+              "workdir": workdir, "log": log_file, "returncode": returncode,
+              "wall_time": time.monotonic() - started,
+              "cpu_user": rusage.ru_utime, "cpu_system": rusage.ru_stime,
+              # ru_maxrss is in kilobytes on Linux
+              "max_rss_kb": rusage.ru_maxrss}
+    result.update(summarize_log(log_file))
+    if returncode != 0 and result["total_packets"] == 0:
+        raise ConfigError(job, _tail(log_file))
+    if job.profile:
+        result["profile"] = snort_profile.parse_profile(log_file)
+        result["perf_monitor"] = snort_profile.read_perf_monitor(workdir)
+    return result
+
+
+def run_job(job, workdir, snort="snort", support_dir=None, timeout=None, processes=None):
+    """Run one job in workdir and return its result dict; processes is an optional ProcessGroup."""
+    prepare_workdir(job, workdir, support_dir)
+    log_file = os.path.join(workdir, "snort.log")
+    started = time.monotonic()
+    with open(log_file, "w") as log:
+        returncode, rusage = run_with_rusage(job.command(snort), cwd=workdir, stdout=log,
+                                             timeout=timeout, processes=processes)
+    return job_result(job, workdir, log_file, returncode, rusage, started)
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def run_matrix(jobs, output_dir, workers=None, snort="snort", support_dir=".",
+               timeout=None, on_result=None):
+    """
+    Run jobs in parallel and return their results in submission order.
+
+    on_result, if given, is called with each result as soon as it finishes.
+    """
+    names = [job.name for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError("Job names must be unique; they name the working directories")
+    workers = workers or default_workers()
+    if os.sep in snort:
+        # Jobs run with their working directory as cwd
+        snort = os.path.abspath(snort)
+    results = [None] * len(jobs)
+    processes = ProcessGroup()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, job, os.path.join(output_dir, _safe_name(job.name)),
+                               snort, support_dir, timeout, processes): i
+                   for i, job in enumerate(jobs)}
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                results[futures[future]] = result
+                if on_result:
+                    on_result(result)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            # Jobs already running would otherwise keep going until they finish or time out
+            processes.kill()
+            raise
+    return results
+
+
+def _safe_name(name):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
@@ -0,0 +1,120 @@
+"""
+Flow-affine sharding of a capture for multi-threaded Snort runs.
+
+flow_hash() maps both directions of a flow to the same 64-bit value: the two
+endpoints are put in a canonical order before hashing, so a flow never spans
+shards. shard_pcap() reads a capture once and writes several shard sets at
+the same time, one per shard count. A packet whose flow hashes to h goes to
+shard h % n of the n-shard set. Timestamps and packet order are kept within
+each shard.
+
+Each shard set comes with a manifest (shards.json) holding the source's
+size and mtime and the per-shard packet, byte and flow counts.
+load_shards() returns it while it still matches the source, so a capture
+is only split again when it changes.
+"""
+
+import collections
+import hashlib
+import json
+import os
+import struct
+
+from snorttest.pcap_reader import iter_pcap, packet_fields
+from snorttest.pcap_writer import PcapWriter
+
+MANIFEST = "shards.json"
+
+
+def flow_hash(frame, linktype):
+    """64-bit hash of a frame's flow, the same for both directions (0 for non-IP)."""
+    proto, src, sport, dst, dport, _, _ = packet_fields(frame, linktype)
+    if proto is None:
+        return 0
+    a, b = (bytes(src), sport), (bytes(dst), dport)
+    low, high = (a, b) if a <= b else (b, a)
+    digest = hashlib.blake2b(struct.pack("!BHH", proto, low[1], high[1]) + low[0] + high[0],
+                             digest_size=8)
+    return int.from_bytes(digest.digest(), "little")
+
+
+def shard_directory(directory, count):
+    return os.path.join(directory, f"{count}_shards")
+
+
+def _source_identity(pcap):
+    st = os.stat(pcap)
+    return {"source": os.path.abspath(pcap), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def load_shards(pcap, directory, count):
+    """The manifest of an existing count-shard set of pcap, or None if missing or stale."""
+    path = os.path.join(shard_directory(directory, count), MANIFEST)
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    identity = _source_identity(pcap)
+    if any(manifest.get(key) != value for key, value in identity.items()):
+        return None
+    if not all(os.path.exists(shard["file"]) for shard in manifest["shards"]):
+        return None
+    return manifest
+
+
+def shard_pcap(pcap, directory, counts):
+    """
+    Split pcap into a shard set for every count in counts in one pass.
+    Returns {count: manifest}; shard i of the count-shard set is
+    <directory>/<count>_shards/shard_<i>.pcap.
+    """
+    counts = sorted(set(counts))
+    records = iter_pcap(pcap, with_linktype=True)
+    linktype = next(records)
+    writers = {}
+    for count in counts:
+        os.makedirs(shard_directory(directory, count), exist_ok=True)
+        writers[count] = [PcapWriter(os.path.join(shard_directory(directory, count),
+                                                  f"shard_{i}.pcap"), linktype=linktype)
+                          for i in range(count)]
+    flows = set()
+    try:
+        for ts, frame in records:
+            key = flow_hash(frame, linktype)
+            flows.add(key)
+            for count, shards in writers.items():
+                shards[key % count].write(frame, ts)
+    finally:
+        for shards in writers.values():
+            for writer in shards:
+                writer.close()
+
+    identity = _source_identity(pcap)
+    manifests = {}
+    for count, shards in writers.items():
+        flow_counts = collections.Counter(key % count for key in flows)
+        manifest = dict(identity, count=count, shards=[
+            {"file": os.path.abspath(os.path.join(shard_directory(directory, count), f"shard_{i}.pcap")),
+             "packets": writer.packets, "bytes": writer.bytes, "flows": flow_counts[i]}
+            for i, writer in enumerate(shards)])
+        with open(os.path.join(shard_directory(directory, count), MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        manifests[count] = manifest
+    return manifests
+
+
+def shard_sets(pcap, directory, counts, reshard=False):
+    """{count: manifest} for counts, splitting pcap (in one pass) only for missing or stale sets."""
+    manifests = {} if reshard else {count: load_shards(pcap, directory, count) for count in counts}
+    missing = [count for count in counts if not manifests.get(count)]
+    if missing:
+        manifests.update(shard_pcap(pcap, directory, missing))
+    return manifests
+
+
+def imbalance(manifest):
+    """Largest shard's packet count over the mean (1.0 is perfectly even)."""
+    packets = [shard["packets"] for shard in manifest["shards"]]
+    mean = sum(packets) / len(packets)
+    return max(packets) / mean if mean else 1.0
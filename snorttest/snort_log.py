@@ -0,0 +1,216 @@
+"""
+Single-pass streaming parser for Snort -v / trace logs.
+
+parse_log() reads a log line by line, keeps track of the packet currently
+being processed ("Processing packet N") and yields a LogRecord for every
+line of interest:
+
+  packet      - a "Processing packet N" line
+  file_type   - "File type:" detections
+  verdict     - file/packet verdict lines
+  held        - packets held while a verdict is pending
+  retry       - retry queue activity
+  retransmit  - retransmission handling
+  trace       - any other module trace line (module:option:level: text)
+
+Nothing is buffered beyond the current line, so multi-GB logs parse in
+constant memory. summarize_log() folds the records into a LogSummary with
+per-kind counts and first/last packet numbers, which is what the shell
+scripts used to compute with repeated greps. parse_stats() reads the
+end-of-run statistics (daq, module and timing counters). hold_queue()
+tracks how many held packets are waiting for their retry.
+"""
+
+import collections
+import re
+
+PROCESSING_RE = re.compile(r"Processing packet\s+(\d+)")
+FILE_TYPE_MARKER = "File type:"
+FILE_TYPE_RE = re.compile(r"File type:\s*(.*?)\s*$")
+TRACE_RE = re.compile(r"^(?:P\d+:)?(?P<module>[a-z_][a-z0-9_]*):(?P<option>[a-z_][a-z0-9_]*):(?P<level>\d+):\s?(?P<text>.*)$")
+STATS_SECTIONS = ("Packet Statistics", "Module Statistics", "Summary Statistics")
+STAT_RE = re.compile(r"^\s+(?P<name>[^:]+?):\s*(?P<value>\S.*?)\s*(?:\([\d.]+%\))?\s*$")
+VERDICT_RE = re.compile(r"verdict\s*[:=]?\s*(?P<verdict>[A-Za-z_]+)", re.IGNORECASE)
+
+# Keyword checks in priority order; matched against the lower-cased line
+EVENT_KEYWORDS = (
+    ("held", ("packet held", " held ", "hold packet", "holding")),
+    ("retransmit", ("retransmit",)),
+    ("retry", ("retry", "retried")),
+    ("verdict", ("verdict",)),
+)
+
+LogRecord = collections.namedtuple("LogRecord", "kind packet line_no module text")
+
+
+def _classify(line):
+    """Return (kind, module, text) for a line of interest, else None."""
+    if FILE_TYPE_MARKER in line:
+        match = FILE_TYPE_RE.search(line)
+        return "file_type", None, match.group(1) if match else line
+    trace = TRACE_RE.match(line)
+    module = trace.group("module") if trace else None
+    text = trace.group("text") if trace else line
+    lowered = line.lower()
+    for kind, keywords in EVENT_KEYWORDS:
+        if any(keyword in lowered for keyword in keywords):
+            return kind, module, text
+    if trace:
+        return "trace", module, text
+    return None
+
+
+def parse_log(log_file, kinds=None):
+    """
+    Yield LogRecords from a Snort log, in file order.
+
+    kinds optionally restricts the output to a set of record kinds; the
+    packet counter is tracked regardless.
+    """
+    packet = None
+    with open(log_file, errors="replace") as f:
+        for line_no, line in enumerate(f, 1):
+            if "Processing packet" in line:
+                match = PROCESSING_RE.search(line)
+                if match:
+                    packet = int(match.group(1))
+                    if kinds is None or "packet" in kinds:
+                        yield LogRecord("packet", packet, line_no, None, "")
+                    continue
+            classified = _classify(line.rstrip("\n"))
+            if classified is None:
+                continue
+            kind, module, text = classified
+            if kinds is None or kind in kinds:
+                yield LogRecord(kind, packet, line_no, module, text)
+
+
+class LogSummary:
+    """Aggregate view of a log built from one pass over its records."""
+
+    def __init__(self):
+        self.total_packets = 0
+        self.counts = collections.Counter()
+        self.first_packet = {}
+        self.last_packet = {}
+        self.file_types = collections.Counter()
+        self.verdicts = collections.Counter()
+        self.trace_modules = collections.Counter()
+
+    def add(self, record):
+        if record.kind == "packet":
+            self.total_packets += 1
+            return
+        self.counts[record.kind] += 1
+        if record.packet is not None:
+            self.first_packet.setdefault(record.kind, record.packet)
+            self.last_packet[record.kind] = record.packet
+        if record.kind == "file_type":
+            self.file_types[record.text] += 1
+        elif record.kind == "verdict":
+            match = VERDICT_RE.search(record.text)
+            if match:
+                self.verdicts[match.group("verdict").lower()] += 1
+        if record.module:
+            self.trace_modules[record.module] += 1
+
+    @property
+    def detection_packet(self):
+        """Packet of the last file type detection, as the shell scripts report it."""
+        return self.last_packet.get("file_type")
+
+    def as_dict(self):
+        return {
+            "total_packets": self.total_packets,
+            "counts": dict(self.counts),
+            "first_packet": dict(self.first_packet),
+            "last_packet": dict(self.last_packet),
+            "detection_packet": self.detection_packet,
+            "file_types": dict(self.file_types),
+            "verdicts": dict(self.verdicts),
+            "trace_modules": dict(self.trace_modules),
+        }
+
+
+def summarize_log(log_file):
+    """Parse log_file once and return its LogSummary."""
+    summary = LogSummary()
+    for record in parse_log(log_file):
+        summary.add(record)
+    return summary
+
+
+def _stat_value(text):
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_stats(log_file):
+    """
+    End-of-run statistics as {module: {counter: value}}, e.g.
+    stats["daq"]["analyzed"] or stats["timing"]["pkts/sec"]. Counters of a
+    module that is listed in several sections are merged.
+    """
+    stats = {}
+    module = None
+    in_stats = False
+    with open(log_file, errors="replace") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not in_stats:
+                in_stats = line.strip() in STATS_SECTIONS
+                continue
+            if not line.strip() or line.startswith("---") or line.strip() in STATS_SECTIONS:
+                continue
+            if not line[0].isspace():
+                # Module headers are unindented; anything else ends the stats
+                if ":" in line or " " in line.strip():
+                    in_stats = False
+                    module = None
+                    continue
+                module = line.strip()
+                stats.setdefault(module, {})
+                continue
+            match = STAT_RE.match(line)
+            if match and module:
+                stats[module][match.group("name").strip()] = _stat_value(match.group("value"))
+    return stats
+
+
+def hold_queue(log_file, timestamps=None):
+    """
+    Retry queue depth over a log: every held packet joins the queue and
+    every retry leaves it, matched first in, first out. Returns the number
+    of holds and retries, the maximum depth (and the packet where it was
+    reached), the depth at the end and the hold-to-retry latencies in
+    packets, plus in capture seconds when timestamps (packet timestamps in
+    capture order, e.g. from pcap_reader.iter_pcap) are given.
+    """
+    waiting = collections.deque()
+    holds = retries = max_depth = 0
+    max_depth_packet = None
+    latency_packets = []
+    latency_seconds = []
+    for record in parse_log(log_file, kinds={"held", "retry"}):
+        if record.kind == "held":
+            holds += 1
+            waiting.append(record.packet)
+            if len(waiting) > max_depth:
+                max_depth, max_depth_packet = len(waiting), record.packet
+        else:
+            retries += 1
+            if not waiting:
+                continue
+            held = waiting.popleft()
+            if held is None or record.packet is None:
+                continue
+            latency_packets.append(record.packet - held)
+            if timestamps is not None and record.packet <= len(timestamps):
+                latency_seconds.append(timestamps[record.packet - 1] - timestamps[held - 1])
+    return {"holds": holds, "retries": retries, "max_depth": max_depth,
+            "max_depth_packet": max_depth_packet, "final_depth": len(waiting),
+            "latency_packets": latency_packets, "latency_seconds": latency_seconds}
@@ -0,0 +1,227 @@
+"""
+Snort profiler and perf_monitor capture.
+
+PROFILE_CONFIG turns on Snort's per-module and per-rule time profiling and
+perf_monitor's base and CPU trackers (CSV files in the working directory).
+It can be appended to any config (with_profiling) or passed on the Snort
+command line with --lua. At shutdown Snort prints the profile tables;
+parse_profile() turns them into
+
+    {"modules": {path: {"layer", "checks", "time_us", "avg_check",
+                        "pct_caller", "pct_total"}},
+     "rules": {"gid:sid:rev": {...}}}
+
+where a module's path names its parents, e.g. "detection/mpse".
+diff_profiles() compares two of them module by module.
+"""
+
+import csv
+import os
+import re
+import statistics
+
+PROFILE_CONFIG = """
+-- Profiling (added by the test harness)
+profiler =
+{
+    modules = { show = true, count = 0, sort = 'total_time', max_depth = -1 },
+    rules = { show = true, count = 0, sort = 'total_time' },
+}
+
+perf_monitor =
+{
+    base = true,
+    cpu = true,
+    seconds = 1,
+    output = 'file',
+    format = 'csv',
+}
+"""
+
+# Modules reported first in summaries and diffs
+KEY_MODULES = ("stream_tcp", "http_inspect", "file_id", "detection")
+
+MODULE_TABLE = "Module Profile Statistics"
+RULE_TABLE = "Rule Profile Statistics"
+PERF_MONITOR_FILES = ("perf_monitor_base.csv", "perf_monitor_cpu.csv")
+
+# Header names as printed by Snort -> our field names
+COLUMNS = {
+    "module": "module", "layer": "layer", "checks": "checks", "time(us)": "time_us",
+    "avg/check": "avg_check", "%/caller": "pct_caller", "%/total": "pct_total",
+    "gid": "gid", "sid": "sid", "rev": "rev", "matches": "matches", "alerts": "alerts",
+    "avg/match": "avg_match", "avg/non-match": "avg_nonmatch", "timeouts": "timeouts",
+    "suspends": "suspends", "disables": "disables", "rule_time(%)": "pct_total",
+}
+_ROW_INDEX_RE = re.compile(r"^\d+(?:\.\d+)*$")
+
+
+def with_profiling(config):
+    """config with PROFILE_CONFIG appended (later Lua assignments win)."""
+    return config.rstrip("\n") + "\n" + PROFILE_CONFIG
+
+
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return text
+
+
+def _parse_table(lines):
+    """Rows of a profile table as dicts keyed by COLUMNS names."""
+    header = None
+    rows = []
+    for line in lines:
+        stripped = line.strip()
+        if header is None:
+            fields = stripped.split()
+            if fields[:1] == ["#"] and "checks" in fields:
+                header = [COLUMNS.get(name, name) for name in fields[1:]]
+            continue
+        if not stripped or stripped.startswith("==="):
+            if rows:
+                break
+            continue
+        if stripped.startswith("---"):
+            break
+        fields = stripped.split()
+        if not _ROW_INDEX_RE.match(fields[0]) or len(fields) - 1 != len(header):
+            continue
+        rows.append({name: _number(value) for name, value in zip(header, fields[1:])})
+    return rows
+
+
+def _table_lines(log_file):
+    """{table title: [lines after it]} for the profile tables in a Snort log."""
+    tables = {}
+    current = None
+    with open(log_file, errors="replace") as f:
+        for line in f:
+            title = line.strip()
+            if title in (MODULE_TABLE, RULE_TABLE):
+                current = tables.setdefault(title, [])
+                continue
+            if current is not None:
+                current.append(line)
+                # Tables are a few hundred lines at most
+                if len(current) > 10000:
+                    current = None
+    return tables
+
+
+def parse_profile(log_file):
+    """Per-module and per-rule profile of a Snort log ({} sections if profiling was off)."""
+    tables = _table_lines(log_file)
+    modules = {}
+    parents = []
+    for row in _parse_table(tables.get(MODULE_TABLE, [])):
+        name = row.pop("module", None)
+        if name is None:
+            continue
+        layer = row.get("layer")
+        layer = layer if isinstance(layer, int) else 0
+        del parents[layer:]
+        parents.append(name)
+        modules["/".join(parents)] = row
+    rules = {}
+    for row in _parse_table(tables.get(RULE_TABLE, [])):
+        key = f"{row.pop('gid', 0)}:{row.pop('sid', 0)}:{row.pop('rev', 0)}"
+        rules[key] = row
+    return {"modules": modules, "rules": rules}
+
+
+def read_perf_monitor(workdir):
+    """
+    Totals of the perf_monitor CSV files in workdir: per file the number of
+    intervals and the sum of every numeric column except the timestamp.
+    """
+    summary = {}
+    for name in PERF_MONITOR_FILES:
+        path = os.path.join(workdir, name)
+        if not os.path.exists(path):
+            continue
+        totals = {}
+        intervals = 0
+        with open(path, newline="") as f:
+            for row in csv.DictReader(line for line in f if not line.startswith("#")):
+                intervals += 1
+                for column, value in row.items():
+                    value = _number(value.strip()) if value else None
+                    if column and column != "timestamp" and isinstance(value, (int, float)):
+                        totals[column] = totals.get(column, 0) + value
+        summary[os.path.splitext(name)[0]] = {"intervals": intervals, "totals": totals}
+    return summary
+
+
+def merge_profiles(profiles):
+    """Median of every numeric field across several runs' profiles."""
+    if len(profiles) == 1:
+        return profiles[0]
+    merged = {}
+    for section in ("modules", "rules"):
+        values = {}
+        for profile in profiles:
+            for name, row in profile.get(section, {}).items():
+                for field, value in row.items():
+                    if isinstance(value, (int, float)):
+                        values.setdefault(name, {}).setdefault(field, []).append(value)
+        merged[section] = {name: {field: statistics.median(v) for field, v in fields.items()}
+                           for name, fields in values.items()}
+    return merged
+
+
+def _module_order(names):
+    key = [name for module in KEY_MODULES for name in names
+           if name == module or name.endswith("/" + module)]
+    return key + [name for name in names if name not in key]
+
+
+def diff_profiles(before, after, section="modules"):
+    """
+    Per-entry comparison of two profiles, key modules first, then by the
+    size of the time change: dicts with time/checks/avg before and after.
+    """
+    old, new = before.get(section, {}), after.get(section, {})
+    rows = []
+    for name in set(old) | set(new):
+        a, b = old.get(name, {}), new.get(name, {})
+        time_a, time_b = a.get("time_us", 0), b.get("time_us", 0)
+        rows.append({"name": name, "time_before": time_a, "time_after": time_b,
+                     "time_delta": time_b - time_a,
+                     "time_ratio": time_b / time_a if time_a else None,
+                     "checks_before": a.get("checks", 0), "checks_after": b.get("checks", 0),
+                     "avg_before": a.get("avg_check", 0), "avg_after": b.get("avg_check", 0)})
+    rows.sort(key=lambda row: -abs(row["time_delta"]))
+    if section == "modules":
+        order = {name: i for i, name in enumerate(_module_order([row["name"] for row in rows]))}
+        rows.sort(key=lambda row: order[row["name"]])
+    return rows
+
+
+def format_profile(profile, section="modules", top=20):
+    """Text table of a profile's busiest entries, key modules first."""
+    entries = profile.get(section, {})
+    names = sorted(entries, key=lambda name: -entries[name].get("time_us", 0))[:top]
+    if section == "modules":
+        names = _module_order(names)
+    lines = [f"{'name':<32} {'checks':>12} {'time(us)':>14} {'avg/check':>10} {'%/total':>8}"]
+    for name in names:
+        row = entries[name]
+        lines.append(f"{name:<32} {row.get('checks', 0):>12} {row.get('time_us', 0):>14} "
+                     f"{row.get('avg_check', 0):>10} {row.get('pct_total', 0):>8}")
+    return "\n".join(lines)
+
+
+def format_profile_diff(rows, top=20):
+    """Text table of diff_profiles() rows."""
+    lines = [f"{'name':<32} {'time before':>12} {'time after':>12} {'change':>9} "
+             f"{'checks before':>14} {'checks after':>13}"]
+    for row in rows[:top]:
+        change = f"{row['time_ratio'] - 1:+.1%}" if row["time_ratio"] is not None else "new"
+        lines.append(f"{row['name']:<32} {row['time_before']:>12} {row['time_after']:>12} {change:>9} "
+                     f"{row['checks_before']:>14} {row['checks_after']:>13}")
+    return "\n".join(lines)
@@ -0,0 +1,172 @@
+"""
+Stream generated packets straight into Snort instead of staging a pcap.
+
+stream_job() starts Snort on a job and feeds it the frames of a generator
+while they are produced, either through Snort's stdin ("-r -") or through a
+named FIFO in the job's working directory. Generation and inspection overlap
+and no capture file is written.
+
+Backpressure is the pipe itself: writes block while the kernel pipe buffer
+(grown to PIPE_SIZE where the system allows) is full, so the generator never
+runs more than a buffer ahead of Snort and memory stays flat. If Snort exits
+early the write fails with EPIPE; generation stops and the job result says
+how many packets were sent.
+
+open_sink() gives generators the same targets: a filename, "-" for stdout or
+an existing FIFO read by a Snort started separately.
+"""
+
+import errno
+import fcntl
+import os
+import stat
+import subprocess
+import sys
+import time
+
+from snorttest.pcap_writer import PcapWriter
+from snorttest.runner import job_result, prepare_workdir, wait_with_rusage
+
+PIPE_SIZE = 1024 * 1024
+# Linux fcntl to resize a pipe; not exported by every Python build
+F_SETPIPE_SZ = getattr(fcntl, "F_SETPIPE_SZ", 1031)
+FIFO_NAME = "stream.pcap"
+
+
+def grow_pipe(fd, size=PIPE_SIZE):
+    """Grow the pipe behind fd to size bytes (capped by the system); returns the new size."""
+    try:
+        return fcntl.fcntl(fd, F_SETPIPE_SZ, size)
+    except OSError:
+        return None
+
+
+def is_fifo(path):
+    try:
+        return stat.S_ISFIFO(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+
+def is_stream_target(target):
+    """True for targets that are consumed while written: stdout or a FIFO."""
+    return target == "-" or is_fifo(target)
+
+
+def _exited(proc):
+    """Whether proc has exited, without reaping it (its rusage is still needed)."""
+    return os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is not None
+
+
+def open_fifo_writer(path, reader=None, poll=0.05):
+    """
+    Open a FIFO for writing once a reader has it open.
+
+    The open is retried non-blocking so that a reader process (a Popen) that
+    dies before opening the FIFO raises instead of hanging forever. The
+    returned file blocks on writes for backpressure.
+    """
+    while True:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+            break
+        except OSError as e:
+            if e.errno != errno.ENXIO:
+                raise
+            if reader is not None and _exited(reader):
+                raise BrokenPipeError(f"Reader exited before opening {path}")
+            time.sleep(poll)
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags & ~os.O_NONBLOCK)
+    grow_pipe(fd)
+    return os.fdopen(fd, "wb", buffering=PIPE_SIZE)
+
+
+def open_sink(target):
+    """
+    PcapWriter for a filename, "-" (stdout) or a FIFO path.
+
+    Writing to a FIFO waits for its reader (e.g. "snort -r PATH") to open it.
+    """
+    if target == "-":
+        grow_pipe(sys.stdout.fileno())
+        return PcapWriter(sys.stdout.buffer)
+    if is_fifo(target):
+        return PcapWriter(open_fifo_writer(target))
+    return PcapWriter(target)
+
+
+def _close_quietly(sink):
+    """Close sink, ignoring a reader that has already gone away."""
+    try:
+        sink.close()
+    except BrokenPipeError:
+        pass
+
+
+def _feed(sink, frames):
+    """
+    Write a pcap of frames to sink until done or the reader goes away.
+    Returns (packets, bytes, complete). sink is closed however this ends,
+    including when frames or a write raises.
+    """
+    writer = None
+    try:
+        writer = PcapWriter(sink)
+        writer.write_all(frames)
+        writer.close()
+        sink.close()
+    except BrokenPipeError:
+        return (writer.packets, writer.bytes, False) if writer else (0, 0, False)
+    finally:
+        if not sink.closed:
+            _close_quietly(sink)
+    return writer.packets, writer.bytes, True
+
+
+def stream_job(job, frames, workdir, snort="snort", support_dir=None, timeout=None, via="pipe"):
+    """
+    Run job with frames streamed into Snort and return its result dict.
+
+    via is "pipe" (Snort reads stdin) or "fifo" (Snort reads a FIFO in
+    workdir). timeout bounds the wait for Snort after the last packet.
+    """
+    if via not in ("pipe", "fifo"):
+        raise ValueError(f"Unknown stream mode: {via}")
+    prepare_workdir(job, workdir, support_dir)
+    log_file = os.path.join(workdir, "snort.log")
+    started = time.monotonic()
+    with open(log_file, "w") as log:
+        if via == "pipe":
+            proc = subprocess.Popen(job.command(snort, pcap="-"), cwd=workdir, stdin=subprocess.PIPE,
+                                    stdout=log, stderr=subprocess.STDOUT)
+        else:
+            fifo = os.path.abspath(os.path.join(workdir, FIFO_NAME))
+            if os.path.lexists(fifo):
+                os.unlink(fifo)
+            os.mkfifo(fifo)
+            proc = subprocess.Popen(job.command(snort, pcap=fifo), cwd=workdir,
+                                    stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT)
+        sink = None
+        try:
+            if via == "pipe":
+                grow_pipe(proc.stdin.fileno())
+                sink = proc.stdin
+            else:
+                try:
+                    sink = open_fifo_writer(fifo, reader=proc)
+                except BrokenPipeError:
+                    pass
+            packets, sent, complete = _feed(sink, frames) if sink else (0, 0, False)
+        except BaseException:
+            # Snort would otherwise be left running on a stream that never finishes
+            if sink is not None and not sink.closed:
+                _close_quietly(sink)
+            proc.kill()
+            proc.wait()
+            raise
+        returncode, rusage = wait_with_rusage(proc, timeout)
+
+    result = job_result(job, workdir, log_file, returncode, rusage, started)
+    result.update(streamed=via, sent_packets=packets, sent_bytes=sent, stream_complete=complete)
+    return result
@@ -0,0 +1,66 @@
+"""
+Adaptive search for the points where a step-shaped signal changes.
+
+find_transitions() locates every x in [lo, hi] where signal(x) != signal(x + 1)
+for an integer parameter, probing as few points as possible. It assumes the
+signal is piecewise constant with few steps (such as the packet in which
+Snort detects a file type, as a function of type_depth or segment size): an
+interval whose ends agree is taken to contain no step. Each round probes
+`workers` points at once, spread over the intervals that still contain a
+step, so k steps in a range of n values cost about k * log2(n) probes in
+total and log(n) / log(workers + 1) rounds.
+"""
+
+
+def _interior(lo, hi, count):
+    """Up to count distinct points strictly between lo and hi, evenly spaced."""
+    points = {lo + (hi - lo) * i // (count + 1) for i in range(1, count + 1)}
+    return sorted(points - {lo, hi})
+
+
+def find_transitions(probe, lo, hi, workers=1, max_probes=None):
+    """
+    Bisect [lo, hi] for signal changes.
+
+    probe(points) measures a list of points (in parallel if it likes) and
+    returns {point: signal}. Returns (transitions, signals, rounds) where
+    transitions is a list of (x, x + 1) pairs whose signals differ, and
+    signals holds every probed point. Stops early once max_probes points
+    have been measured; unresolved intervals are then reported as (a, b)
+    pairs with b > a + 1.
+    """
+    if lo > hi:
+        raise ValueError(f"Empty search range: {lo}..{hi}")
+    signals = {}
+
+    def measure(points):
+        new = [x for x in dict.fromkeys(points) if x not in signals]
+        if new:
+            signals.update(probe(new))
+
+    measure([lo, hi])
+    transitions = []
+    pending = [(lo, hi)] if signals[lo] != signals[hi] else []
+    rounds = 0
+    while pending:
+        if max_probes is not None and len(signals) >= max_probes:
+            transitions.extend(pending)
+            break
+        per_interval = max(1, workers // len(pending))
+        plan = []
+        for a, b in pending:
+            if b - a == 1:
+                transitions.append((a, b))
+                continue
+            plan.append([a, *_interior(a, b, per_interval), b])
+        measure([x for edges in plan for x in edges[1:-1]])
+        rounds += 1
+        pending = []
+        for edges in plan:
+            for a, b in zip(edges, edges[1:]):
+                if signals[a] != signals[b]:
+                    if b - a == 1:
+                        transitions.append((a, b))
+                    else:
+                        pending.append((a, b))
+    return sorted(transitions), signals, rounds
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Randomized TCP reassembly fuzzing packed into one capture.
+
+Generates thousands of reorder / duplicate / overlap / gap permutations of
+an HTTP response body, each on its own 5-tuple, into a single pcap
+(see snorttest.reassembly_fuzz), runs Snort on it with one oracle rule per
+case and reports every flow whose reassembled body differs from the
+original.
+
+  fuzz_reassembly.py run --cases 10000 --seed 7
+      generate (cached), run Snort, check the alerts; exits 1 on failures
+  fuzz_reassembly.py generate --cases 10000 -o fuzz.pcap
+      write fuzz.pcap, fuzz.json (the manifest) and fuzz.rules only
+  fuzz_reassembly.py check fuzz.json --alerts output/snort.log
+  fuzz_reassembly.py check fuzz.json --pcap inline_out.pcap
+      check a Snort log's alerts, or reassemble a capture in Python
+  fuzz_reassembly.py extract fuzz.json 1234 -o case1234.pcap
+      rebuild one failing case on its own for triage
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snorttest.lua_config import Lua, LuaConfig, http_inspect, stream_tcp
+from snorttest.pcap_cache import cached_outputs
+from snorttest.pcap_writer import write_pcap
+from snorttest.reassembly_fuzz import (alerted_sids, check_alerts, check_capture, fuzz_capture,
+                                       oracle_rules)
+from snorttest.runner import ConfigError, SnortJob, run_job
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def fuzz_config(policy="bsd"):
+    """The reassembly test's stream settings with only the oracle rules and no tracing."""
+    config = LuaConfig(home_net="192.168.1.0/24", external_net="10.1.1.0/24")
+    config.set("stream", {"tcp_cache": {"idle_timeout": 180}, "max_flows": 8192},
+               "Stream configuration")
+    config.set("stream_tcp", stream_tcp(policy=policy, max_window=65535, overlap_limit=10,
+                                        max_pdu=16384, show_rebuilt_packets=False,
+                                        flush_factor=None,
+                                        queue_limit={"max_bytes": 4194304, "max_segments": 3000}))
+    config.set("http_inspect", http_inspect(request_depth=65535, response_depth=65535),
+               "HTTP Inspector")
+    config.set("wizard", Lua("default_wizard"), "Wizard for protocol identification")
+    config.set("ips", {"include": "fuzz.rules", "enable_builtin_rules": False},
+               "One oracle rule per case")
+    return config.render()
+
+def generate(output, cases, seed, options, use_cache=True):
+    """Write output, its manifest (.json) and oracle rules (.rules); returns the manifest."""
+    stem = os.path.splitext(os.path.basename(output))[0]
+    names = [os.path.basename(output), stem + ".json", stem + ".rules"]
+
+    def build(directory):
+        frames, manifest = fuzz_capture(cases, seed, **options)
+        packets = write_pcap(os.path.join(directory, names[0]), frames)
+        with open(os.path.join(directory, names[1]), "w") as f:
+            json.dump(manifest, f)
+        with open(os.path.join(directory, names[2]), "w") as f:
+            f.write(oracle_rules(manifest))
+        return {"packets": packets}
+
+    _, info = cached_outputs("reassembly_fuzz", dict(options, cases=cases), build, names, seed=seed,
+                             sources=[__file__], dest=os.path.dirname(output) or ".",
+                             use_cache=use_cache)
+    print(f"Created {output}: {cases} cases, {info['packets']} packets")
+    return load_manifest(os.path.join(os.path.dirname(output), names[1]))
+
+def load_manifest(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+def report(failures, total):
+    for case in failures[:50]:
+        got = f", rebuilt {case['got']} of {case['length']} bytes" if "got" in case else ""
+        hole = f", hole at {case['hole']}" if case.get("hole") is not None else ""
+        print(f"  case {case['case']} ({case['client']}:{case['client_port']}, "
+              f"{case['length']} bytes{got}{hole}): {'; '.join(case['ops']) or 'in order'}")
+    if len(failures) > 50:
+        print(f"  ... {len(failures) - 50} more")
+    print(f"{total - len(failures)}/{total} cases reassembled intact, {len(failures)} differ")
+    return 1 if failures else 0
+
+def cmd_generate(args):
+    generate(args.output, args.cases, args.seed, generator_options(args), not args.no_cache)
+    return 0
+
+def cmd_run(args):
+    pcap = os.path.join(args.output_dir, "fuzz.pcap")
+    manifest = generate(pcap, args.cases, args.seed, generator_options(args), not args.no_cache)
+    with open(os.path.join(args.output_dir, "fuzz.rules")) as f:
+        rules = f.read()
+    job = SnortJob(f"fuzz_{args.policy}", fuzz_config(args.policy), pcap,
+                   params={"cases": args.cases, "seed": args.seed, "policy": args.policy},
+                   files={"fuzz.rules": rules}, args=("-A", "alert_fast", "-k", "none"))
+    try:
+        result = run_job(job, os.path.join(args.output_dir, job.name), snort=args.snort,
+                         support_dir=HERE, timeout=args.timeout)
+    except ConfigError as e:
+        sys.exit(str(e))
+    if result["returncode"] != 0:
+        sys.exit(f"Snort exited with {result['returncode']}; see {result['log']}")
+    print(f"Snort processed {result['total_packets']} packets in {result['wall_time']:.1f}s")
+    failures = check_alerts(manifest, alerted_sids(result["log"]))
+    with open(os.path.join(args.output_dir, "failures.json"), "w") as f:
+        json.dump(failures, f, indent=2)
+    return report(failures, len(manifest["cases"]))
+
+def cmd_check(args):
+    manifest = load_manifest(args.manifest)
+    if args.pcap:
+        failures = check_capture(manifest, args.pcap)
+    else:
+        failures = check_alerts(manifest, alerted_sids(args.alerts))
+    return report(failures, len(manifest["cases"]))
+
+def cmd_extract(args):
+    manifest = load_manifest(args.manifest)
+    frames, cases = fuzz_capture(args.case, manifest["seed"], **manifest["options"])
+    packets = write_pcap(args.output, frames)
+    stem = os.path.splitext(args.output)[0]
+    with open(stem + ".json", "w") as f:
+        json.dump(cases, f, indent=2)
+    with open(stem + ".rules", "w") as f:
+        f.write(oracle_rules(cases))
+    print(f"Wrote case(s) {', '.join(map(str, args.case))} to {args.output} ({packets} packets)")
+    return 0
+
+def generator_options(args):
+    return {"min_body": args.min_body, "max_body": args.max_body,
+            "max_segment": args.max_segment, "mutations": args.mutations}
+
+def main():
+    parser = argparse.ArgumentParser(description="Randomized TCP reassembly permutation fuzzer")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def generator_arguments(p):
+        p.add_argument("--cases", type=int, default=1000, help="number of permutations (flows)")
+        p.add_argument("--seed", type=int, default=1, help="fuzzer seed")
+        p.add_argument("--min-body", type=int, default=256, help="smallest response body")
+        p.add_argument("--max-body", type=int, default=4096, help="largest response body")
+        p.add_argument("--max-segment", type=int, default=400, help="largest body segment")
+        p.add_argument("--mutations", type=int, default=3, help="most mutations per case")
+        p.add_argument("--no-cache", action="store_true", help="always regenerate the capture")
+
+    p = sub.add_parser("generate", help="write the capture, manifest and oracle rules")
+    generator_arguments(p)
+    p.add_argument("-o", "--output", default="fuzz.pcap", help="PCAP file to write")
+    p.set_defaults(func=cmd_generate)
+
+    p = sub.add_parser("run", help="generate, run Snort and check every case")
+    generator_arguments(p)
+    p.add_argument("--policy", default="bsd", help="stream_tcp overlap policy")
+    p.add_argument("--snort", default="snort", help="Snort binary")
+    p.add_argument("--timeout", type=float, help="Snort timeout in seconds")
+    p.add_argument("--output-dir", default="fuzz_output", help="capture and Snort working directory")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser("check", help="check a Snort log or a capture against a manifest")
+    p.add_argument("manifest", help="manifest written by generate / run")
+    source = p.add_mutually_exclusive_group(required=True)
+    source.add_argument("--alerts", help="Snort log with alert_fast output")
+    source.add_argument("--pcap", help="capture to reassemble in Python (e.g. inline output)")
+    p.set_defaults(func=cmd_check)
+
+    p = sub.add_parser("extract", help="rebuild chosen cases into their own capture")
+    p.add_argument("manifest", help="manifest written by generate / run")
+    p.add_argument("case", type=int, nargs="+", help="case numbers")
+    p.add_argument("-o", "--output", default="case.pcap", help="PCAP file to write")
+    p.set_defaults(func=cmd_extract)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+if __name__ == "__main__":
+    main()
@@ -4,222 +4,216 @@ Generate a PCAP file with TCP packets designed to test Snort's TCP reassembly
 with partial flush, retransmissions, and out-of-order packets.
 """
 
-from scapy.all import *
+import argparse
+import os
 import random
-import time
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snorttest.pcap_cache import cached_outputs
+from snorttest.pcap_writer import TcpFlow, encode_tcp_options, timestamp_option, write_pcap
+
+def tcp_reassembly_test_packets(rng=random):
+    """Yield the TCP packets of the reassembly test session in capture order."""
 
-def create_tcp_reassembly_test_pcap(filename="tcp_reassembly_test.pcap"):
-    """Create a PCAP file with TCP packets to test reassembly issues."""
-    
     # Define IP addresses
     client_ip = "192.168.1.100"
     server_ip = "10.1.1.100"
     client_port = 49152
     server_port = 80
-    
+    flow = TcpFlow(client_ip, server_ip, client_port, server_port)
+
     # Initialize sequence numbers
-    client_seq = random.randint(1000000, 9000000)
-    server_seq = random.randint(1000000, 9000000)
-    
-    # Create packets list
-    packets = []
-    
+    client_seq = rng.randint(1000000, 9000000)
+    server_seq = rng.randint(1000000, 9000000)
+
     # 1. TCP 3-way handshake
     # SYN
-    syn = Ether()/IP(src=client_ip, dst=server_ip)/TCP(
-        sport=client_port, dport=server_port, flags="S", seq=client_seq,
-        options=[('MSS', 1460), ('NOP', None), ('NOP', None), 
-                 ('Timestamp', (100, 0)), ('WScale', 7)]
+    syn = flow.client(
+        flags="S", seq=client_seq,
+        options=encode_tcp_options([('MSS', 1460), ('NOP', None), ('NOP', None),
+                                    ('Timestamp', (100, 0)), ('WScale', 7)])
     )
-    packets.append(syn)
-    
+    yield syn
+
     # SYN-ACK
-    syn_ack = Ether()/IP(src=server_ip, dst=client_ip)/TCP(
-        sport=server_port, dport=client_port, flags="SA", 
-        seq=server_seq, ack=client_seq+1,
-        options=[('MSS', 1460), ('NOP', None), ('NOP', None), 
-                 ('Timestamp', (200, 100)), ('WScale', 7)]
-    )
-    packets.append(syn_ack)
-    
+    syn_ack = flow.server(
+        flags="SA", seq=server_seq, ack=client_seq+1,
+        options=encode_tcp_options([('MSS', 1460), ('NOP', None), ('NOP', None),
+                                    ('Timestamp', (200, 100)), ('WScale', 7)])
+    )
+    yield syn_ack
+
     # ACK
-    ack = Ether()/IP(src=client_ip, dst=server_ip)/TCP(
-        sport=client_port, dport=server_port, flags="A", 
-        seq=client_seq+1, ack=server_seq+1,
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (300, 200))]
-    )
-    packets.append(ack)
-    
+    ack = flow.client(
+        flags="A", seq=client_seq+1, ack=server_seq+1,
+        options=timestamp_option(300, 200)
+    )
+    yield ack
+
     # 2. HTTP Request (split into multiple segments to trigger reassembly)
-    http_req_part1 = Ether()/IP(src=client_ip, dst=server_ip)/TCP(
-        sport=client_port, dport=server_port, flags="PA", 
-        seq=client_seq+1, ack=server_seq+1,
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (400, 200))]
-    )/Raw(load="GET /index.html HTTP/1.1\r\nHost: example.com\r\n")
-    packets.append(http_req_part1)
-    
+    req_part1_load = b"GET /index.html HTTP/1.1\r\nHost: example.com\r\n"
+    http_req_part1 = flow.client(
+        flags="PA", seq=client_seq+1, ack=server_seq+1,
+        payload=req_part1_load, options=timestamp_option(400, 200)
+    )
+    yield http_req_part1
+
     # Server ACK for part 1
-    server_ack1 = Ether()/IP(src=server_ip, dst=client_ip)/TCP(
-        sport=server_port, dport=client_port, flags="A", 
-        seq=server_seq+1, ack=client_seq+1+len(http_req_part1[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (500, 400))]
-    )
-    packets.append(server_ack1)
-    
+    server_ack1 = flow.server(
+        flags="A", seq=server_seq+1, ack=client_seq+1+len(req_part1_load),
+        options=timestamp_option(500, 400)
+    )
+    yield server_ack1
+
     # HTTP Request part 2
-    http_req_part2 = Ether()/IP(src=client_ip, dst=server_ip)/TCP(
-        sport=client_port, dport=server_port, flags="PA", 
-        seq=client_seq+1+len(http_req_part1[Raw]), ack=server_seq+1,
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (600, 500))]
-    )/Raw(load="Content-Length: 0\r\n\r\n")
-    packets.append(http_req_part2)
-    
+    req_part2_load = b"Content-Length: 0\r\n\r\n"
+    http_req_part2 = flow.client(
+        flags="PA", seq=client_seq+1+len(req_part1_load), ack=server_seq+1,
+        payload=req_part2_load, options=timestamp_option(600, 500)
+    )
+    yield http_req_part2
+
+    # Client sequence number once the whole request has been sent
+    client_next = client_seq+1+len(req_part1_load)+len(req_part2_load)
+
     # Server ACK for part 2
-    server_ack2 = Ether()/IP(src=server_ip, dst=client_ip)/TCP(
-        sport=server_port, dport=client_port, flags="A", 
-        seq=server_seq+1, ack=client_seq+1+len(http_req_part1[Raw])+len(http_req_part2[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (700, 600))]
-    )
-    packets.append(server_ack2)
-    
+    server_ack2 = flow.server(
+        flags="A", seq=server_seq+1, ack=client_next,
+        options=timestamp_option(700, 600)
+    )
+    yield server_ack2
+
     # 3. HTTP Response (split into multiple segments with out-of-order delivery)
     # First, calculate the total response size
-    http_resp_header = "HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: 1000\r\n\r\n"
-    http_resp_body = "<html><body>" + "X" * 980 + "</body></html>"
-    
+    http_resp_header = b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: 1000\r\n\r\n"
+    http_resp_body = b"<html><body>" + b"X" * 980 + b"</body></html>"
+
     # Send response header
-    http_resp_part1 = Ether()/IP(src=server_ip, dst=client_ip)/TCP(
-        sport=server_port, dport=client_port, flags="PA", 
-        seq=server_seq+1, ack=client_seq+1+len(http_req_part1[Raw])+len(http_req_part2[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (800, 700))]
-    )/Raw(load=http_resp_header)
-    packets.append(http_resp_part1)
-    
+    http_resp_part1 = flow.server(
+        flags="PA", seq=server_seq+1, ack=client_next,
+        payload=http_resp_header, options=timestamp_option(800, 700)
+    )
+    yield http_resp_part1
+
     # Client ACK for response header
-    client_ack1 = Ether()/IP(src=client_ip, dst=server_ip)/TCP(
-        sport=client_port, dport=server_port, flags="A", 
-        seq=client_seq+1+len(http_req_part1[Raw])+len(http_req_part2[Raw]), 
-        ack=server_seq+1+len(http_resp_part1[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (900, 800))]
-    )
-    packets.append(client_ack1)
-    
+    client_ack1 = flow.client(
+        flags="A", seq=client_next, ack=server_seq+1+len(http_resp_header),
+        options=timestamp_option(900, 800)
+    )
+    yield client_ack1
+
     # Split response body into chunks
     chunk_size = 200
     chunks = [http_resp_body[i:i+chunk_size] for i in range(0, len(http_resp_body), chunk_size)]
-    
+
     # Send chunks out of order: 3, 1, 4, 2, 5
     chunk_order = [2, 0, 3, 1, 4]
-    
+
     for i, chunk_idx in enumerate(chunk_order):
         chunk = chunks[chunk_idx]
-        chunk_seq = server_seq+1+len(http_resp_part1[Raw])+chunk_idx*chunk_size
-        
-        http_resp_chunk = Ether()/IP(src=server_ip, dst=client_ip)/TCP(
-            sport=server_port, dport=client_port, flags="PA" if i == len(chunk_order)-1 else "A", 
-            seq=chunk_seq, ack=client_seq+1+len(http_req_part1[Raw])+len(http_req_part2[Raw]),
-            options=[('NOP', None), ('NOP', None), 
-                     ('Timestamp', (1000+i*100, 900))]
-        )/Raw(load=chunk)
-        packets.append(http_resp_chunk)
-        
+        chunk_seq = server_seq+1+len(http_resp_header)+chunk_idx*chunk_size
+
+        http_resp_chunk = flow.server(
+            flags="PA" if i == len(chunk_order)-1 else "A",
+            seq=chunk_seq, ack=client_next,
+            payload=chunk, options=timestamp_option(1000+i*100, 900)
+        )
+        yield http_resp_chunk
+
         # Client ACK for each chunk
-        client_ack_chunk = Ether()/IP(src=client_ip, dst=server_ip)/TCP(
-            sport=client_port, dport=server_port, flags="A", 
-            seq=client_seq+1+len(http_req_part1[Raw])+len(http_req_part2[Raw]), 
-            ack=chunk_seq+len(chunk),
-            options=[('NOP', None), ('NOP', None), 
-                     ('Timestamp', (1100+i*100, 1000+i*100))]
+        client_ack_chunk = flow.client(
+            flags="A", seq=client_next, ack=chunk_seq+len(chunk),
+            options=timestamp_option(1100+i*100, 1000+i*100)
         )
-        packets.append(client_ack_chunk)
-    
+        yield client_ack_chunk
+
     # 4. Retransmit a packet that should trigger partial flush
     # Retransmit chunk 1 (which was sent as the second chunk)
     retrans_chunk = chunks[0]
-    retrans_seq = server_seq+1+len(http_resp_part1[Raw])
-    
-    http_resp_retrans = Ether()/IP(src=server_ip, dst=client_ip)/TCP(
-        sport=server_port, dport=client_port, flags="A", 
-        seq=retrans_seq, ack=client_seq+1+len(http_req_part1[Raw])+len(http_req_part2[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (1600, 1500))]
-    )/Raw(load=retrans_chunk)
-    packets.append(http_resp_retrans)
-    
+    retrans_seq = server_seq+1+len(http_resp_header)
+
+    http_resp_retrans = flow.server(
+        flags="A", seq=retrans_seq, ack=client_next,
+        payload=retrans_chunk, options=timestamp_option(1600, 1500)
+    )
+    yield http_resp_retrans
+
     # 5. Send a packet with sequence number less than the retransmitted packet
     # This packet should be dropped if the issue exists
-    small_seq_packet = Ether()/IP(src=server_ip, dst=client_ip)/TCP(
-        sport=server_port, dport=client_port, flags="A", 
-        seq=retrans_seq-50, ack=client_seq+1+len(http_req_part1[Raw])+len(http_req_part2[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (1700, 1600))]
-    )/Raw(load="This packet has a sequence number less than the retransmitted packet")
-    packets.append(small_seq_packet)
-    
+    small_seq_packet = flow.server(
+        flags="A", seq=retrans_seq-50, ack=client_next,
+        payload=b"This packet has a sequence number less than the retransmitted packet",
+        options=timestamp_option(1700, 1600)
+    )
+    yield small_seq_packet
+
     # 6. Send a normal packet after the problematic ones
-    normal_packet = Ether()/IP(src=server_ip, dst=client_ip)/TCP(
-        sport=server_port, dport=client_port, flags="PA", 
-        seq=server_seq+1+len(http_resp_part1[Raw])+len(http_resp_body), 
-        ack=client_seq+1+len(http_req_part1[Raw])+len(http_req_part2[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (1800, 1700))]
-    )/Raw(load="This is a normal packet after the problematic sequence")
-    packets.append(normal_packet)
-    
+    normal_load = b"This is a normal packet after the problematic sequence"
+    server_next = server_seq+1+len(http_resp_header)+len(http_resp_body)
+    normal_packet = flow.server(
+        flags="PA", seq=server_next, ack=client_next,
+        payload=normal_load, options=timestamp_option(1800, 1700)
+    )
+    yield normal_packet
+
     # Client ACK for the normal packet
-    client_ack_final = Ether()/IP(src=client_ip, dst=server_ip)/TCP(
-        sport=client_port, dport=server_port, flags="A", 
-        seq=client_seq+1+len(http_req_part1[Raw])+len(http_req_part2[Raw]), 
-        ack=server_seq+1+len(http_resp_part1[Raw])+len(http_resp_body)+len(normal_packet[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (1900, 1800))]
-    )
-    packets.append(client_ack_final)
-    
+    client_ack_final = flow.client(
+        flags="A", seq=client_next, ack=server_next+len(normal_load),
+        options=timestamp_option(1900, 1800)
+    )
+    yield client_ack_final
+
     # 7. Connection teardown
     # FIN from client
-    fin = Ether()/IP(src=client_ip, dst=server_ip)/TCP(
-        sport=client_port, dport=server_port, flags="FA", 
-        seq=client_seq+1+len(http_req_part1[Raw])+len(http_req_part2[Raw]), 
-        ack=server_seq+1+len(http_resp_part1[Raw])+len(http_resp_body)+len(normal_packet[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (2000, 1900))]
-    )
-    packets.append(fin)
-    
+    fin = flow.client(
+        flags="FA", seq=client_next, ack=server_next+len(normal_load),
+        options=timestamp_option(2000, 1900)
+    )
+    yield fin
+
     # FIN-ACK from server
-    fin_ack = Ether()/IP(src=server_ip, dst=client_ip)/TCP(
-        sport=server_port, dport=client_port, flags="FA", 
-        seq=server_seq+1+len(http_resp_part1[Raw])+len(http_resp_body)+len(normal_packet[Raw]), 
-        ack=client_seq+2+len(http_req_part1[Raw])+len(http_req_part2[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (2100, 2000))]
-    )
-    packets.append(fin_ack)
-    
+    fin_ack = flow.server(
+        flags="FA", seq=server_next+len(normal_load), ack=client_next+1,
+        options=timestamp_option(2100, 2000)
+    )
+    yield fin_ack
+
     # ACK from client
-    last_ack = Ether()/IP(src=client_ip, dst=server_ip)/TCP(
-        sport=client_port, dport=server_port, flags="A", 
-        seq=client_seq+2+len(http_req_part1[Raw])+len(http_req_part2[Raw]), 
-        ack=server_seq+2+len(http_resp_part1[Raw])+len(http_resp_body)+len(normal_packet[Raw]),
-        options=[('NOP', None), ('NOP', None), 
-                 ('Timestamp', (2200, 2100))]
-    )
-    packets.append(last_ack)
-    
-    # Write packets to PCAP file
-    wrpcap(filename, packets)
+    last_ack = flow.client(
+        flags="A", seq=client_next+1, ack=server_next+len(normal_load)+1,
+        options=timestamp_option(2200, 2100)
+    )
+    yield last_ack
+
+
+def create_tcp_reassembly_test_pcap(filename="tcp_reassembly_test.pcap", seed=None, use_cache=True):
+    """
+    Create a PCAP file with TCP packets to test reassembly issues.
+
+    With a seed the sequence numbers are reproducible and the capture is
+    served from the pcap cache; without one every run is random, as before.
+    """
+    rng = random.Random(seed) if seed is not None else random
+    name = os.path.basename(filename)
+
+    def build(directory):
+        # Stream packets into the PCAP file as they are generated
+        return {"packets": write_pcap(os.path.join(directory, name), tcp_reassembly_test_packets(rng))}
+
+    _, info = cached_outputs("tcp_reassembly_test_packets", {}, build, [name], seed=seed, sources=[__file__],
+                             dest=os.path.dirname(filename) or ".",
+                             use_cache=use_cache and seed is not None)
+    count = info["packets"]
     print(f"Created PCAP file: {filename}")
     print(f"Key packets to observe:")
-    print(f"- Packets #{len(packets)-3}, #{len(packets)-2}: Retransmitted packet and packet with smaller sequence")
-    print(f"- If the issue exists, packet #{len(packets)-2} (small_seq_packet) will be dropped by Snort")
+    print(f"- Packets #{count-3}, #{count-2}: Retransmitted packet and packet with smaller sequence")
+    print(f"- If the issue exists, packet #{count-2} (small_seq_packet) will be dropped by Snort")
 
 if __name__ == "__main__":
-    create_tcp_reassembly_test_pcap()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate the TCP reassembly test PCAP")
+    parser.add_argument("-o", "--output", default="tcp_reassembly_test.pcap", help="PCAP file to write")
+    parser.add_argument("--seed", type=int, help="seed for the sequence numbers (enables the pcap cache)")
+    parser.add_argument("--no-cache", action="store_true", help="always regenerate the PCAP")
+    args = parser.parse_args()
+    create_tcp_reassembly_test_pcap(args.output, args.seed, use_cache=not args.no_cache)
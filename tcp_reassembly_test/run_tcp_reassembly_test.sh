@@ -10,9 +10,9 @@ OUTPUT_DIR="output"
 # Create output directory
 mkdir -p $OUTPUT_DIR
 
-# Generate the PCAP file
+# Generate the PCAP file (cached per seed; set PCAP_SEED to vary the sequence numbers)
 echo "Generating PCAP file with TCP reassembly test conditions..."
-python3 generate_tcp_reassembly_test_pcap.py
+python3 generate_tcp_reassembly_test_pcap.py --seed "${PCAP_SEED:-1}" -o $PCAP_FILE
 
 # Check if PCAP was generated
 if [ ! -f "$PCAP_FILE" ]; then
@@ -20,9 +20,15 @@ if [ ! -f "$PCAP_FILE" ]; then
     exit 1
 fi
 
+# Set SNORT_PROFILE=1 to add Snort's per-module/per-rule profiler and perf_monitor
+PROFILE_ARGS=()
+if [ -n "$SNORT_PROFILE" ]; then
+    PROFILE_ARGS=(--lua "$(python3 ../benchmarks/snort_profile.py lua)")
+fi
+
 # Run Snort with the test configuration
 echo "Running Snort with TCP reassembly test configuration..."
-$SNORT_BIN -c $CONFIG_FILE -r $PCAP_FILE -A csv -l $OUTPUT_DIR --plugin-path=/usr/local/lib/snort/plugins
+$SNORT_BIN -c $CONFIG_FILE -r $PCAP_FILE -A csv -l $OUTPUT_DIR --plugin-path=/usr/local/lib/snort/plugins "${PROFILE_ARGS[@]}"
 
 # Check Snort exit status
 if [ $? -ne 0 ]; then
@@ -48,5 +54,6 @@ fi
 # Print summary
 echo "Test completed. Check $OUTPUT_DIR directory for detailed results."
 echo "To analyze packet processing in detail, examine $OUTPUT_DIR/snort.log"
+echo "For thousands of randomized reorder/overlap/gap permutations, run: python3 fuzz_reassembly.py run"
 
 exit 0
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Find the exact points where file type detection moves between packets.
+
+Instead of a fixed sweep, bisect one parameter of the large file download
+and use the detection packet number from the Snort log as the signal:
+
+  type_depth    file_id type_depth (same capture for every probe)
+  file_size     size of the downloaded file in bytes
+  segment_size  TCP payload per data segment
+
+Every transition is resolved to a single value in about log2(range) Snort
+runs; -j N probes N points per round in parallel. The search assumes the
+detection packet only changes at a few steps, so a sub-range whose two ends
+detect in the same packet is not searched further.
+
+Examples:
+  bisect_depth.py --axis type_depth --lo 1 --hi 4096
+  bisect_depth.py --axis segment_size --lo 64 --hi 9000 --type-depth 1460 -j 8
+  bisect_depth.py --axis file_size --lo 1 --hi 64K --type-depth 512
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snort_configs import FILE_MAGIC_RULES, large_depth_config
+from snorttest.flows import (DEFAULT_SEGMENT_SIZE, MAX_SEGMENT_SIZE, SIGNATURE, http_download,
+                             parse_segment_size, parse_size, snaplen_args)
+from snorttest.payload import PROFILES, payload_blocks, rechunk
+from snorttest.pcap_cache import cached_outputs
+from snorttest.pcap_writer import TcpFlow, write_pcap
+from snorttest.runner import DEFAULT_SNORT_ARGS, ConfigError, SnortJob, default_workers, run_matrix
+from snorttest.threshold import find_transitions
+
+AXES = ("type_depth", "file_size", "segment_size")
+
+def download_frames(file_size, segment_size, profile, seed):
+    """The create_large_pcap.py download with a file_size-byte body."""
+    flow = TcpFlow("10.1.0.2", "10.1.0.1", 49152, 80)
+    signatures = [(0, SIGNATURE)] if file_size >= len(SIGNATURE) else []
+    blocks = payload_blocks(file_size, profile=profile, seed=seed, signatures=signatures)
+    return http_download(flow, file_size, rechunk(blocks, segment_size),
+                         client_seq=1000, server_seq=2000)
+
+def download_pcap(directory, file_size, segment_size, profile, seed):
+    """Path of the (cached) capture for these download parameters."""
+    name = f"download_{file_size}_{segment_size}.pcap"
+
+    def build(target):
+        count = write_pcap(os.path.join(target, name),
+                           download_frames(file_size, segment_size, profile, seed))
+        return {"packets": count}
+
+    params = {"file_size": file_size, "segment_size": segment_size, "profile": profile}
+    cached_outputs("bisect_download", params, build, [name], seed=seed, sources=[__file__],
+                   dest=directory)
+    return os.path.join(directory, name)
+
+def make_probe(args):
+    """probe(points) for find_transitions: one Snort run per point, in parallel."""
+    pcap_dir = os.path.join(args.output_dir, "pcaps")
+    largest = args.hi if args.axis == "segment_size" else args.segment_size
+    snort_args = DEFAULT_SNORT_ARGS + snaplen_args(largest)
+
+    def probe(points):
+        jobs = []
+        for x in points:
+            params = {"type_depth": args.type_depth, "file_size": args.file_size,
+                      "segment_size": args.segment_size, args.axis: x}
+            pcap = download_pcap(pcap_dir, params["file_size"], params["segment_size"],
+                                 args.profile, args.seed)
+            jobs.append(SnortJob(f"{args.axis}_{x}", large_depth_config(params["type_depth"]), pcap,
+                                 params=params, files={"file_magic.rules": FILE_MAGIC_RULES},
+                                 args=snort_args))
+        results = run_matrix(jobs, args.output_dir, workers=args.jobs, snort=args.snort)
+        for result in results:
+            print(f"  {args.axis} {result['params'][args.axis]}: " + describe(result["detection_packet"]))
+            probe.results.append(result)
+        return {result["params"][args.axis]: result["detection_packet"] for result in results}
+
+    probe.results = []
+    return probe
+
+def describe(packet):
+    return f"packet {packet}" if packet is not None else "no detection"
+
+def main():
+    parser = argparse.ArgumentParser(description="Bisect for detection packet transitions")
+    parser.add_argument("--axis", choices=AXES, default="type_depth", help="parameter to search")
+    parser.add_argument("--lo", type=parse_size, required=True, help="start of the range (K/M suffixes allowed)")
+    parser.add_argument("--hi", type=parse_size, required=True, help="end of the range")
+    parser.add_argument("--type-depth", type=int, default=1460, help="type_depth when not searched")
+    parser.add_argument("--file-size", type=parse_size, default=parse_size("64K"),
+                        help="file size when not searched (default 64K)")
+    parser.add_argument("--segment-size", type=parse_segment_size, default=DEFAULT_SEGMENT_SIZE,
+                        help=f"segment size when not searched (1-{MAX_SEGMENT_SIZE})")
+    parser.add_argument("--profile", choices=PROFILES, default="random", help="payload content profile")
+    parser.add_argument("--seed", type=int, default=0, help="payload seed")
+    parser.add_argument("--max-runs", type=int, help="stop after this many Snort runs")
+    parser.add_argument("-j", "--jobs", type=int, default=default_workers(),
+                        help="points probed per round, in parallel (default: CPU count)")
+    parser.add_argument("--output-dir", default="bisect_runs", help="per-probe working directories")
+    parser.add_argument("--snort", default="snort", help="Snort binary")
+    args = parser.parse_args()
+    if args.axis == "segment_size" and not 1 <= args.lo <= args.hi <= MAX_SEGMENT_SIZE:
+        parser.error(f"segment sizes must lie within 1..{MAX_SEGMENT_SIZE}")
+
+    probe = make_probe(args)
+    print(f"Bisecting {args.axis} over {args.lo}..{args.hi}, {args.jobs} probe(s) per round...")
+    try:
+        transitions, signals, rounds = find_transitions(probe, args.lo, args.hi, workers=args.jobs,
+                                                        max_probes=args.max_runs)
+    except ConfigError as e:
+        sys.exit(str(e))
+
+    print(f"\n{len(signals)} Snort runs in {rounds + 1} rounds "
+          f"(a full sweep would take {args.hi - args.lo + 1})")
+    if not transitions:
+        print(f"Detection is the same across the range: {describe(signals[args.lo])}")
+    for a, b in transitions:
+        if b - a > 1:
+            print(f"  {args.axis} {a}..{b}: unresolved ({describe(signals[a])} -> {describe(signals[b])})")
+        else:
+            print(f"  {args.axis} {a} -> {b}: {describe(signals[a])} -> {describe(signals[b])}")
+
+    results_file = os.path.join(args.output_dir, "bisect.json")
+    with open(results_file, "w") as f:
+        json.dump({"axis": args.axis, "lo": args.lo, "hi": args.hi,
+                   "fixed": {"type_depth": args.type_depth, "file_size": args.file_size,
+                             "segment_size": args.segment_size, "profile": args.profile,
+                             "seed": args.seed},
+                   "transitions": [{"before": a, "after": b, "packet_before": signals[a],
+                                    "packet_after": signals[b]} for a, b in transitions],
+                   "probes": probe.results}, f, indent=2)
+    print(f"Results written to {results_file}")
+
+if __name__ == "__main__":
+    main()
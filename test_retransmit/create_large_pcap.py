@@ -1,210 +1,81 @@
 #!/usr/bin/env python3
-from scapy.all import *
+import argparse
 import os
-import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snorttest.flows import (DEFAULT_SEGMENT_SIZE, http_download, parse_ack_mode, parse_segment_size,
+                             snaplen_args)
+from snorttest.pacing import Pacer, parse_model
+from snorttest.pcap_cache import cached_outputs
+from snorttest.payload import PROFILES, iter_segments, mapped_payload, parse_signature, write_payload_file
+from snorttest.pcap_writer import TcpFlow, write_pcap
 
 # Create a 5MB file with MALWARE signature at the beginning
-def create_large_file(filename, size_mb=5):
+def create_large_file(filename, size_mb=5, profile="random", seed=0, signatures=None):
     size_bytes = size_mb * 1024 * 1024
+    if signatures is None:
+        # Write the MALWARE signature at the beginning
+        signatures = [(0, b"MALWARE")]
     
     print(f"Creating {size_mb}MB file: {filename}")
-    with open(filename, 'wb') as f:
-        # Write the MALWARE signature at the beginning
-        f.write(b"MALWARE")
-        
-        # Fill the rest with random data
-        remaining_bytes = size_bytes - 7  # 7 is the length of "MALWARE"
-        chunk_size = 1024 * 1024  # Write in 1MB chunks
-        
-        while remaining_bytes > 0:
-            if remaining_bytes < chunk_size:
-                chunk_size = remaining_bytes
-            
-            # Generate random data
-            random_data = bytes([random.randint(0, 255) for _ in range(chunk_size)])
-            f.write(random_data)
-            remaining_bytes -= chunk_size
+    # Fill the file block by block; the same seed always gives the same bytes
+    write_payload_file(filename, size_bytes, profile=profile, seed=seed, signatures=signatures)
     
     print(f"Created {filename} ({os.path.getsize(filename)} bytes)")
 
-# Create a PCAP file with HTTP transfer of the large file
-def create_large_pcap(pcap_file, large_file):
-    print(f"Creating PCAP file: {pcap_file}")
-    
-    # Read the large file
-    with open(large_file, 'rb') as f:
-        file_data = f.read()
-    
+# Yield file segments, reporting progress every megabyte
+def segments_with_progress(segments):
+    file_offset = 0
+    for segment_data in segments:
+        yield segment_data
+        file_offset += len(segment_data)
+        if file_offset % (1024 * 1024) == 0:
+            print(f"  Created packets for {file_offset / (1024 * 1024):.1f}MB of data")
+
+# Generate the packets of an HTTP transfer of the large file, one at a time
+def large_file_packets(large_file, segment_size=DEFAULT_SEGMENT_SIZE, ack_every=1):
     # Network parameters
     client_ip = "10.1.0.2"
     server_ip = "10.1.0.1"
     client_port = 49152
     server_port = 80
+    flow = TcpFlow(client_ip, server_ip, client_port, server_port)
     
-    # Initial sequence numbers
-    client_seq = 1000
-    server_seq = 2000
-    
-    # Create HTTP GET request
-    http_get = Ether()/IP(src=client_ip, dst=server_ip)/TCP(sport=client_port, dport=server_port, flags="PA", seq=client_seq)/Raw(
-        b"GET /large_file.bin HTTP/1.1\r\n"
-        b"Host: example.com\r\n"
-        b"User-Agent: Mozilla/5.0\r\n"
-        b"Accept: */*\r\n"
-        b"\r\n"
-    )
-    
-    # Calculate the length of the GET request payload
-    get_len = len(http_get[Raw])
-    
-    # Create HTTP response header
-    http_resp_header = Ether()/IP(src=server_ip, dst=client_ip)/TCP(sport=server_port, dport=client_port, flags="PA", seq=server_seq)/Raw(
-        b"HTTP/1.1 200 OK\r\n"
-        b"Server: Apache\r\n"
-        b"Content-Type: application/octet-stream\r\n"
-        b"Content-Length: " + str(len(file_data)).encode() + b"\r\n"
-        b"\r\n"
-    )
-    
-    # Calculate the length of the response header
-    resp_header_len = len(http_resp_header[Raw])
-    
-    # Client ACK for the response header
-    client_ack1 = Ether()/IP(src=client_ip, dst=server_ip)/TCP(sport=client_port, dport=server_port, flags="A", seq=client_seq+get_len, ack=server_seq+resp_header_len)
-    
-    # Create packets for the file data
-    packets = [http_get, http_resp_header, client_ack1]
-    
-    # Split the file data into multiple TCP segments
-    segment_size = 1460  # Standard MSS
-    file_offset = 0
-    current_seq = server_seq + resp_header_len
-    
-    while file_offset < len(file_data):
-        # Determine the size of this segment
-        if file_offset + segment_size > len(file_data):
-            segment_data = file_data[file_offset:]
-        else:
-            segment_data = file_data[file_offset:file_offset+segment_size]
-        
-        # Create a packet with this segment
-        file_pkt = Ether()/IP(src=server_ip, dst=client_ip)/TCP(sport=server_port, dport=client_port, flags="PA", seq=current_seq)/Raw(segment_data)
-        packets.append(file_pkt)
-        
-        # Create client ACK for this segment
-        client_ack = Ether()/IP(src=client_ip, dst=server_ip)/TCP(sport=client_port, dport=server_port, flags="A", seq=client_seq+get_len, ack=current_seq+len(segment_data))
-        packets.append(client_ack)
-        
-        # Update for next segment
-        file_offset += len(segment_data)
-        current_seq += len(segment_data)
-        
-        # Print progress
-        if file_offset % (1024 * 1024) == 0:
-            print(f"  Created packets for {file_offset / (1024 * 1024):.1f}MB of data")
-    
-    # Final FIN packet from server
-    fin_pkt = Ether()/IP(src=server_ip, dst=client_ip)/TCP(sport=server_port, dport=client_port, flags="FA", seq=current_seq)
-    packets.append(fin_pkt)
-    
-    # Final ACK from client
-    final_ack = Ether()/IP(src=client_ip, dst=server_ip)/TCP(sport=client_port, dport=server_port, flags="A", seq=client_seq+get_len, ack=current_seq+1)
-    packets.append(final_ack)
+    # Split the memory-mapped file into MSS (or super-) segments without copying
+    with mapped_payload(large_file) as file_data:
+        segments = segments_with_progress(iter_segments(file_data, segment_size))
+        yield from http_download(flow, len(file_data), segments, client_seq=1000, server_seq=2000,
+                                 ack_every=ack_every)
+
+# Create a PCAP file with HTTP transfer of the large file
+def create_large_pcap(pcap_file, large_file, pace=None, pace_seed=0,
+                      segment_size=DEFAULT_SEGMENT_SIZE, ack_every=1):
+    print(f"Creating PCAP file: {pcap_file}")
     
-    # Write packets to PCAP file
-    wrpcap(pcap_file, packets)
-    print(f"Created {pcap_file} with {len(packets)} packets")
+    # Packets are streamed straight into the PCAP file as they are generated,
+    # stamped from a link model if one is given
+    packets = large_file_packets(large_file, segment_size, ack_every)
+    if pace:
+        packets = Pacer(pace, pace_seed).pace(packets)
+    count = write_pcap(pcap_file, packets)
+    print(f"Created {pcap_file} with {count} packets")
 
 # Create a test script to run Snort with the large PCAP
-def create_test_script():
-    script = """#!/bin/bash
-
-# Create a simplified file_magic.rules
-cat > file_magic.rules << EOF
-# Simple file_magic.rules for testing
-file_id (msg:"Test File"; file_meta:type TEST_FILE, id 1, category "Test Files"; file_data; content:"MALWARE", depth 7, offset 0; gid:4; sid:1000; rev:1;)
-EOF
-
-# Create a test configuration
-cat > large_file_test.lua << EOF
--- Basic network settings
-HOME_NET = "10.1.0.0/16"
-EXTERNAL_NET = "any"
-
--- Include default configurations
-dofile('snort_defaults.lua')
+def create_test_script(segment_size=DEFAULT_SEGMENT_SIZE):
+    snaplen = "".join(f" {arg}" for arg in snaplen_args(segment_size))
+    script = f"""#!/bin/bash
 
--- Stream configuration
-stream = { }
-stream_tcp = { 
-    show_rebuilt_packets = true,
-    session_timeout = 180,
-    flush_factor = 0
-}
-
--- HTTP Inspector
-http_inspect = { }
-
--- File ID configuration
-file_id = {
-    type_depth = 1460,        -- One full TCP segment
-    enable_type = true,
-    enable_signature = true,
-    enable_capture = true,
-    trace_type = true,
-    rules_file = 'file_magic.rules'
-}
-
--- File policy configuration
-file_policy = {
-    enable_type = true,
-    enable_signature = true,
-    enable_capture = true,
-    verdict_delay = 0,
-    rules = {
-        {
-            when = { file_type_id = 1 },
-            use = { verdict = "log" }
-        }
-    }
-}
-
--- Wizard for protocol identification
-wizard = default_wizard
-
--- Trace options for debugging
-trace = {
-    modules = {
-        file_api = { all = 3 },
-        stream_tcp = { all = 2 }
-    }
-}
-EOF
+# Write file_magic.rules and the test configuration (type_depth 1460)
+python3 snort_configs.py write large_depth --depth 1460 -o large_file_test.lua --rules file_magic.rules
 
 # Run Snort with this configuration
 echo "Running Snort with large file test configuration..."
-snort -c large_file_test.lua -r large_file.pcap -A alert_fast -k none -Q -v > large_file.log 2>&1
+snort -c large_file_test.lua -r large_file.pcap -A alert_fast -k none -Q -v{snaplen} > large_file.log 2>&1
 
-# Check if file type was detected
-echo -e "\\nFile type detection results:"
-echo "============================"
-grep "File type:" large_file.log || echo "No file type detection"
-
-# Check which packet had the detection
-packet_num=$(grep -B 5 "File type:" large_file.log | grep "Processing packet" | tail -1 | awk '{print $3}')
-if [ -n "$packet_num" ]; then
-    echo "File type detected in packet $packet_num"
-    
-    # Get total number of packets
-    total_packets=$(grep "Processing packet" large_file.log | wc -l)
-    echo "Total packets: $total_packets"
-    
-    # Calculate percentage of file processed before detection
-    percentage=$(echo "scale=2; $packet_num * 100 / $total_packets" | bc)
-    echo "File type detected after processing $percentage% of packets"
-else
-    echo "Could not determine packet number for file type detection"
-fi
+# Summarize detections and events in one pass over the log
+echo ""
+python3 summarize_log.py large_file.log
 
 echo -e "\\nFull log is available in large_file.log"
 """
@@ -217,17 +88,46 @@ echo -e "\\nFull log is available in large_file.log"
 
 # Main function
 def main():
+    parser = argparse.ArgumentParser(description="Create a large file, an HTTP download PCAP of it and a test script")
+    parser.add_argument("--size-mb", type=int, default=5, help="size of the transferred file in MB")
+    parser.add_argument("--profile", choices=PROFILES, default="random", help="payload content profile")
+    parser.add_argument("--seed", type=int, default=0, help="payload seed; same seed gives the same bytes")
+    parser.add_argument("--signature", action="append", type=parse_signature, metavar="OFFSET:TEXT",
+                        help="embed TEXT at OFFSET (repeatable, default 0:MALWARE)")
+    parser.add_argument("--segment-size", type=parse_segment_size, default=DEFAULT_SEGMENT_SIZE,
+                        help="TCP payload per data segment: 1-65481 bytes (above 9000 for "
+                             "GRO/TSO super-segments) or min (536), ethernet (1460), jumbo (8960), super")
+    parser.add_argument("--ack", type=parse_ack_mode, default=1, metavar="MODE",
+                        help="client ACKs: every (default), delayed (every 2nd segment) or stretch:N")
+    parser.add_argument("--pace", type=parse_model, metavar="MODEL",
+                        help="stamp packet times from a link model, e.g. lan10g or 1G,rtt=2ms,jitter=100us")
+    parser.add_argument("--pace-seed", type=int, default=0, help="jitter / loss seed of --pace")
+    parser.add_argument("--no-cache", action="store_true", help="always regenerate the file and PCAP")
+    args = parser.parse_args()
+    
     large_file = "large_file.bin"
     pcap_file = "large_file.pcap"
     
-    # Create the large file
-    create_large_file(large_file)
-    
-    # Create the PCAP file
-    create_large_pcap(pcap_file, large_file)
+    # Create the large file and its PCAP, or reuse the cached ones for these parameters
+    def build(directory):
+        create_large_file(os.path.join(directory, large_file), args.size_mb, args.profile,
+                          args.seed, args.signature)
+        create_large_pcap(os.path.join(directory, pcap_file), os.path.join(directory, large_file),
+                          args.pace, args.pace_seed, args.segment_size, args.ack)
+    
+    params = {"size_mb": args.size_mb, "profile": args.profile,
+              "signatures": [[offset, text.decode("latin-1")] for offset, text in args.signature or []]}
+    if args.segment_size != DEFAULT_SEGMENT_SIZE:
+        params["segment_size"] = args.segment_size
+    if args.ack != 1:
+        params["ack_every"] = args.ack
+    if args.pace:
+        params["pace"] = dict(args.pace.as_dict(), seed=args.pace_seed)
+    cached_outputs("create_large_pcap", params, build, [large_file, pcap_file], seed=args.seed,
+                   sources=[__file__], use_cache=not args.no_cache)
     
     # Create the test script
-    create_test_script()
+    create_test_script(args.segment_size)
     
     print("\nSetup complete. Run the test with:")
     print("  ./test_large_file.sh")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Create a PCAP with many concurrent HTTP downloads for stream_tcp scaling tests.
+
+Every flow is the create_large_pcap.py download template with its own client
+address/port, sequence space and start time; packets of all flows are
+interleaved in timestamp order.
+
+-o - writes the capture to stdout and -o FIFO to an existing named FIFO, so
+Snort can read it ("snort -r -" / "snort -r FIFO") while it is generated.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snorttest.flows import DEFAULT_SEGMENT_SIZE, multi_flow, parse_ack_mode, parse_segment_size
+from snorttest.pacing import Pacer, parse_model
+from snorttest.pcap_cache import cached_outputs
+from snorttest.payload import PROFILES
+from snorttest.pcap_writer import PcapWriter
+from snorttest.stream import is_stream_target, open_sink
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-o", "--output", default="multiflow.pcap",
+                        help="output PCAP file, - for stdout or a named FIFO")
+    parser.add_argument("-n", "--flows", type=int, default=1000, help="number of flows")
+    parser.add_argument("--arrival-rate", type=float, default=1000.0,
+                        help="new flows per second (Poisson); 0 starts all flows at once")
+    parser.add_argument("--size-dist", default="fixed:64K",
+                        help="flow size distribution: fixed:SIZE, uniform:MIN:MAX, "
+                             "lognormal:MEDIAN:SIGMA or pareto:MIN:ALPHA (K/M/G suffixes)")
+    parser.add_argument("--segment-size", type=parse_segment_size, default=DEFAULT_SEGMENT_SIZE,
+                        help="TCP payload bytes per segment, up to 65481 for GRO/TSO super-segments "
+                             "(or min, ethernet, jumbo, super)")
+    parser.add_argument("--ack", type=parse_ack_mode, default=1, metavar="MODE",
+                        help="client ACKs: every (default), delayed (every 2nd segment) or stretch:N")
+    parser.add_argument("--packet-interval", type=float, default=0.0001,
+                        help="seconds between packets within a flow")
+    parser.add_argument("--profile", choices=PROFILES, default="random", help="payload content profile")
+    parser.add_argument("--handshake", action="store_true", help="start each flow with a 3-way handshake")
+    parser.add_argument("--seed", type=int, default=0, help="seed for sizes, arrivals, sequence numbers and payloads")
+    parser.add_argument("--pace", type=parse_model, metavar="MODEL",
+                        help="stamp packet times from a link model instead of --packet-interval, "
+                             "e.g. lan10g or lossy-wan,loss=5%%")
+    parser.add_argument("--pace-seed", type=int, default=0, help="jitter / loss seed of --pace")
+    parser.add_argument("--no-cache", action="store_true", help="always regenerate the PCAP")
+    args = parser.parse_args()
+
+    streaming = is_stream_target(args.output)
+    # Keep stdout for the capture itself when streaming
+    log = sys.stderr if streaming else sys.stdout
+    print(f"Creating PCAP file: {args.output} ({args.flows} flows, sizes {args.size_dist})", file=log)
+    started = time.time()
+    params = {"arrival_rate": args.arrival_rate, "size_dist": args.size_dist,
+              "segment_size": args.segment_size, "packet_interval": args.packet_interval,
+              "profile": args.profile, "handshake": args.handshake}
+    name = os.path.basename(args.output)
+
+    def packets():
+        frames = multi_flow(args.flows, seed=args.seed, ack_every=args.ack, **params)
+        return Pacer(args.pace, args.pace_seed).pace(frames) if args.pace else frames
+
+    if streaming:
+        with open_sink(args.output) as writer:
+            writer.write_all(packets())
+        elapsed = time.time() - started
+        print(f"Streamed {writer.packets} packets ({writer.bytes} bytes) in {elapsed:.1f}s", file=log)
+        return
+
+    def build(directory):
+        with PcapWriter(os.path.join(directory, name)) as writer:
+            writer.write_all(packets())
+        return {"packets": writer.packets, "bytes": writer.bytes}
+
+    key_params = dict(params, flows=args.flows)
+    if args.ack != 1:
+        key_params["ack_every"] = args.ack
+    if args.pace:
+        key_params["pace"] = dict(args.pace.as_dict(), seed=args.pace_seed)
+    _, info = cached_outputs("multi_flow", key_params, build, [name],
+                             seed=args.seed, sources=[__file__],
+                             dest=os.path.dirname(args.output) or ".", use_cache=not args.no_cache)
+    elapsed = time.time() - started
+    print(f"Created {args.output} with {info['packets']} packets ({info['bytes']} bytes) in {elapsed:.1f}s")
+
+if __name__ == "__main__":
+    main()
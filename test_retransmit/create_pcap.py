@@ -1,84 +1,208 @@
 #!/usr/bin/env python3
 
-from scapy.all import *
+import argparse
+import os
 import random
-
-# IP addresses and ports
-client_ip = "10.1.1.10"
-server_ip = "10.1.2.20"
-client_port = 12345
-server_port = 80
-
-# Create a PCAP file
-pcap_file = "retransmit_test.pcap"
-
-# Initialize sequence numbers
-client_seq = random.randint(1000000, 9000000)
-server_seq = random.randint(1000000, 9000000)
-
-# TCP handshake
-syn = Ether()/IP(src=client_ip, dst=server_ip)/TCP(sport=client_port, dport=server_port, flags="S", seq=client_seq)
-syn_ack = Ether()/IP(src=server_ip, dst=client_ip)/TCP(sport=server_port, dport=client_port, flags="SA", seq=server_seq, ack=client_seq+1)
-ack = Ether()/IP(src=client_ip, dst=server_ip)/TCP(sport=client_port, dport=server_port, flags="A", seq=client_seq+1, ack=server_seq+1)
-
-# HTTP GET request
-http_get = Ether()/IP(src=client_ip, dst=server_ip)/TCP(sport=client_port, dport=server_port, flags="PA", seq=client_seq+1, ack=server_seq+1)/Raw(load="GET /file.bin HTTP/1.1\r\nHost: example.com\r\nUser-Agent: Mozilla/5.0\r\nAccept: */*\r\n\r\n")
-
-# Server ACK for the request
-server_ack = Ether()/IP(src=server_ip, dst=client_ip)/TCP(sport=server_port, dport=client_port, flags="A", seq=server_seq+1, ack=client_seq+1+len(http_get[Raw]))
-
-# HTTP response with file content
-http_resp_header = Ether()/IP(src=server_ip, dst=client_ip)/TCP(sport=server_port, dport=client_port, flags="PA", seq=server_seq+1, ack=client_seq+1+len(http_get[Raw]))/Raw(load="HTTP/1.1 200 OK\r\nContent-Type: application/octet-stream\r\nContent-Length: 100\r\n\r\n")
-
-# Client ACK for the header
-ack_header = Ether()/IP(src=client_ip, dst=server_ip)/TCP(sport=client_port, dport=server_port, flags="A", seq=client_seq+1+len(http_get[Raw]), ack=server_seq+1+len(http_resp_header[Raw]))
-
-# First part of file content - this will be held for inspection
-file_part1 = Ether()/IP(src=server_ip, dst=client_ip)/TCP(sport=server_port, dport=client_port, flags="PA", seq=server_seq+1+len(http_resp_header[Raw]), ack=client_seq+1+len(http_get[Raw]))/Raw(load="MALWARE-content-part1")
-
-# Retransmission of the first part - this should be processed while the original is held
-file_part1_retransmit = Ether()/IP(src=server_ip, dst=client_ip)/TCP(sport=server_port, dport=client_port, flags="PA", seq=server_seq+1+len(http_resp_header[Raw]), ack=client_seq+1+len(http_get[Raw]))/Raw(load="MALWARE-content-part1")
-
-# Second part of file content
-file_part2 = Ether()/IP(src=server_ip, dst=client_ip)/TCP(sport=server_port, dport=client_port, flags="PA", seq=server_seq+1+len(http_resp_header[Raw])+len(file_part1[Raw]), ack=client_seq+1+len(http_get[Raw]))/Raw(load="-content-part2-end")
-
-# ACK from client for the first part of file
-ack_part1 = Ether()/IP(src=client_ip, dst=server_ip)/TCP(sport=client_port, dport=server_port, flags="A", seq=client_seq+1+len(http_get[Raw]), ack=server_seq+1+len(http_resp_header[Raw])+len(file_part1[Raw]))
-
-# ACK from client for the second part of file
-ack_part2 = Ether()/IP(src=client_ip, dst=server_ip)/TCP(sport=client_port, dport=server_port, flags="A", seq=client_seq+1+len(http_get[Raw]), ack=server_seq+1+len(http_resp_header[Raw])+len(file_part1[Raw])+len(file_part2[Raw]))
-
-# TCP connection teardown
-fin_client = Ether()/IP(src=client_ip, dst=server_ip)/TCP(sport=client_port, dport=server_port, flags="FA", seq=client_seq+1+len(http_get[Raw]), ack=server_seq+1+len(http_resp_header[Raw])+len(file_part1[Raw])+len(file_part2[Raw]))
-fin_ack_server = Ether()/IP(src=server_ip, dst=client_ip)/TCP(sport=server_port, dport=client_port, flags="FA", seq=server_seq+1+len(http_resp_header[Raw])+len(file_part1[Raw])+len(file_part2[Raw]), ack=client_seq+2+len(http_get[Raw]))
-ack_client = Ether()/IP(src=client_ip, dst=server_ip)/TCP(sport=client_port, dport=server_port, flags="A", seq=client_seq+2+len(http_get[Raw]), ack=server_seq+2+len(http_resp_header[Raw])+len(file_part1[Raw])+len(file_part2[Raw]))
-
-# Write packets to PCAP file
-packets = [
-    syn, syn_ack, ack,                  # TCP handshake
-    http_get, server_ack,               # HTTP request
-    http_resp_header, ack_header,       # HTTP response header
-    file_part1,                         # First part of file (will be held)
-    file_part1_retransmit,              # Retransmission of first part
-    ack_part1,                          # ACK for first part
-    file_part2, ack_part2,              # Second part of file
-    fin_client, fin_ack_server, ack_client  # TCP teardown
-]
-
-# Add timestamps to packets (1 second between packets, with retransmit coming 1 second after original)
-for i, pkt in enumerate(packets):
-    # Add a delay before the retransmission
-    if i == 7:  # file_part1
-        pkt.time = i
-    elif i == 8:  # file_part1_retransmit
-        pkt.time = i + 1  # 1 second after the original
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snorttest.flows import flow_endpoints, interleave
+from snorttest.latency import parse_duration
+from snorttest.pcap_cache import cached_outputs
+from snorttest.pcap_writer import TcpFlow, write_pcap
+
+# Index of the held segment (file_part1) in session_packets(); its
+# retransmission follows it
+HELD = 7
+
+def session_packets(flow, client_seq, server_seq, part2_load=b"-content-part2-end"):
+    """The download's packets in capture order: handshake, GET, file in two parts, teardown."""
+
+    # Payloads
+    get_load = b"GET /file.bin HTTP/1.1\r\nHost: example.com\r\nUser-Agent: Mozilla/5.0\r\nAccept: */*\r\n\r\n"
+    resp_load = b"HTTP/1.1 200 OK\r\nContent-Type: application/octet-stream\r\nContent-Length: 100\r\n\r\n"
+    part1_load = b"MALWARE-content-part1"
+
+    # TCP handshake
+    syn = flow.client("S", client_seq)
+    syn_ack = flow.server("SA", server_seq, client_seq+1)
+    ack = flow.client("A", client_seq+1, server_seq+1)
+
+    # HTTP GET request
+    http_get = flow.client("PA", client_seq+1, server_seq+1, get_load)
+
+    # Server ACK for the request
+    server_ack = flow.server("A", server_seq+1, client_seq+1+len(get_load))
+
+    # HTTP response with file content
+    http_resp_header = flow.server("PA", server_seq+1, client_seq+1+len(get_load), resp_load)
+
+    # Client ACK for the header
+    ack_header = flow.client("A", client_seq+1+len(get_load), server_seq+1+len(resp_load))
+
+    # First part of file content - this will be held for inspection
+    file_part1 = flow.server("PA", server_seq+1+len(resp_load), client_seq+1+len(get_load), part1_load)
+
+    # Retransmission of the first part - this should be processed while the original is held
+    file_part1_retransmit = flow.server("PA", server_seq+1+len(resp_load), client_seq+1+len(get_load), part1_load)
+
+    # Second part of file content
+    file_part2 = flow.server("PA", server_seq+1+len(resp_load)+len(part1_load), client_seq+1+len(get_load), part2_load)
+
+    # ACK from client for the first part of file
+    ack_part1 = flow.client("A", client_seq+1+len(get_load), server_seq+1+len(resp_load)+len(part1_load))
+
+    # ACK from client for the second part of file
+    ack_part2 = flow.client("A", client_seq+1+len(get_load), server_seq+1+len(resp_load)+len(part1_load)+len(part2_load))
+
+    # TCP connection teardown
+    fin_client = flow.client("FA", client_seq+1+len(get_load), server_seq+1+len(resp_load)+len(part1_load)+len(part2_load))
+    fin_ack_server = flow.server("FA", server_seq+1+len(resp_load)+len(part1_load)+len(part2_load), client_seq+2+len(get_load))
+    ack_client = flow.client("A", client_seq+2+len(get_load), server_seq+2+len(resp_load)+len(part1_load)+len(part2_load))
+
+    # Packets in capture order
+    return [
+        syn, syn_ack, ack,                  # TCP handshake
+        http_get, server_ack,               # HTTP request
+        http_resp_header, ack_header,       # HTTP response header
+        file_part1,                         # First part of file (will be held)
+        file_part1_retransmit,              # Retransmission of first part
+        ack_part1,                          # ACK for first part
+        file_part2, ack_part2,              # Second part of file
+        fin_client, fin_ack_server, ack_client  # TCP teardown
+    ]
+
+def retransmit_test_packets(rng=random):
+    """Yield (ts, packet) for the retransmit-during-hold session."""
+
+    # IP addresses and ports
+    client_ip = "10.1.1.10"
+    server_ip = "10.1.2.20"
+    client_port = 12345
+    server_port = 80
+    flow = TcpFlow(client_ip, server_ip, client_port, server_port)
+
+    # Initialize sequence numbers
+    client_seq = rng.randint(1000000, 9000000)
+    server_seq = rng.randint(1000000, 9000000)
+    packets = session_packets(flow, client_seq, server_seq)
+
+    # Add timestamps to packets (1 second between packets, with retransmit coming 1 second after original)
+    for i, pkt in enumerate(packets):
+        # Add a delay before the retransmission
+        if i == 7:  # file_part1
+            ts = i
+        elif i == 8:  # file_part1_retransmit
+            ts = i + 1  # 1 second after the original
+        else:
+            ts = i
+        yield ts, pkt
+
+def retransmit_offsets(count, window, verdict_delay):
+    """
+    Times after the original at which its count retransmissions arrive:
+    evenly spread over the first window (a fraction) of the verdict delay.
+    """
+    return [window * verdict_delay * (i + 1) / count for i in range(count)]
+
+def held_session(flow, client_seq, server_seq, start, step, offsets, part2_load):
+    """
+    Yield (ts, packet) for one download: packets step seconds apart, the held
+    segment retransmitted at the given offsets after it, then the rest.
+    """
+    packets = session_packets(flow, client_seq, server_seq, part2_load)
+    ts = start
+    for pkt in packets[:HELD + 1]:
+        yield ts, pkt
+        ts += step
+    held_at = ts - step
+    for offset in offsets:
+        yield held_at + offset, packets[HELD + 1]
+    ts = held_at + max(offsets, default=0) + step
+    for pkt in packets[HELD + 2:]:
+        yield ts, pkt
+        ts += step
+
+def scaled_retransmit_packets(files, rng=random, arrival_rate=1000.0, step=0.01, retransmits=1,
+                              window=0.2, verdict_delay=5.0):
+    """
+    Yield (ts, packet) for files overlapping retransmit-during-hold downloads.
+
+    Downloads start as a Poisson process at arrival_rate per second (0 starts
+    them all at once), each with its own 5-tuple, sequence numbers and file
+    content, so every file needs its own lookup. Each held segment is
+    retransmitted retransmits times within the first window of verdict_delay.
+    """
+    offsets = retransmit_offsets(retransmits, window, verdict_delay) if retransmits else []
+
+    def sessions():
+        start = 0.0
+        for index in range(files):
+            if arrival_rate > 0 and index:
+                start += rng.expovariate(arrival_rate)
+            flow = TcpFlow(*flow_endpoints(index))
+            client_seq = rng.randint(1000000, 9000000)
+            server_seq = rng.randint(1000000, 9000000)
+            part2_load = b"-content-part2-%d-end" % index
+            yield start, held_session(flow, client_seq, server_seq, start, step, offsets, part2_load)
+
+    return interleave(sessions())
+
+def create_scaled_pcap(pcap_file, files, seed=None, use_cache=True, **options):
+    """Write the scaled scenario (see scaled_retransmit_packets); returns the packet count."""
+    rng = random.Random(seed) if seed is not None else random
+    name = os.path.basename(pcap_file)
+
+    def build(directory):
+        return {"packets": write_pcap(os.path.join(directory, name),
+                                      scaled_retransmit_packets(files, rng, **options))}
+
+    _, info = cached_outputs("scaled_retransmit_packets", dict(options, files=files), build, [name],
+                             seed=seed, sources=[__file__], dest=os.path.dirname(pcap_file) or ".",
+                             use_cache=use_cache and seed is not None)
+    print(f"Created PCAP file: {pcap_file} ({files} held files, {info.get('packets')} packets)")
+    return info.get("packets")
+
+def create_retransmit_pcap(pcap_file="retransmit_test.pcap", seed=None, use_cache=True):
+    """Write the PCAP; with a seed it is reproducible and served from the pcap cache."""
+    rng = random.Random(seed) if seed is not None else random
+    name = os.path.basename(pcap_file)
+
+    def build(directory):
+        write_pcap(os.path.join(directory, name), retransmit_test_packets(rng))
+
+    cached_outputs("retransmit_test_packets", {}, build, [name], seed=seed, sources=[__file__],
+                   dest=os.path.dirname(pcap_file) or ".", use_cache=use_cache and seed is not None)
+    print(f"Created PCAP file: {pcap_file}")
+    print(f"Key packets:")
+    print(f"- Packet #8: Original file part with 'MALWARE' content (will be held)")
+    print(f"- Packet #9: Retransmission of file part (arrives during verdict delay)")
+    print(f"- After verdict delay, Snort will try to retry packet #8")
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the retransmit-during-hold test PCAP")
+    parser.add_argument("-o", "--output", default="retransmit_test.pcap", help="PCAP file to write")
+    parser.add_argument("--seed", type=int, help="seed for the sequence numbers (enables the pcap cache)")
+    parser.add_argument("--no-cache", action="store_true", help="always regenerate the PCAP")
+    scaled = parser.add_argument_group("scaled scenario (enabled by --files)")
+    scaled.add_argument("--files", type=int, help="number of overlapping downloads with a held file")
+    scaled.add_argument("--retransmits", type=int, default=1, help="retransmissions of each held segment")
+    scaled.add_argument("--retransmit-window", type=float, default=0.2,
+                        help="retransmissions are spread over this fraction of the verdict delay "
+                             "(>1 puts some after the verdict)")
+    scaled.add_argument("--verdict-delay", type=parse_duration, default=5.0,
+                        help="verdict delay the timing is relative to (default 5s, as snort.lua)")
+    scaled.add_argument("--arrival-rate", type=float, default=1000.0,
+                        help="downloads started per second (0: all at once)")
+    scaled.add_argument("--step", type=parse_duration, default=0.01,
+                        help="time between a download's own packets (default 10ms)")
+    args = parser.parse_args()
+    if args.files is None:
+        create_retransmit_pcap(args.output, args.seed, use_cache=not args.no_cache)
     else:
-        pkt.time = i
-
-# Write to PCAP
-wrpcap(pcap_file, packets)
-print(f"Created PCAP file: {pcap_file}")
-print(f"Key packets:")
-print(f"- Packet #8: Original file part with 'MALWARE' content (will be held)")
-print(f"- Packet #9: Retransmission of file part (arrives during verdict delay)")
-print(f"- After verdict delay, Snort will try to retry packet #8")
+        create_scaled_pcap(args.output, args.files, args.seed, use_cache=not args.no_cache,
+                           arrival_rate=args.arrival_rate, step=args.step, retransmits=args.retransmits,
+                           window=args.retransmit_window, verdict_delay=args.verdict_delay)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Compare the capture fed to Snort with the inline output written by the dump
+DAQ: which packets were dropped, duplicated, reordered or delayed, and by
+how much. Packets are matched by 5-tuple, sequence number and payload, so
+rewritten TTLs or checksums do not count as differences.
+
+Usage: diff_inline.py INPUT_PCAP OUTPUT_PCAP [--json] [--limit N] [--delay SECONDS]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snorttest.latency import parse_duration
+from snorttest.pcap_diff import diff_pcaps, format_diff
+from snorttest.pcap_reader import PcapFormatError
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff a pcap fed to Snort against its inline output")
+    parser.add_argument("input", help="capture Snort read")
+    parser.add_argument("output", help="inline output capture (e.g. inline-out.pcap)")
+    parser.add_argument("--json", action="store_true", help="print the diff as JSON")
+    parser.add_argument("--limit", type=int, default=20, help="packets listed per category (default 20)")
+    parser.add_argument("--delay", type=parse_duration, default=0.0,
+                        help="report packets whose timestamp grew by more than this (e.g. 10ms)")
+    parser.add_argument("--tmpdir", help="directory for the temporary bucket files")
+    args = parser.parse_args()
+
+    try:
+        diff = diff_pcaps(args.input, args.output, delay_threshold=args.delay,
+                          limit=args.limit, tmpdir=args.tmpdir)
+    except (OSError, PcapFormatError) as e:
+        sys.exit(str(e))
+    if args.json:
+        print(json.dumps(diff.as_dict(), indent=2))
+    else:
+        print(format_diff(diff))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Scale the retransmit-during-hold test to many files waiting on lookups.
+
+For each --files count, generates that many overlapping downloads whose
+file segment is held and retransmitted (create_pcap.py --files), runs
+Snort on them against the mock lookup service and reports how the hold /
+retry queue and the lookups behave:
+
+  holds, retries      held packets and retries in the Snort log
+  max queue depth     most held packets waiting for their retry at once
+  hold->retry         latency from hold to retry, in capture seconds
+  lookups, pending    lookups the service answered and the most it had
+                      outstanding at once
+  lookup p50/p99      response time of the service
+
+The mock service is started on --port unless --no-service is given (then
+one must already be listening there).
+
+Example:
+  hold_scaling.py --files 1 10 100 1000 --retransmits 3 --latency lognormal:2s:0.5
+"""
+
+import argparse
+import array
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from create_pcap import create_scaled_pcap
+from snort_configs import FILE_MAGIC_RULES
+from snorttest.latency import parse_duration
+from snorttest.lookup_service import DEFAULT_LATENCY
+from snorttest.pcap_reader import iter_pcap
+from snorttest.runner import DEFAULT_SNORT_ARGS, ConfigError, SnortJob, run_job
+from snorttest.snort_log import hold_queue
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+VERDICT_DELAY_RE = re.compile(r"(\bverdict_delay\s*=\s*)\d+")
+
+def fetch_metrics(port, reset=False):
+    url = f"http://127.0.0.1:{port}/metrics" + ("?reset=1" if reset else "")
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.load(response)
+
+def start_service(port, latency, seed):
+    """Start mock_lookup_service.py and wait until it answers."""
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, "mock_lookup_service.py"),
+                             "--port", str(port), "--latency", latency, "--quiet",
+                             *(["--seed", str(seed)] if seed is not None else [])],
+                            stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            fetch_metrics(port)
+            return proc
+        except OSError:
+            if proc.poll() is not None or time.monotonic() > deadline:
+                proc.kill()
+                sys.exit(f"Mock lookup service did not start on port {port}")
+            time.sleep(0.1)
+
+def with_verdict_delay(config, delay):
+    """config with its file_policy verdict_delay set to delay seconds (Snort takes milliseconds)."""
+    config, count = VERDICT_DELAY_RE.subn(lambda m: m.group(1) + str(round(delay * 1000)), config)
+    if not count:
+        sys.exit("The Snort config sets no verdict_delay for --verdict-delay to apply to")
+    return config
+
+def percentile(values, percent):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+def packet_times(pcap):
+    return array.array("d", (ts for ts, _ in iter_pcap(pcap)))
+
+def run_point(args, config, files):
+    pcap = os.path.join(args.output_dir, "pcaps", f"held_{files}.pcap")
+    os.makedirs(os.path.dirname(pcap), exist_ok=True)
+    create_scaled_pcap(pcap, files, seed=args.seed, arrival_rate=args.arrival_rate, step=args.step,
+                       retransmits=args.retransmits, window=args.retransmit_window,
+                       verdict_delay=args.verdict_delay)
+    fetch_metrics(args.port, reset=True)
+    job = SnortJob(f"held_{files}", config, pcap, params={"files": files},
+                   files={"file_magic.rules": FILE_MAGIC_RULES}, args=DEFAULT_SNORT_ARGS)
+    result = run_job(job, os.path.join(args.output_dir, job.name), snort=args.snort,
+                     support_dir=HERE, timeout=args.timeout)
+    service = fetch_metrics(args.port)
+    queue = hold_queue(result["log"], packet_times(pcap))
+    response_time = service["histograms"].get("response_time", {}).get("percentiles", {})
+    return {"files": files, "wall_time": result["wall_time"], "total_packets": result["total_packets"],
+            "holds": queue["holds"], "retries": queue["retries"], "max_depth": queue["max_depth"],
+            "final_depth": queue["final_depth"],
+            "hold_to_retry_p50": percentile(queue["latency_seconds"], 50),
+            "hold_to_retry_p99": percentile(queue["latency_seconds"], 99),
+            "lookups": service["counters"].get("lookups", 0),
+            "duplicate_lookups": service["counters"].get("duplicate_lookups", 0),
+            "max_pending_lookups": service["gauges"].get("pending_max", 0),
+            "lookup_p50": response_time.get("p50"), "lookup_p99": response_time.get("p99"),
+            "log": result["log"]}
+
+def seconds(value):
+    return f"{value:.3f}" if value is not None else "-"
+
+def main():
+    parser = argparse.ArgumentParser(description="Scale retransmit-during-hold to many held files")
+    parser.add_argument("--files", type=int, nargs="+", default=[1, 10, 100, 1000],
+                        help="numbers of overlapping held files")
+    parser.add_argument("--retransmits", type=int, default=1, help="retransmissions of each held segment")
+    parser.add_argument("--retransmit-window", type=float, default=0.2,
+                        help="fraction of the verdict delay the retransmissions are spread over")
+    parser.add_argument("--verdict-delay", type=parse_duration, default=5.0,
+                        help="file_policy verdict_delay, set in the config and used to time the "
+                             "retransmissions")
+    parser.add_argument("--arrival-rate", type=float, default=1000.0, help="downloads started per second")
+    parser.add_argument("--step", type=parse_duration, default=0.01,
+                        help="time between a download's own packets")
+    parser.add_argument("--seed", type=int, default=1, help="sequence number / arrival seed")
+    parser.add_argument("-c", "--config", default=os.path.join(HERE, "snort.lua"), help="Snort config")
+    parser.add_argument("--latency", default=DEFAULT_LATENCY, help="mock lookup latency spec")
+    parser.add_argument("--port", type=int, default=8080, help="mock lookup service port")
+    parser.add_argument("--no-service", action="store_true", help="use an already running lookup service")
+    parser.add_argument("--snort", default="snort", help="Snort binary")
+    parser.add_argument("--timeout", type=float, help="per-run timeout in seconds")
+    parser.add_argument("--output-dir", default="hold_runs", help="per-run working directories")
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = with_verdict_delay(f.read(), args.verdict_delay)
+    args.snort = os.path.abspath(args.snort) if os.sep in args.snort else args.snort
+    service = None if args.no_service else start_service(args.port, args.latency, args.seed)
+    points = []
+    try:
+        for files in args.files:
+            points.append(run_point(args, config, files))
+            point = points[-1]
+            print(f"  {files} files: max queue depth {point['max_depth']}, "
+                  f"{point['lookups']} lookups ({point['max_pending_lookups']} pending at most)")
+    except ConfigError as e:
+        sys.exit(str(e))
+    finally:
+        if service:
+            service.terminate()
+            service.wait()
+
+    print(f"\n{'files':>7} {'holds':>7} {'retries':>8} {'max depth':>10} {'hold->retry p50/p99 (s)':>24} "
+          f"{'lookups':>8} {'pending':>8} {'lookup p50/p99 (s)':>19}")
+    for p in points:
+        print(f"{p['files']:>7} {p['holds']:>7} {p['retries']:>8} {p['max_depth']:>10} "
+              f"{seconds(p['hold_to_retry_p50']) + ' / ' + seconds(p['hold_to_retry_p99']):>24} "
+              f"{p['lookups']:>8} {p['max_pending_lookups']:>8} "
+              f"{seconds(p['lookup_p50']) + ' / ' + seconds(p['lookup_p99']):>19}")
+    results_file = os.path.join(args.output_dir, "results.json")
+    with open(results_file, "w") as f:
+        json.dump({"latency": args.latency, "retransmits": args.retransmits,
+                   "retransmit_window": args.retransmit_window, "verdict_delay": args.verdict_delay,
+                   "points": points}, f, indent=2)
+    print(f"\nResults written to {results_file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Map file type detections in a batch Snort -v log back to their scenarios
+by client port.
+
+Usage: map_batch_results.py SNORT_LOG MANIFEST_JSON
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snorttest.batch import BatchManifest, map_detections
+
+def main():
+    if len(sys.argv) != 3:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(2)
+    log_file, manifest_file = sys.argv[1:]
+
+    manifest = BatchManifest.load(manifest_file)
+    results, unmatched = map_detections(log_file, manifest)
+    for result in results:
+        if result["packet"] is not None:
+            relative = f"packet {result['relative_packet']} of the flow" if result["relative_packet"] else "its flow"
+            print(f"{result['name']}: File type detected in {relative} "
+                  f"(packet {result['packet']} overall, client port {result['client_port']})")
+        else:
+            print(f"{result['name']}: No file type detection")
+        if result["outside_range"]:
+            print(f"  warning: {result['outside_range']} detection(s) on client port {result['client_port']} "
+                  f"fell outside the scenario's packets {result['first_packet']}-{result['last_packet']}")
+    if unmatched:
+        print(f"{unmatched} detection(s) were not on any scenario's client port")
+
+if __name__ == "__main__":
+    main()
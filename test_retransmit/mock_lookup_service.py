@@ -1,41 +1,48 @@
 #!/usr/bin/env python3
+"""
+Mock cloud lookup service for the verdict delay / packet hold tests.
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
-import time
-import json
-
-class DelayedResponseHandler(BaseHTTPRequestHandler):
-    def do_POST(self):
-        # Read the request body
-        content_length = int(self.headers['Content-Length'])
-        post_data = self.rfile.read(content_length)
-        
-        # Print the request for debugging
-        print(f"Received lookup request: {post_data}")
-        
-        # Deliberately delay the response by 3 seconds
-        print("Delaying response for 3 seconds...")
-        time.sleep(3)
-        
-        # Send a response indicating the file is allowed
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.end_headers()
-        
-        response = {
-            "verdict": "log",  # Changed from "block" to "log"
-            "file_name": "Test File",
-            "confidence": 100
-        }
-        
-        self.wfile.write(json.dumps(response).encode())
-        print("Sent response: file is allowed (log verdict)")
-
-def run_server(port=8080):
-    server_address = ('', port)
-    httpd = HTTPServer(server_address, DelayedResponseHandler)
-    print(f"Starting mock lookup service on port {port}...")
-    httpd.serve_forever()
+Every POST is answered with a "log" verdict after a delay drawn from
+--latency (default: a fixed 3 seconds, as before). Lookups are served
+concurrently with keep-alive, so the delay each one sees is only its own.
+
+Latency specs: fixed:DELAY, uniform:MIN:MAX, lognormal:MEDIAN:SIGMA,
+trace:FILE (one delay per line, replayed in order). Delays take an
+optional s/ms/us suffix, e.g. lognormal:250ms:0.5.
+
+GET /metrics returns lookup/duplicate counters, verdict cache stats and
+latency histograms as JSON (GET /metrics?reset=1 also clears them);
+--cache-size N answers repeated file hashes from an N-entry LRU cache.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snorttest.lookup_service import DEFAULT_LATENCY, LookupService, raise_fd_limit
+
+def run_server(port=8080, latency=DEFAULT_LATENCY, seed=None, verdict="log", verbose=True,
+               cache_size=0):
+    service = LookupService(latency=latency, seed=seed, verdict=verdict, verbose=verbose,
+                            cache_size=cache_size)
+    limit = raise_fd_limit()
+    print(f"Starting mock lookup service on port {port} (latency {latency}, "
+          f"up to ~{limit} open connections)...", flush=True)
+    service.serve_forever(port=port)
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock cloud file lookup service")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", default=DEFAULT_LATENCY, help="latency distribution spec")
+    parser.add_argument("--seed", type=int, help="seed for the latency distribution")
+    parser.add_argument("--verdict", default="log", help="verdict returned for every lookup")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="LRU verdict cache entries keyed by file hash (default: no cache)")
+    parser.add_argument("--quiet", action="store_true", help="don't print every request")
+    args = parser.parse_args()
+    run_server(args.port, args.latency, args.seed, args.verdict, verbose=not args.quiet,
+               cache_size=args.cache_size)
 
 if __name__ == '__main__':
-    run_server()
\ No newline at end of file
+    main()
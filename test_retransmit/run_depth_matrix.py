@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Run the file_type_depth sweeps in parallel instead of one Snort after another.
+
+Presets mirror the shell scripts:
+  small - test_file_depth.sh: retransmit_test.pcap, depths 1 10 100 1460
+  large - test_large_file_depths.sh: large_file.pcap, depths 8 ... 2920
+
+Every (pcap, depth) pair runs in its own directory under --output-dir and the
+results are written to <output-dir>/results.json.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snort_configs import FILE_MAGIC_RULES, large_depth_config, small_depth_config
+from snorttest.lua_config import validate_config
+from snorttest.runner import ConfigError, SnortJob, default_workers, run_matrix
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PRESETS = {
+    "small": {"pcaps": ["retransmit_test.pcap"], "depths": [1, 10, 100, 1460],
+              "config": small_depth_config},
+    "large": {"pcaps": ["large_file.pcap"], "depths": [8, 64, 128, 256, 512, 1024, 1460, 2920],
+              "config": large_depth_config},
+}
+
+def build_jobs(preset, pcaps, depths, profile=False):
+    jobs = []
+    for pcap in pcaps:
+        scenario = os.path.splitext(os.path.basename(pcap))[0]
+        for depth in depths:
+            jobs.append(SnortJob(
+                name=f"{scenario}_depth_{depth}",
+                config=preset["config"](depth),
+                pcap=pcap,
+                params={"pcap": pcap, "type_depth": depth},
+                files={"file_magic.rules": FILE_MAGIC_RULES},
+                profile=profile,
+            ))
+    return jobs
+
+def validate_jobs(jobs, snort, workers):
+    """snort -T every distinct config once (cached across runs); returns (job, result) of failures."""
+    unique = {job.config: job for job in jobs}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        checks = pool.map(lambda job: (job, validate_config(job.config, job.files, snort=snort,
+                                                            support_dir=HERE)),
+                          unique.values())
+        return [(job, result) for job, result in checks if not result["ok"]]
+
+def report(result, show_pcap=False):
+    depth = result["params"]["type_depth"]
+    if result["detection_packet"] is not None:
+        line = f"Depth {depth}: File type detected in packet {result['detection_packet']}"
+        if result["total_packets"]:
+            percentage = result["detection_packet"] * 100 / result["total_packets"]
+            line += f" ({percentage:.2f}% of packets)"
+    else:
+        line = f"Depth {depth}: No file type detection"
+    if show_pcap:
+        line = f"{result['params']['pcap']}: {line}"
+    return line
+
+def main():
+    parser = argparse.ArgumentParser(description="Run file_type_depth sweeps in parallel")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="large")
+    parser.add_argument("--pcap", action="append", help="PCAP(s) to test (default: the preset's)")
+    parser.add_argument("--depths", type=int, nargs="+", help="type_depth values (default: the preset's)")
+    parser.add_argument("-j", "--jobs", type=int, default=default_workers(),
+                        help="Snort processes to run at once (default: CPU count)")
+    parser.add_argument("--output-dir", default="depth_runs", help="per-job working directories")
+    parser.add_argument("--snort", default="snort", help="Snort binary")
+    parser.add_argument("--validate", action="store_true",
+                        help="snort -T each distinct config before the sweep (results are cached)")
+    parser.add_argument("--profile", action="store_true",
+                        help="enable Snort's profiler and perf_monitor; timing goes into results.json")
+    args = parser.parse_args()
+
+    preset = PRESETS[args.preset]
+    pcaps = args.pcap or preset["pcaps"]
+    depths = args.depths or preset["depths"]
+    for pcap in pcaps:
+        if not os.path.exists(pcap):
+            sys.exit(f"Missing PCAP: {pcap}")
+
+    jobs = build_jobs(preset, pcaps, depths, profile=args.profile)
+    if args.validate:
+        failures = validate_jobs(jobs, args.snort, args.jobs)
+        if failures:
+            job, result = failures[0]
+            sys.exit(f"Snort config error in job {job.name}:\n{result['output']}")
+    print(f"Running {len(jobs)} Snort jobs, {args.jobs} at a time...")
+    try:
+        results = run_matrix(jobs, args.output_dir, workers=args.jobs, snort=args.snort,
+                             on_result=lambda r: print(f"  finished {r['name']} in {r['wall_time']:.1f}s"))
+    except ConfigError as e:
+        sys.exit(str(e))
+
+    results_file = os.path.join(args.output_dir, "results.json")
+    with open(results_file, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print("\nSummary of File Type Detection by Depth:")
+    print("=======================================")
+    for result in results:
+        print(report(result, show_pcap=len(pcaps) > 1))
+    print(f"\nResults written to {results_file}")
+
+if __name__ == "__main__":
+    main()
@@ -7,11 +7,17 @@ LOOKUP_PID=$!
 # Give the service time to start
 sleep 1
 
-# Create the PCAP file
-python3 create_pcap.py
+# Create the PCAP file (cached per seed; set PCAP_SEED to vary the sequence numbers)
+python3 create_pcap.py --seed "${PCAP_SEED:-1}"
+
+# Set SNORT_PROFILE=1 to add Snort's per-module/per-rule profiler and perf_monitor
+PROFILE_ARGS=()
+if [ -n "$SNORT_PROFILE" ]; then
+    PROFILE_ARGS=(--lua "$(python3 ../benchmarks/snort_profile.py lua)")
+fi
 
 # Run Snort with the configuration
-snort -c snort.lua -r retransmit_test.pcap -A alert_fast -k none --daq-dir /usr/local/lib/daq --daq dump --daq-var output=inline-out.pcap -Q -v
+snort -c snort.lua -r retransmit_test.pcap -A alert_fast -k none --daq-dir /usr/local/lib/daq --daq dump --daq-var output=inline-out.pcap -Q -v "${PROFILE_ARGS[@]}"
 
 # Display the results
 echo -e "\n\nResults:"
@@ -28,5 +34,11 @@ grep "Malware File Detected" alert_fast.txt
 echo -e "\n4. Check if the retry was successful or failed:"
 grep "retry" snort.log
 
+echo -e "\n5. Lookup service metrics (lookups, duplicate lookups, latency):"
+curl -s http://localhost:8080/metrics || echo "Could not fetch lookup service metrics"
+
+echo -e "\n6. Compare the input capture with the inline output (dropped/duplicated/reordered):"
+python3 diff_inline.py retransmit_test.pcap inline-out.pcap
+
 # Kill the mock lookup service
 kill $LOOKUP_PID
\ No newline at end of file
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+The file type detection configs of the test scripts, built with
+snorttest.lua_config instead of per-script heredocs, and a cached
+"snort -T" for any config.
+
+  small_depth  test_file_depth.sh sweep: block verdict, capture_min_size 0
+  large_depth  test_large_file_depths.sh sweep and test_large_file.sh (depth 1460)
+  force_early  force_early_detection_large.sh: small segments, unlimited
+               http_inspect depths, type_depth 8, http_inspect tracing
+
+Usage:
+  snort_configs.py write NAME [--depth N] [-o FILE] [--validate]
+  snort_configs.py validate CONFIG [--snort SNORT] [-- SNORT_ARGS...]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snorttest.lua_config import file_inspection_config, validate_config
+
+FILE_MAGIC_RULES = """# Simple file_magic.rules for testing
+file_id (msg:"Test File"; file_meta:type TEST_FILE, id 1, category "Test Files"; file_data; content:"MALWARE", depth 7, offset 0; gid:4; sid:1000; rev:1;)
+"""
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def small_depth_config(depth):
+    return file_inspection_config(depth, verdict="block",
+                                  file_id_options={"capture_min_size": 0}).render()
+
+def large_depth_config(depth):
+    return file_inspection_config(depth).render()
+
+def force_early_config(depth=8):
+    return file_inspection_config(
+        depth,
+        stream={"small_segments": {"count": 1, "maximum_size": 1460}, "flush_behavior": "large"},
+        http={"response_depth": 0, "request_depth": 0, "file_depth": 1460,
+              "decompress_pdf": True, "decompress_swf": True, "decompress_zip": True,
+              "decompress_vba": True},
+        traces={"file_api": 3, "stream_tcp": 2, "http_inspect": 3},
+    ).render()
+
+CONFIGS = {
+    "small_depth": (small_depth_config, 1460),
+    "large_depth": (large_depth_config, 1460),
+    "force_early": (force_early_config, 8),
+}
+
+def config_text(name, depth=None):
+    build, default_depth = CONFIGS[name]
+    return build(default_depth if depth is None else depth)
+
+def validate(config, snort="snort", snort_args=(), support_dir=HERE):
+    """
+    Cached snort -T of config; the test file_magic.rules is supplied if the
+    config uses it. Exits with Snort's output on failure.
+    """
+    files = {"file_magic.rules": FILE_MAGIC_RULES} if "file_magic.rules" in config else None
+    result = validate_config(config, files=files, snort=snort, support_dir=support_dir,
+                             args=snort_args)
+    if not result["ok"]:
+        sys.exit(f"Snort rejected the config:\n{result['output']}")
+    print("Config OK" + (" (cached)" if result["cached"] else ""))
+
+def main():
+    parser = argparse.ArgumentParser(description="Render and validate the test Snort configs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    write = commands.add_parser("write", help="render a named config")
+    write.add_argument("name", choices=sorted(CONFIGS))
+    write.add_argument("--depth", type=int, help="file_id type_depth")
+    write.add_argument("-o", "--output", help="output file (default: stdout)")
+    write.add_argument("--rules", help="also write file_magic.rules to this path")
+    write.add_argument("--validate", action="store_true", help="validate with snort -T (cached)")
+    check = commands.add_parser("validate", help="snort -T a config file, skipping unchanged ones")
+    check.add_argument("config")
+    for command in (write, check):
+        command.add_argument("--snort", default="snort", help="Snort binary")
+        command.add_argument("snort_args", nargs="*", help="extra Snort arguments after --")
+    args = parser.parse_args()
+
+    if args.command == "validate":
+        with open(args.config) as f:
+            config = f.read()
+        validate(config, args.snort, args.snort_args,
+                 support_dir=os.path.dirname(os.path.abspath(args.config)))
+        return
+
+    config = config_text(args.name, args.depth)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(config)
+    else:
+        sys.stdout.write(config)
+    if args.rules:
+        with open(args.rules, "w") as f:
+            f.write(FILE_MAGIC_RULES)
+    if args.validate:
+        validate(config, args.snort, args.snort_args)
+
+if __name__ == "__main__":
+    main()
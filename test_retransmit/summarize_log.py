@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Summarize a Snort -v log in one pass: file type detections, the packet they
+happened in, verdicts and held/retry/retransmit events.
+
+Usage: summarize_log.py SNORT_LOG [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snorttest.snort_log import summarize_log
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a Snort -v log in one pass")
+    parser.add_argument("log", help="Snort log file")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = summarize_log(args.log)
+    if args.json:
+        print(json.dumps(summary.as_dict(), indent=2))
+        return
+
+    print("File type detection results:")
+    print("============================")
+    if summary.file_types:
+        for file_type, count in summary.file_types.items():
+            print(f"File type: {file_type}" + (f" (x{count})" if count > 1 else ""))
+    else:
+        print("No file type detection")
+
+    packet_num = summary.detection_packet
+    if packet_num is not None:
+        print(f"File type detected in packet {packet_num}")
+        print(f"Total packets: {summary.total_packets}")
+        if summary.total_packets:
+            percentage = packet_num * 100 / summary.total_packets
+            print(f"File type detected after processing {percentage:.2f}% of packets")
+    else:
+        print("Could not determine packet number for file type detection")
+
+    print("\nEvents:")
+    for kind in ("verdict", "held", "retry", "retransmit"):
+        count = summary.counts[kind]
+        where = ""
+        if count:
+            where = f" (packets {summary.first_packet.get(kind)}-{summary.last_packet.get(kind)})"
+        print(f"  {kind}: {count}{where}")
+    if summary.verdicts:
+        print("  verdicts: " + ", ".join(f"{v}={n}" for v, n in summary.verdicts.items()))
+
+if __name__ == "__main__":
+    main()
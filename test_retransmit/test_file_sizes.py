@@ -1,5 +1,11 @@
-from scapy.all import *
+import argparse
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from snorttest.batch import BatchManifest
+from snorttest.pcap_cache import cached_outputs
+from snorttest.pcap_writer import PcapWriter, TcpFlow, write_pcap
 
 # IP addresses and ports
 client_ip = "10.1.0.2"
@@ -14,58 +20,148 @@ server_seq = 2000
 # Create test files with different sizes
 sizes = [5, 10, 20, 50, 100]
 
-for size in sizes:
+# File data larger than one segment is split at the standard MSS
+segment_size = 1460
+
+# In batch mode scenario i uses client port batch_base_port + i
+batch_base_port = 20000
+
+def size_packets(size, flow, close=False):
+    """Yield the HTTP download packets for a file of the given size, optionally closing the flow."""
     # HTTP GET request
-    http_get = Ether()/IP(src=client_ip, dst=server_ip)/TCP(sport=client_port, dport=server_port, flags="PA", seq=client_seq, ack=server_seq)/Raw(load="GET /malware.bin HTTP/1.1\r\nHost: example.com\r\n\r\n")
-    
+    get_load = b"GET /malware.bin HTTP/1.1\r\nHost: example.com\r\n\r\n"
+    yield flow.client("PA", client_seq, server_seq, get_load)
+
     # HTTP 200 OK response header
-    http_resp_header = Ether()/IP(src=server_ip, dst=client_ip)/TCP(sport=server_port, dport=client_port, flags="PA", seq=server_seq, ack=client_seq+len(http_get[Raw]))/Raw(load=f"HTTP/1.1 200 OK\r\nContent-Type: application/octet-stream\r\nContent-Length: {size}\r\n\r\n")
-    
+    resp_load = f"HTTP/1.1 200 OK\r\nContent-Type: application/octet-stream\r\nContent-Length: {size}\r\n\r\n".encode()
+    yield flow.server("PA", server_seq, client_seq+len(get_load), resp_load)
+
     # Client ACK for the response header
-    client_ack1 = Ether()/IP(src=client_ip, dst=server_ip)/TCP(sport=client_port, dport=server_port, flags="A", seq=client_seq+len(http_get[Raw]), ack=server_seq+len(http_resp_header[Raw]))
-    
+    yield flow.client("A", client_seq+len(get_load), server_seq+len(resp_load))
+
     # File content with MALWARE at the beginning and padded to the specified size
-    file_content = "MALWARE" + "X" * (size - 7) if size > 7 else "MALWARE"[:size]
-    file_pkt = Ether()/IP(src=server_ip, dst=client_ip)/TCP(sport=server_port, dport=client_port, flags="PA", seq=server_seq+len(http_resp_header[Raw]), ack=client_seq+len(http_get[Raw]))/Raw(load=file_content)
-    
-    # Client ACK for the file content
-    client_ack2 = Ether()/IP(src=client_ip, dst=server_ip)/TCP(sport=client_port, dport=server_port, flags="A", seq=client_seq+len(http_get[Raw]), ack=server_seq+len(http_resp_header[Raw])+len(file_pkt[Raw]))
-    
-    # Write packets to PCAP file
-    packets = [http_get, http_resp_header, client_ack1, file_pkt, client_ack2]
-    pcap_file = f"size_{size}.pcap"
-    wrpcap(pcap_file, packets)
-    print(f"Created {pcap_file} with file size {size}")
-
-# Create a shell script to test all sizes
-with open("test_sizes.sh", "w") as f:
-    f.write("#!/bin/bash\n\n")
-    f.write("# Test with different file sizes\n")
-    
-    for size in sizes:
-        f.write(f"\necho -e \"\\nTesting with file size = {size}\"\n")
-        f.write(f"echo \"=================================\"\n")
-        f.write(f"snort -c snort.lua -r size_{size}.pcap -A alert_fast -k none -Q -v > size_{size}.log 2>&1\n")
-        f.write(f"echo \"File type detection results:\"\n")
-        f.write(f"grep \"File type:\" size_{size}.log || echo \"No file type detection\"\n")
-        f.write(f"packet_num=$(grep -B 5 \"File type:\" size_{size}.log | grep \"Processing packet\" | tail -1 | awk '{{print $3}}')\n")
-        f.write(f"if [ -n \"$packet_num\" ]; then\n")
-        f.write(f"    echo \"File type detected in packet $packet_num\"\n")
-        f.write(f"else\n")
-        f.write(f"    echo \"Could not determine packet number for file type detection\"\n")
-        f.write(f"fi\n")
-    
-    f.write("\n# Create a summary\n")
-    f.write("echo -e \"\\nSummary of File Type Detection by Size:\"\n")
-    f.write("echo \"=======================================\"\n")
-    
+    file_content = b"MALWARE" + b"X" * (size - 7) if size > 7 else b"MALWARE"[:size]
+    offset = 0
+    while offset < len(file_content):
+        segment = file_content[offset:offset+segment_size]
+        file_seq = server_seq+len(resp_load)+offset
+        yield flow.server("PA", file_seq, client_seq+len(get_load), segment)
+
+        # Client ACK for the file content
+        yield flow.client("A", client_seq+len(get_load), file_seq+len(segment))
+        offset += len(segment)
+
+    if not close:
+        return
+
+    # Close the connection, so Snort finishes the file on this flow's own
+    # packets rather than at end-of-capture cleanup
+    fin_seq = server_seq+len(resp_load)+len(file_content)
+    yield flow.server("FA", fin_seq, client_seq+len(get_load))
+    yield flow.client("FA", client_seq+len(get_load), fin_seq+1)
+    yield flow.server("A", fin_seq+1, client_seq+len(get_load)+1)
+
+def create_size_pcaps(sizes):
+    """One PCAP per size, all on the same 5-tuple."""
+    flow = TcpFlow(client_ip, server_ip, client_port, server_port)
     for size in sizes:
-        f.write(f"packet_num=$(grep -B 5 \"File type:\" size_{size}.log | grep \"Processing packet\" | tail -1 | awk '{{print $3}}')\n")
-        f.write(f"if [ -n \"$packet_num\" ]; then\n")
-        f.write(f"    echo \"Size {size}: File type detected in packet $packet_num\"\n")
-        f.write(f"else\n")
-        f.write(f"    echo \"Size {size}: No file type detection\"\n")
-        f.write(f"fi\n")
-
-os.chmod("test_sizes.sh", 0o755)
-print("Created test_sizes.sh script")
\ No newline at end of file
+        # Write packets to PCAP file as they are generated
+        pcap_file = f"size_{size}.pcap"
+        write_pcap(pcap_file, size_packets(size, flow))
+        print(f"Created {pcap_file} with file size {size}")
+
+def create_batch_pcap(sizes, pcap_file="size_batch.pcap", manifest_file="size_batch.json", use_cache=True):
+    """All sizes in one PCAP, each on its own client port, plus a manifest."""
+    def build(directory):
+        manifest = BatchManifest(pcap_file)
+        with PcapWriter(os.path.join(directory, pcap_file)) as writer:
+            for i, size in enumerate(sizes):
+                port = batch_base_port + i
+                flow = TcpFlow(client_ip, server_ip, port, server_port)
+                before = writer.packets
+                writer.write_all(size_packets(size, flow, close=True))
+                manifest.add(f"size_{size}", writer.packets - before, size=size, client_port=port)
+        manifest.save(os.path.join(directory, manifest_file))
+        return {"packets": writer.packets}
+
+    _, info = cached_outputs("size_batch", {"sizes": sizes}, build, [pcap_file, manifest_file],
+                             sources=[__file__], use_cache=use_cache)
+    print(f"Created {pcap_file} with {len(sizes)} file sizes ({info['packets']} packets)")
+    print(f"Created {manifest_file} scenario manifest")
+
+def write_test_script(sizes):
+    # Create a shell script to test all sizes
+    with open("test_sizes.sh", "w") as f:
+        f.write("#!/bin/bash\n\n")
+        f.write("# Test with different file sizes\n")
+
+        for size in sizes:
+            f.write(f"\necho -e \"\\nTesting with file size = {size}\"\n")
+            f.write(f"echo \"=================================\"\n")
+            f.write(f"snort -c snort.lua -r size_{size}.pcap -A alert_fast -k none -Q -v > size_{size}.log 2>&1\n")
+            f.write(f"echo \"File type detection results:\"\n")
+            f.write(f"grep \"File type:\" size_{size}.log || echo \"No file type detection\"\n")
+            f.write(f"packet_num=$(grep -B 5 \"File type:\" size_{size}.log | grep \"Processing packet\" | tail -1 | awk '{{print $3}}')\n")
+            f.write(f"if [ -n \"$packet_num\" ]; then\n")
+            f.write(f"    echo \"File type detected in packet $packet_num\"\n")
+            f.write(f"else\n")
+            f.write(f"    echo \"Could not determine packet number for file type detection\"\n")
+            f.write(f"fi\n")
+
+        f.write("\n# Create a summary\n")
+        f.write("echo -e \"\\nSummary of File Type Detection by Size:\"\n")
+        f.write("echo \"=======================================\"\n")
+
+        for size in sizes:
+            f.write(f"packet_num=$(grep -B 5 \"File type:\" size_{size}.log | grep \"Processing packet\" | tail -1 | awk '{{print $3}}')\n")
+            f.write(f"if [ -n \"$packet_num\" ]; then\n")
+            f.write(f"    echo \"Size {size}: File type detected in packet $packet_num\"\n")
+            f.write(f"else\n")
+            f.write(f"    echo \"Size {size}: No file type detection\"\n")
+            f.write(f"fi\n")
+
+    os.chmod("test_sizes.sh", 0o755)
+    print("Created test_sizes.sh script")
+
+def write_batch_test_script():
+    # One Snort run covers every size; results are mapped back per flow
+    with open("test_sizes_batch.sh", "w") as f:
+        f.write("#!/bin/bash\n\n")
+        f.write("# Test all file sizes with a single Snort run\n")
+        f.write("snort -c snort.lua -r size_batch.pcap -A alert_fast -k none -Q -v > size_batch.log 2>&1\n")
+        f.write("echo -e \"\\nSummary of File Type Detection by Size:\"\n")
+        f.write("echo \"=======================================\"\n")
+        f.write("python3 map_batch_results.py size_batch.log size_batch.json\n")
+
+    os.chmod("test_sizes_batch.sh", 0o755)
+    print("Created test_sizes_batch.sh script")
+
+def parse_around(spec):
+    """'CENTER:WIDTH' -> every size from CENTER-WIDTH to CENTER+WIDTH."""
+    center, _, width = spec.partition(":")
+    center, width = int(center), int(width or 0)
+    return list(range(max(1, center - width), center + width + 1))
+
+def main():
+    parser = argparse.ArgumentParser(description="Create file size test PCAPs and a Snort test script")
+    parser.add_argument("--sizes", type=int, nargs="+", default=sizes, help="file sizes to test")
+    parser.add_argument("--around", type=parse_around, action="append", default=[], metavar="CENTER:WIDTH",
+                        help="also test every size within WIDTH of CENTER, e.g. 1460:20")
+    parser.add_argument("--batch", action="store_true",
+                        help="pack all sizes into size_batch.pcap for a single Snort run")
+    parser.add_argument("--no-cache", action="store_true", help="always regenerate the batch PCAP")
+    args = parser.parse_args()
+
+    all_sizes = list(args.sizes)
+    for extra in args.around:
+        all_sizes += [s for s in extra if s not in all_sizes]
+
+    if args.batch:
+        create_batch_pcap(all_sizes, use_cache=not args.no_cache)
+        write_batch_test_script()
+    else:
+        create_size_pcaps(all_sizes)
+        write_test_script(all_sizes)
+
+if __name__ == "__main__":
+    main()